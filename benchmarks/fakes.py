@@ -0,0 +1,163 @@
+"""Sandboxed environment for benchmarks: fake HOME, stub binaries, no tray."""
+
+from __future__ import annotations
+
+import os
+import stat
+import sys
+from collections.abc import Callable
+from pathlib import Path
+
+# Stub `gh`: understands just enough of the CLI for the app's call sites and
+# edits hosts.yml with plain text so it stays cheap and dependency-free.
+_GH_STUB = """\
+#!{python}
+import os, re, sys
+args = sys.argv[1:]
+hosts = os.path.join(os.environ["HOME"], ".config", "gh", "hosts.yml")
+if args[:2] == ["auth", "switch"]:
+    user = args[args.index("--user") + 1]
+    with open(hosts) as fh:
+        text = fh.read()
+    if not re.search(r"^        " + re.escape(user) + r":", text, re.M):
+        sys.exit("no account " + user)
+    text = re.sub(r"^    user: .*$", "    user: " + user, text, flags=re.M)
+    with open(hosts + ".tmp", "w") as fh:
+        fh.write(text)
+    os.replace(hosts + ".tmp", hosts)
+elif args[:2] == ["auth", "token"]:
+    user = args[args.index("--user") + 1] if "--user" in args else "active"
+    print("gho_" + user)
+elif args[:2] == ["auth", "status"]:
+    pass
+elif args[:2] == ["api", "user"]:
+    # Logins containing "expired" stand in for revoked tokens.
+    if "expired" in os.environ.get("GH_TOKEN", ""):
+        sys.exit("gh: Bad credentials (HTTP 401)")
+    print('{{"login": "stub"}}')
+else:
+    sys.exit("stub gh: unsupported " + " ".join(args))
+"""
+
+# `git` and `notify-send` only need to exist and succeed.
+_NOOP_STUB = """\
+#!{python}
+"""
+
+
+def make_sandbox(root: Path) -> dict[str, str]:
+    """Create a fake home with stub binaries; return the env to run under."""
+    home = root / "home"
+    bin_dir = root / "bin"
+    # Sockets and lock files go here, never next to a real tray's.
+    runtime_dir = root / "run"
+    tmp_dir = root / "tmp"
+    for directory in (home / ".config" / "gh", bin_dir):
+        directory.mkdir(parents=True, exist_ok=True)
+    for directory in (runtime_dir, tmp_dir):
+        directory.mkdir(mode=0o700, exist_ok=True)
+
+    for name, body in (
+        ("gh", _GH_STUB),
+        ("git", _NOOP_STUB),
+        ("notify-send", _NOOP_STUB),
+    ):
+        script = bin_dir / name
+        script.write_text(body.format(python=sys.executable), encoding="utf-8")
+        script.chmod(script.stat().st_mode | stat.S_IXUSR)
+
+    return {
+        "HOME": str(home),
+        "XDG_CONFIG_HOME": str(home / ".config"),
+        "XDG_CACHE_HOME": str(home / ".cache"),
+        "GIT_CONFIG_GLOBAL": str(home / ".gitconfig"),
+        "XDG_RUNTIME_DIR": str(runtime_dir),
+        "TMPDIR": str(tmp_dir),
+        # No bus here, so notifications go to the stub notify-send.
+        "DBUS_SESSION_BUS_ADDRESS": f"unix:path={runtime_dir / 'no-bus'}",
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+    }
+
+
+def usernames(count: int) -> list[str]:
+    return [f"user-{i:04d}" for i in range(count)]
+
+
+def write_hosts(
+    path: Path, names: list[str], active: str, file_tokens: bool = False
+) -> None:
+    """Write a hosts.yml in the layout gh >= 2.40 produces.
+
+    *file_tokens* mimics `--insecure-storage`, the layout the native switch
+    engine handles; otherwise tokens are assumed to live in the keyring.
+    """
+    lines = ["github.com:", "    users:"]
+    for name in names:
+        lines.append(f"        {name}:")
+        if file_tokens:
+            lines.append(f"            oauth_token: gho_{name}")
+    lines += ["    git_protocol: https", f"    user: {active}"]
+    if file_tokens:
+        lines.append(f"    oauth_token: gho_{active}")
+    lines.append("")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def write_accounts_toml(
+    path: Path,
+    names: list[str],
+    native_switch: bool = False,
+    low_memory: bool = False,
+    remotes: dict[str, str] | None = None,
+) -> None:
+    """Write accounts.toml; *remotes* maps usernames to a remote owner rule."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    remotes = remotes or {}
+    chunks = [
+        f"[settings]\nnative_switch = {str(native_switch).lower()}\n"
+        f"low_memory = {str(low_memory).lower()}\n"
+    ]
+    for n in names:
+        chunk = f'[{n}]\nname = "{n}"\nemail = "{n}@example.com"\n'
+        if n in remotes:
+            chunk += f'remotes = ["{remotes[n]}"]\n'
+        chunks.append(chunk)
+    path.write_text("\n".join(chunks), encoding="utf-8")
+
+
+def headless_backend(render: bool = False) -> object:
+    """TrayBackend double that records applied states instead of drawing.
+
+    With *render* it takes each new icon's image, as pystray does, so memory
+    measurements include rendering.
+    """
+    from gh_switcher.icons import Icon
+    from gh_switcher.tray.base import MenuItem, TrayBackend, TrayState
+
+    class HeadlessBackend(TrayBackend):
+        def __init__(self) -> None:
+            self.states: list[TrayState] = []
+            self.image: object = None
+
+        def run(self, on_ready: Callable[[], None]) -> None:
+            on_ready()
+
+        def apply(self, state: TrayState) -> None:
+            if render:
+                self.image = state.icon.image  # held, as pystray holds it
+            self.states.append(state)
+            del self.states[:-1]
+
+        def set_icon(self, icon: Icon) -> None:
+            pass
+
+        def set_tooltip(self, text: str) -> None:
+            pass
+
+        def set_menu(self, items: list[MenuItem]) -> None:
+            pass
+
+        def stop(self) -> None:
+            pass
+
+    return HeadlessBackend()
@@ -0,0 +1,109 @@
+"""Steady-state memory of the tray process, measured in a fresh interpreter.
+
+Started by run.py, once per account count and mode, inside its sandbox:
+
+    python benchmarks/memory.py COUNT CYCLES [--low-memory]
+
+Starts the app on a headless backend that renders icons like pystray does,
+warms it up, then runs CYCLES of refresh + switch + menu open and prints
+one JSON object: resident set size after warm-up, and tracemalloc's view of
+the measured cycles.  `growth_kib` is what the second half of the cycles
+retained on top of the first half; anything but noise there is a leak.
+"""
+
+from __future__ import annotations
+
+import gc
+import itertools
+import json
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+
+import fakes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+WARMUP_CYCLES = 10
+# The timing rings are bounded by design; shrink them so the warm-up fills
+# them and their growth does not read as a leak.
+SAMPLES_PER_STAGE = 4
+
+
+def main() -> None:
+    count, cycles = int(sys.argv[1]), int(sys.argv[2])
+    low_memory = "--low-memory" in sys.argv[3:]
+
+    from gh_switcher import accounts, config, tracing
+
+    tracing.SAMPLES_PER_STAGE = SAMPLES_PER_STAGE
+    names = fakes.usernames(count)
+    fakes.write_hosts(accounts.HOSTS_FILE, names, names[0], file_tokens=True)
+    fakes.write_accounts_toml(
+        config.ACCOUNTS_FILE, names, native_switch=True, low_memory=low_memory
+    )
+
+    from gh_switcher.app import GhSwitcherApp
+
+    app = GhSwitcherApp(backend=fakes.headless_backend(render=True))
+    app._finish_startup()
+    app._health.stop()  # no background gh forks while measuring
+    for thread in threading.enumerate():
+        if thread.name == "gh-switcher-icons":
+            thread.join()
+
+    targets = itertools.cycle([*names[-2:], names[0]])
+
+    def cycle() -> None:
+        app.refresh(True)
+        app.switch_to(accounts.DEFAULT_HOST, next(targets))
+        app._worker.wait_idle()
+        for host in app._state.accounts.hosts:
+            app._current_host_menu(host)
+
+    for _ in range(WARMUP_CYCLES):
+        cycle()
+    gc.collect()
+    rss_kib = _rss_kib()
+
+    tracemalloc.start()
+    for _ in range(cycles // 2):
+        cycle()
+    gc.collect()
+    half, _ = tracemalloc.get_traced_memory()
+    for _ in range(cycles - cycles // 2):
+        cycle()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    app._quit()
+    print(
+        json.dumps(
+            {
+                "rss_kib": rss_kib,
+                "traced_kib": current / 1024,
+                "traced_peak_kib": peak / 1024,
+                "growth_kib": (current - half) / 1024,
+            }
+        )
+    )
+
+
+def _rss_kib() -> float:
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    import resource  # peak rather than current, but the best available
+
+    scale = 1 if sys.platform == "linux" else 1 / 1024  # macOS reports bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Latency and memory benchmarks for gh-switcher.
+
+Runs every scenario inside a throwaway HOME with stub `gh`, `git` and
+`notify-send` binaries on PATH and a headless tray backend, then prints the
+results as JSON.  Memory is measured by memory.py in a fresh interpreter
+per account count, with and without `low_memory`.
+
+    python benchmarks/run.py --out bench.json
+    python benchmarks/run.py --compare bench.json   # exit 1 on regression
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import fakes
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+sys.path.insert(0, str(SRC))
+
+DEFAULT_COUNTS = (1, 10, 100, 1000)
+DEFAULT_REPEAT = 20
+DEFAULT_THRESHOLD = 0.25
+# Regressions smaller than this are timer noise, whatever the ratio.
+NOISE_FLOOR_US = 50.0
+# `gh-switcher status` against a running tray, over the interpreter's own
+# start-up, best of several runs.
+CLI_BUDGET_MS = 50.0
+# The same without a tray, reading hosts.yml and the gitconfig itself.
+CLI_DISK_BUDGET_MS = 80.0
+DEFAULT_MEMORY_CYCLES = 40
+# Retained by the second half of the memory cycles; more means a leak.
+LEAK_BUDGET_KIB = 64.0
+# RSS differences smaller than this are allocator noise.
+NOISE_FLOOR_KIB = 1024.0
+
+Result = dict[str, float]
+
+
+def main() -> None:
+    args = _parse_args()
+    counts = [int(c) for c in args.counts.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="gh-switcher-bench-") as tmp:
+        env = fakes.make_sandbox(Path(tmp))
+        os.environ.update(env)
+        results = run_all(counts, args.repeat)
+        results.update(bench_import(args.repeat))
+        results.update(bench_memory(counts, args.memory_cycles))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "counts": counts,
+            "repeat": args.repeat,
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    failures = check_budgets(results, args.cli_budget_ms, args.cli_disk_budget_ms)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        failures += compare(baseline["results"], results, args.threshold)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed slowdown of the median as a fraction (default %(default)s)",
+    )
+    parser.add_argument(
+        "--counts",
+        default=",".join(str(c) for c in DEFAULT_COUNTS),
+        help="comma-separated account counts (default %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--cli-budget-ms", type=float, default=CLI_BUDGET_MS)
+    parser.add_argument("--cli-disk-budget-ms", type=float, default=CLI_DISK_BUDGET_MS)
+    parser.add_argument(
+        "--memory-cycles",
+        type=int,
+        default=DEFAULT_MEMORY_CYCLES,
+        help="refresh/switch cycles per memory run (default %(default)s)",
+    )
+    return parser.parse_args()
+
+
+# -- Measurement ---------------------------------------------------------------
+
+
+def measure(
+    fn: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None
+) -> Result:
+    samples: list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "min_us": samples[0],
+        "median_us": statistics.median(samples),
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_us": samples[-1],
+    }
+
+
+def run_all(counts: list[int], repeat: int) -> dict[str, Result]:
+    # Imported only now: module-level paths are derived from the sandbox HOME.
+    from gh_switcher import (
+        accounts,
+        config,
+        credential,
+        filecache,
+        health,
+        icons,
+        locks,
+        session,
+    )
+    from gh_switcher.app import GhSwitcherApp
+
+    results: dict[str, Result] = {}
+    app = GhSwitcherApp(backend=fakes.headless_backend())
+    switch_repeat = max(3, repeat // 4)
+
+    for count in counts:
+        names = fakes.usernames(count)
+        fakes.write_hosts(accounts.HOSTS_FILE, names, active=names[0])
+        fakes.write_accounts_toml(config.ACCOUNTS_FILE, names)
+        filecache.clear()
+        icons.prerender([names[0], names[-1]])
+        tag = f"[n={count}]"
+
+        results[f"load_accounts.cold{tag}"] = measure(
+            accounts.load_accounts, repeat, setup=filecache.clear
+        )
+        results[f"load_accounts.warm{tag}"] = measure(accounts.load_accounts, repeat)
+
+        app.refresh()
+        state = app._state
+        results[f"menu.build{tag}"] = measure(
+            lambda s=state: app._build_menu(s.accounts, s.health, s.autostart),
+            repeat,
+        )
+        results[f"menu.open_host{tag}"] = measure(
+            lambda s=state: app._host_menu(accounts.DEFAULT_HOST, s.accounts, s.health),
+            repeat,
+        )
+        results[f"refresh.unchanged{tag}"] = measure(app.refresh, repeat)
+        results[f"refresh.forced{tag}"] = measure(lambda: app.refresh(True), repeat)
+
+        targets = itertools.cycle([names[-1], names[0]])
+
+        def switch_end_to_end(targets: Iterator[str] = targets) -> None:
+            app.switch_to(accounts.DEFAULT_HOST, next(targets))
+            app._worker.wait_idle()
+
+        results[f"switch_to.gh{tag}"] = measure(switch_end_to_end, switch_repeat)
+        fakes.write_hosts(accounts.HOSTS_FILE, names, names[0], file_tokens=True)
+        fakes.write_accounts_toml(config.ACCOUNTS_FILE, names, native_switch=True)
+        results[f"switch_to.native{tag}"] = measure(switch_end_to_end, switch_repeat)
+
+    switch_lock = locks.switch_lock()
+
+    def lock_uncontended() -> None:
+        with switch_lock:
+            pass
+
+    results["switch_lock.uncontended"] = measure(lock_uncontended, repeat)
+    # Served by the app's socket from its token cache once warmed.
+    fakes.write_accounts_toml(
+        config.ACCOUNTS_FILE, names, native_switch=True, remotes={names[0]: "acme-*"}
+    )
+    app._server.start(on_subscribe=app._active_username)
+    try:
+        deadline = time.monotonic() + 10
+        while app._tokens.get(accounts.DEFAULT_HOST, names[0]) is None:
+            if time.monotonic() > deadline:
+                raise RuntimeError("token cache never filled")
+            time.sleep(0.01)
+        results["session_env.cached"] = measure(
+            lambda: session.session_env(names[0]), repeat
+        )
+        results["credential.cached"] = measure(
+            lambda: credential.lookup(accounts.DEFAULT_HOST, "acme-inc", "/"), repeat
+        )
+        results["cli.status"] = bench_cli("status", repeat)
+    finally:
+        app._server.stop()
+    results["cli.status.disk"] = bench_cli("status", repeat)
+    results["python.startup"] = bench_cli(None, repeat)
+    results["health.check_account"] = measure(
+        lambda: health.check_account(accounts.GhAccount("user-0000", False)),
+        max(3, repeat // 4),
+    )
+
+    username = "bench-icon"
+    results["generate_icon.cold"] = measure(
+        lambda: icons.generate_icon(username, active=True).image,
+        repeat,
+        setup=lambda: icons.invalidate_cache(username),
+    )
+    results["generate_icon.warm"] = measure(
+        lambda: icons.generate_icon(username, active=True).image, repeat
+    )
+    results["icon_file.cold"] = measure(
+        lambda: icons.generate_icon(username, active=True).file(),
+        repeat,
+        setup=lambda: icons.invalidate_cache(username),
+    )
+    return results
+
+
+def bench_import(repeat: int) -> dict[str, Result]:
+    """`-X importtime` cost of `import gh_switcher.app` in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    samples: list[float] = []
+    for _ in range(max(3, repeat // 4)):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import gh_switcher.app"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Last line is the top-level module: "import time: self | cumulative | name"
+        samples.append(float(proc.stderr.strip().splitlines()[-1].split("|")[1]))
+    samples.sort()
+    return {
+        "import.gh_switcher.app": {
+            "runs": len(samples),
+            "min_us": samples[0],
+            "median_us": statistics.median(samples),
+            "p95_us": samples[-1],
+            "max_us": samples[-1],
+        }
+    }
+
+
+def bench_cli(command: str | None, repeat: int) -> Result:
+    """Wall time of `gh-switcher COMMAND` in a fresh interpreter.
+
+    Without *command*, of an interpreter that does nothing, which is the
+    part of every CLI run that gh-switcher cannot shave off.
+    """
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    code = "pass"
+    if command is not None:
+        code = (
+            "import sys; from gh_switcher.__main__ import main; "
+            f"sys.argv[1:] = [{command!r}]; main()"
+        )
+    return measure(
+        lambda: subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        ),
+        max(3, repeat // 2),
+    )
+
+
+def bench_memory(counts: list[int], cycles: int) -> dict[str, Result]:
+    """Steady-state RSS and tracemalloc figures, one fresh process per run."""
+    script = Path(__file__).resolve().parent / "memory.py"
+    results: dict[str, Result] = {}
+    for count in counts:
+        for name, flags in (("memory", []), ("memory.low", ["--low-memory"])):
+            proc = subprocess.run(
+                [sys.executable, str(script), str(count), str(cycles), *flags],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results[f"{name}[n={count}]"] = json.loads(proc.stdout)
+    return results
+
+
+# -- Verdicts ------------------------------------------------------------------
+
+
+def check_budgets(
+    results: dict[str, Result], cli_budget_ms: float, cli_disk_budget_ms: float
+) -> list[str]:
+    # The import-time budget is enforced by tests/test_imports.py; here the
+    # import is only tracked against the baseline like everything else.
+    failures = []
+    startup_us = results["python.startup"]["min_us"]
+    for name, where, budget_ms in (
+        ("cli.status", "with a tray", cli_budget_ms),
+        ("cli.status.disk", "without a tray", cli_disk_budget_ms),
+    ):
+        cli_ms = (results[name]["min_us"] - startup_us) / 1000
+        if cli_ms > budget_ms:
+            failures.append(
+                f"gh-switcher status {where} took {cli_ms:.1f} ms over "
+                f"interpreter start-up (budget {budget_ms:.0f} ms)"
+            )
+    for name, result in sorted(results.items()):
+        growth = result.get("growth_kib", 0.0)
+        if growth > LEAK_BUDGET_KIB:
+            failures.append(
+                f"{name}: {growth:.0f} KiB retained across cycles "
+                f"(budget {LEAK_BUDGET_KIB:.0f} KiB)"
+            )
+    return failures
+
+
+def compare(
+    baseline: dict[str, Result], current: dict[str, Result], threshold: float
+) -> list[str]:
+    failures = []
+    for name in sorted(baseline.keys() & current.keys()):
+        for metric, unit, floor in (
+            ("median_us", "us", NOISE_FLOOR_US),
+            ("rss_kib", "KiB", NOISE_FLOOR_KIB),
+        ):
+            if metric not in baseline[name] or metric not in current[name]:
+                continue
+            before = baseline[name][metric]
+            after = current[name][metric]
+            if after > before * (1 + threshold) and after - before > floor:
+                failures.append(
+                    f"{name}: {metric} {after:.0f} {unit} vs baseline "
+                    f"{before:.0f} {unit} (+{(after / before - 1) * 100:.0f}%)"
+                )
+    return failures
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,71 @@
-from gh_switcher.app import GhSwitcherApp
+from __future__ import annotations
+
+import sys
+import time
+
+from gh_switcher import ipc
+
+# A tray that just took the instance lock needs a moment before its socket
+# answers; a second launch waits this long for it.
+FORWARD_TIMEOUT_SECONDS = 5.0
+_FORWARD_POLL_SECONDS = 0.1
+_MORE_USAGE = (
+    "       gh-switcher env USERNAME [--hostname HOST]\n"
+    "       gh-switcher audit [ROOT ...] [--json] [--jobs N]\n"
+    "       gh-switcher                  (start the tray)"
+)
 
 
 def main() -> None:
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command is not None:
+        sys.exit(_subcommand(command, sys.argv[2:]))
+
+    from gh_switcher import locks
+
+    if not locks.acquire_instance():
+        sys.exit(_forward("refresh"))
+
+    # Imported only once we know we are the tray: it pulls in the toolkit.
+    from gh_switcher.app import GhSwitcherApp
+
     app = GhSwitcherApp()
     app.run()
 
 
+def _subcommand(command: str, argv: list[str]) -> int:
+    # Each is imported on its own: scripts call these, and the tray, its
+    # toolkit and PIL must stay out of their start-up time.
+    if command == "env":
+        from gh_switcher.session import env_main
+
+        return env_main(argv)
+    if command == "audit":
+        from gh_switcher import audit
+
+        return audit.main(argv)
+    from gh_switcher import cli
+
+    if command not in cli.COMMANDS:
+        print(f"{cli.USAGE}\n{_MORE_USAGE}", file=sys.stderr)
+        return 2
+    return cli.main([command, *argv])
+
+
+def _forward(command: str) -> int:
+    """Hand *command* to the running instance; return the exit status."""
+    deadline = time.monotonic() + FORWARD_TIMEOUT_SECONDS
+    while (reply := ipc.request(command)) is None:
+        if time.monotonic() >= deadline:
+            print("gh-switcher is running but not answering", file=sys.stderr)
+            return 1
+        time.sleep(_FORWARD_POLL_SECONDS)
+    if reply.startswith("error "):
+        print(reply[len("error ") :].rstrip(), file=sys.stderr)
+        return 1
+    print("gh-switcher is already running", file=sys.stderr)
+    return 0
+
+
 if __name__ == "__main__":
     main()
@@ -1,40 +1,183 @@
 from __future__ import annotations
 
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-import yaml
+from gh_switcher import filecache, tracing
 
 
 HOSTS_FILE = Path.home() / ".config" / "gh" / "hosts.yml"
+DEFAULT_HOST = "github.com"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GhAccount:
     username: str
     active: bool
+    host: str = DEFAULT_HOST
 
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.host, self.username)
 
-def load_accounts() -> list[GhAccount]:
-    """Read accounts from ~/.config/gh/hosts.yml.
 
-    Returns an empty list if gh is not logged in.
+class Accounts:
+    """Logged-in accounts of every host, indexed by (host, username).
+
+    Hosts are ordered with github.com first, then as in hosts.yml.  Lookups
+    by key, by host and of each host's active account are O(1).
+    """
+
+    __slots__ = ("_active", "_by_host", "_by_key", "all", "hosts")
+
+    def __init__(self, accounts: Iterable[GhAccount] = ()) -> None:
+        self.all: tuple[GhAccount, ...] = tuple(accounts)
+        self._by_key = {a.key: a for a in self.all}
+        self._by_host: dict[str, list[GhAccount]] = {}
+        self._active: dict[str, GhAccount] = {}
+        for account in self.all:
+            self._by_host.setdefault(account.host, []).append(account)
+            if account.active:
+                self._active[account.host] = account
+        self.hosts: tuple[str, ...] = tuple(self._by_host)
+
+    def __iter__(self) -> Iterator[GhAccount]:
+        return iter(self.all)
+
+    def __len__(self) -> int:
+        return len(self.all)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Accounts) and (self is other or self.all == other.all)
+
+    def __hash__(self) -> int:
+        return hash(self.all)
+
+    def get(self, host: str, username: str) -> GhAccount | None:
+        return self._by_key.get((host, username))
+
+    def on_host(self, host: str) -> list[GhAccount]:
+        return self._by_host.get(host, [])
+
+    def active(self, host: str | None = None) -> GhAccount | None:
+        """Active account on *host*; by default on github.com, else the first."""
+        if host is not None:
+            return self._active.get(host)
+        if not self.hosts:
+            return None
+        return self._active.get(DEFAULT_HOST) or self._active.get(self.hosts[0])
+
+    def with_active(self, host: str, username: str) -> Accounts:
+        """Copy with *username* marked active on *host*."""
+        previous = self._active.get(host)
+        target = self._by_key.get((host, username))
+        if target is None or target is previous:
+            return self
+        swap = {target.key: GhAccount(username, True, host)}
+        if previous is not None:
+            swap[previous.key] = GhAccount(previous.username, False, host)
+        return Accounts(swap.get(a.key, a) for a in self.all)
+
+
+def load_accounts() -> Accounts:
+    """Read the accounts of every host from ~/.config/gh/hosts.yml.
+
+    The index is rebuilt only when the file changes.  It is empty if gh is
+    not logged in.
     """
-    if not HOSTS_FILE.exists():
-        return []
+    return filecache.load(HOSTS_FILE, _index_hosts) or Accounts()
+
+
+def parse_hosts(raw: bytes) -> dict[str, Any]:
+    """Parse the raw bytes of a hosts.yml file."""
+    with tracing.span("accounts.parse_hosts"):
+        plain = _parse_plain(raw)
+        if plain is not None:
+            return plain
+        # Deferred: importing PyYAML alone costs more than a headless
+        # `gh-switcher status`, and gh's own files rarely need it.
+        import yaml
+
+        # libyaml is several times faster than the pure-Python loader.
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        return yaml.load(raw, Loader=loader) or {}
 
-    with HOSTS_FILE.open() as fh:
-        data = yaml.safe_load(fh) or {}
 
-    github_data = data.get("github.com", {})
-    users: dict = github_data.get("users", {})
-    active_user: str = github_data.get("user", "")
+def _index_hosts(raw: bytes) -> Accounts:
+    data = parse_hosts(raw)
+    hosts = sorted(data, key=lambda host: host != DEFAULT_HOST)
+    accounts: list[GhAccount] = []
+    for host in hosts:
+        host_data = data[host]
+        if not isinstance(host_data, dict):
+            continue
+        active_user = host_data.get("user", "")
+        accounts.extend(
+            GhAccount(username=username, active=(username == active_user), host=host)
+            for username in host_data.get("users") or {}
+        )
+    return Accounts(accounts)
 
-    return [
-        GhAccount(username=username, active=(username == active_user))
-        for username in users
-    ]
+
+# -- Plain hosts.yml ----------------------------------------------------------
+
+# Scalars that read as a string in YAML 1.1 whatever their context: they
+# start with a letter and are none of the words YAML turns into a bool or null.
+_PLAIN_START = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+_PLAIN_CHARS = _PLAIN_START | frozenset("0123456789.-+@/")
+_YAML_WORDS = frozenset({"yes", "no", "true", "false", "on", "off", "null"})
+
+
+def _parse_plain(raw: bytes) -> dict[str, Any] | None:
+    """Parse the block mappings of plain scalars that gh writes.
+
+    Gives what PyYAML would, or None for anything else (flow style, quotes,
+    lists, tabs, numbers, ...), which is then left to PyYAML.
+    """
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    root: dict[str, Any] = {}
+    # (key indent, mapping) from the root down to the innermost open one.
+    stack: list[tuple[int, dict[str, Any]]] = [(0, root)]
+    # The last key had no value: a deeper line opens its mapping.
+    opened: tuple[dict[str, Any], str] | None = None
+    for line in text.split("\n"):
+        line = line.removesuffix("\r")
+        body = line.lstrip(" ")
+        if not body or body.startswith("#"):
+            continue
+        key, sep, rest = body.partition(":")
+        if not sep or rest[:1] not in ("", " ") or not _is_plain(key):
+            return None
+        value = rest.partition(" #")[0].strip()
+        indent = len(line) - len(body)
+        if opened is not None and indent > stack[-1][0]:
+            child: dict[str, Any] = {}
+            opened[0][opened[1]] = child
+            stack.append((indent, child))
+        opened = None
+        while stack[-1][0] > indent:
+            stack.pop()
+        if stack[-1][0] != indent:
+            return None
+        mapping = stack[-1][1]
+        if not value:
+            mapping[key] = None
+            opened = (mapping, key)
+        elif _is_plain(value):
+            mapping[key] = value
+        else:
+            return None
+    return root
 
 
-def active_account(accounts: list[GhAccount]) -> GhAccount | None:
-    return next((a for a in accounts if a.active), None)
+def _is_plain(scalar: str) -> bool:
+    return (
+        scalar[:1] in _PLAIN_START
+        and all(c in _PLAIN_CHARS for c in scalar)
+        and scalar.lower() not in _YAML_WORDS
+    )
@@ -1,22 +1,108 @@
 from __future__ import annotations
 
+import gc
+import json
 import subprocess
 import sys
-from pathlib import Path
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import replace
+from types import MappingProxyType
 
-from gh_switcher import accounts as accounts_mod
-from gh_switcher import autostart, config, icons, notifications
-from gh_switcher.accounts import GhAccount, load_accounts
-from gh_switcher.identity import get_current, set_identity
+from gh_switcher import (
+    autostart,
+    cli,
+    config,
+    credential,
+    filecache,
+    health,
+    icons,
+    ipc,
+    locks,
+    notifications,
+    rules,
+    tokens,
+    tracing,
+)
+from gh_switcher.accounts import DEFAULT_HOST, Accounts, GhAccount, load_accounts
+from gh_switcher.identity import (
+    GitConfigError,
+    GitIdentity,
+    get_current,
+    global_config_files,
+    set_identity,
+)
+from gh_switcher.state import AppState, Derived, Source
 from gh_switcher.switcher import SwitchError, run_switch
 from gh_switcher.tray import get_backend
-from gh_switcher.tray.base import MenuItem, TrayBackend
+from gh_switcher.tray.base import MenuItem, TrayBackend, TrayState
+from gh_switcher.watcher import FileWatcher, HostsWatcher
+from gh_switcher.worker import SwitchWorker
+
+
+# A single host with at most this many accounts is listed inline; otherwise
+# each host gets a submenu, so the top level stays small however many there are.
+FLAT_MENU_LIMIT = 12
+# Valid tokens are the norm and go unmarked.
+_HEALTH_SUFFIX = {"expired": " (expired)", "unknown": " (unknown)"}
 
 
 class GhSwitcherApp:
-    def __init__(self) -> None:
-        self._backend: TrayBackend = get_backend()
-        self._accounts: list[GhAccount] = []
+    def __init__(self, backend: TrayBackend | None = None) -> None:
+        self._backend: TrayBackend = backend or get_backend()
+        self._watcher = HostsWatcher(on_change=self._on_hosts_changed)
+        self._config_watcher = FileWatcher(
+            config.ACCOUNTS_FILE, on_change=self._on_config_changed
+        )
+        self._worker = SwitchWorker(perform=self._perform_switch)
+        self._health = health.HealthMonitor(
+            accounts=lambda: self._state.accounts, on_change=self.refresh
+        )
+        self._tokens = tokens.TokenCache()
+
+        # Inputs, each with its own change check.  hosts.yml is stat-checked
+        # by load_accounts itself; autostart only changes through our own
+        # toggle or an explicit Refresh.
+        self._accounts_source = Source(load_accounts)
+        self._identity_source = Source(get_current, token=_identity_stamps)
+        self._autostart_source = Source(autostart.is_enabled, token=lambda: None)
+        self._health_source = Source(
+            self._health.snapshot, token=lambda: self._health.version
+        )
+        # Outputs, recomputed only when their own inputs change.
+        self._icon = Derived(self._active_icon)
+        self._tooltip = Derived(self._build_tooltip)
+        self._menu = Derived(self._build_menu)
+
+        self._state_lock = threading.Lock()
+        self._state = AppState(
+            accounts=Accounts(),
+            identity=GitIdentity(name="", email=""),
+            autostart=False,
+            health=MappingProxyType({}),
+        )
+        self._shown: TrayState | None = None
+        # host -> username clicked but not switched yet, shown as active.
+        self._optimistic: dict[str, str] = {}
+        self._server = ipc.Server(
+            {
+                "active": lambda rest: f"{self._active_username(*rest.split()[:1])}\n",
+                "accounts": self._ipc_accounts,
+                "credential": self._ipc_credential,
+                "env": self._ipc_env,
+                "identity": self._ipc_identity,
+                "last-switch": self._ipc_last_switch,
+                "owner": self._ipc_owner,
+                "refresh": self._ipc_refresh,
+                "status": self._ipc_status,
+                "switch": self._ipc_switch,
+            }
+        )
+        self._published: str | None = None
+        self._last_switch: float | None = None
+        self._low_memory = False
+        self._prerendered: set[str] = set()
 
     # -- Public ---------------------------------------------------------------
 
@@ -26,89 +112,375 @@ class GhSwitcherApp:
     # -- Lifecycle ------------------------------------------------------------
 
     def _on_ready(self) -> None:
-        current_identity = get_current()
-        self._accounts = load_accounts()
-        config.ensure_exists(self._accounts, current_identity)
+        # First paint: placeholder icon and a bare menu, with no parsing,
+        # forks or rendering.  The real state follows from a background
+        # thread once the tray is on screen.
+        with self._state_lock:
+            self._show(self._state)
+        threading.Thread(
+            target=self._finish_startup, name="gh-switcher-startup", daemon=True
+        ).start()
+
+    def _finish_startup(self) -> None:
+        # Read once: switching modes at runtime would leave half of either.
+        try:
+            settings = config.get_settings()
+        except ValueError as exc:  # malformed accounts.toml
+            print(f"gh-switcher: using default settings: {exc}", file=sys.stderr)
+            settings = config.Settings()
+        self._low_memory = settings.low_memory
+        icons.set_low_memory(self._low_memory)
+        accounts = self._accounts_source.get()
+        config.ensure_exists(accounts, self._identity_source.get())
+        self._sync_rules()
+        self._prerender_icons(sweep=True)
+        self._health.start()
+        self.refresh()
+        self._watcher.start(accounts)
+        self._config_watcher.start()
+        self._server.start(on_subscribe=self._active_username)
+
+    def _on_hosts_changed(self) -> None:
+        self._tokens.clear()  # a re-login or refresh may have replaced them
         self.refresh()
+        self._prerender_icons()
+        self._health.poke()
 
-    def refresh(self) -> None:
-        self._accounts = load_accounts()
-        active = accounts_mod.active_account(self._accounts)
+    def _on_config_changed(self) -> None:
+        self._sync_rules()
 
-        icon_path = self._active_icon(active)
-        self._backend.set_icon(icon_path)
+    def refresh(self, force: bool = False) -> None:
+        """Bring the tray in line with the current state of every input.
+
+        Safe to call from any thread and as often as triggers fire: inputs
+        that did not change are not re-read, outputs whose inputs did not
+        change are not rebuilt, and an unchanged tray is not touched.
+        *force* re-reads every input regardless.
+        """
+        with tracing.span("app.refresh"):
+            # Reading may fork git or stat files; a menu click waiting on
+            # _state_lock must never wait for that.
+            accounts = self._accounts_source.get(force)
+            identity = self._identity_source.get(force)
+            autostart_enabled = self._autostart_source.get(force)
+            statuses = self._health_source.get(force)
+            with self._state_lock:
+                state = AppState(
+                    accounts=self._with_optimistic(accounts),
+                    identity=identity,
+                    autostart=autostart_enabled,
+                    health=statuses,
+                )
+                if not state.same_as(self._state):
+                    self._state = state
+                    self._show(state)
+        self._publish_active(accounts)
+
+    def _show(self, state: AppState) -> None:
+        # Called with _state_lock held, which also keeps applies in order;
+        # nothing here reads an input or touches the disk.
+        tray = TrayState(
+            icon=self._icon(state.active),
+            tooltip=self._tooltip(state.accounts),
+            menu=self._menu(state.accounts, state.health, state.autostart),
+        )
+        if tray != self._shown:
+            self._shown = tray
+            self._backend.apply(tray)
 
-        tooltip = f"gh: {active.username}" if active else "gh-switcher"
-        self._backend.set_tooltip(tooltip)
-        self._backend.set_menu(self._build_menu())
+    def _build_tooltip(self, accounts: Accounts) -> str:
+        hosts = accounts.hosts
+        if len(hosts) > 1:
+            active = [(h, accounts.active(h)) for h in hosts]
+            return "\n".join(f"{h}: {a.username if a else '-'}" for h, a in active)
+        active = accounts.active()
+        return f"gh: {active.username}" if active else "gh-switcher"
 
     # -- Switch ---------------------------------------------------------------
 
-    def switch_to(self, username: str) -> None:
+    def switch_to(self, host: str, username: str) -> None:
+        """Show *username* as active immediately and switch in the background."""
+        with self._state_lock:
+            self._optimistic[host] = username
+            accounts = self._state.accounts.with_active(host, username)
+            self._state = replace(self._state, accounts=accounts)
+            self._show(self._state)
+        self._worker.submit(host, username)
+
+    def _perform_switch(self, host: str, username: str) -> None:
+        """Worker thread: run the switch, then re-sync the tray with reality."""
+        try:
+            # Held across gh and git so another process's switch cannot land
+            # between the two and leave them naming different accounts.
+            with locks.switch_lock():
+                self._switch_gh_then_git(host, username)
+        finally:
+            # Whatever happened, the overlay must not outlive the attempt, or
+            # the tray keeps showing an account gh never switched to.
+            with self._state_lock:
+                # A newer click for this host stays shown until its own switch.
+                if self._optimistic.get(host) == username:
+                    del self._optimistic[host]
+            self.refresh()
+
+    def _switch_gh_then_git(self, host: str, username: str) -> None:
+        # ValueError: accounts.toml does not parse.
         try:
-            run_switch(username)
-        except SwitchError as exc:
+            run_switch(username, host, native=config.get_settings().native_switch)
+        except (SwitchError, OSError, ValueError) as exc:
             notifications.notify("Switch failed", str(exc))
             return
 
-        identity = config.get_identity(username)
-        if identity:
-            set_identity(identity.name, identity.email)
-        else:
+        try:
+            identity = config.get_identity(username)
+            if identity:
+                set_identity(identity.name, identity.email)
+        except (subprocess.CalledProcessError, OSError, ValueError) as exc:
+            notifications.notify("Git identity not set", str(exc))
+            return
+        if identity is None:
             notifications.notify(
                 "No git identity",
                 f"No git identity configured for {username!r} — edit accounts.toml",
             )
 
-        self.refresh()
+    def _with_optimistic(self, accounts: Accounts) -> Accounts:
+        for host, username in self._optimistic.items():
+            accounts = accounts.with_active(host, username)
+        return accounts
 
-    # -- Menu -----------------------------------------------------------------
+    # -- Status socket --------------------------------------------------------
 
-    def _build_menu(self) -> list[MenuItem]:
-        items: list[MenuItem] = []
+    def _active_username(self, host: str | None = None) -> str:
+        active = self._state.accounts.active(host)
+        return active.username if active else ""
 
-        for account in self._accounts:
-            username = account.username
-            items.append(
+    def _publish_active(self, accounts: Accounts) -> None:
+        """Tell subscribers about a settled change of active account."""
+        active = accounts.active()
+        username = active.username if active else ""
+        if username == self._published:
+            return
+        if self._published is not None:
+            self._last_switch = time.time()
+        self._published = username
+        self._server.publish(username)
+
+    def _ipc_accounts(self, _rest: str) -> str:
+        # As shown in the tray, so a switch still in flight counts as done.
+        return cli.format_accounts(
+            [(a.host, a.username, a.active) for a in self._state.accounts]
+        )
+
+    def _ipc_credential(self, rest: str) -> str:
+        """`credential HOST OWNER CWD`: the account for a git request.
+
+        CWD is the rest of the line, spaces and all.  Replies `USERNAME
+        TOKEN`; just `USERNAME` while the token is fetched, as for `env`; an
+        empty line when no rule applies or the account is not logged in to
+        HOST.
+        """
+        host, _, rest = rest.partition(" ")
+        owner, _, cwd = rest.partition(" ")
+        if not host or not owner or not cwd:
+            return "error usage: credential HOST OWNER CWD\n"
+        owner = credential.parse_owner(owner)
+        username = credential.resolve_account(host, owner, cwd)
+        if username is None or self._state.accounts.get(host, username) is None:
+            return "\n"
+        token = self._tokens.get(host, username)
+        return f"{username} {token}\n" if token else f"{username}\n"
+
+    def _ipc_env(self, rest: str) -> str:
+        """`env USERNAME [HOST]`: cached token and git identity, as JSON.
+
+        A token not cached yet comes back empty while it is fetched in the
+        background; the client then asks gh itself, this once.
+        """
+        args = rest.split()
+        if not args:
+            return "error usage: env USERNAME [HOST]\n"
+        username = args[0]
+        host = args[1] if len(args) > 1 else DEFAULT_HOST
+        if self._state.accounts.get(host, username) is None:
+            return f"error {username!r} is not logged in to {host}\n"
+        identity = config.get_identity(username)
+        reply = {
+            "token": self._tokens.get(host, username) or "",
+            "name": identity.name if identity else "",
+            "email": identity.email if identity else "",
+        }
+        return json.dumps(reply) + "\n"
+
+    def _ipc_identity(self, _rest: str) -> str:
+        current = self._identity_source.get()
+        return f"{current.name} <{current.email}>\n" if current.email else "\n"
+
+    def _ipc_last_switch(self, _rest: str) -> str:
+        if self._last_switch is None:
+            return "\n"
+        stamp = time.localtime(self._last_switch)
+        return time.strftime("%Y-%m-%dT%H:%M:%S%z", stamp) + "\n"
+
+    def _ipc_owner(self, path: str) -> str:
+        # The client sends an absolute path; the server's cwd is meaningless.
+        return f"{rules.account_for_path(path) or ''}\n" if path else "\n"
+
+    def _ipc_refresh(self, _rest: str) -> str:
+        # Re-reading inputs is I/O; keep it off the socket thread.
+        threading.Thread(
+            target=self.refresh, args=(True,), name="gh-switcher-refresh", daemon=True
+        ).start()
+        return "ok\n"
+
+    def _ipc_switch(self, rest: str) -> str:
+        """`switch USERNAME [HOST]`: queue a switch as if clicked in the menu."""
+        args = rest.split()
+        if not args:
+            return "error usage: switch USERNAME [HOST]\n"
+        username = args[0]
+        host = args[1] if len(args) > 1 else DEFAULT_HOST
+        if self._state.accounts.get(host, username) is None:
+            return f"error {username!r} is not logged in to {host}\n"
+        self.switch_to(host, username)
+        return "ok\n"
+
+    def _ipc_status(self, _rest: str) -> str:
+        current = self._identity_source.get()
+        status = {
+            "active": self._active_username(),
+            "name": current.name,
+            "email": current.email,
+            "last_switch": self._last_switch,
+        }
+        return json.dumps(status) + "\n"
+
+    # -- Menu -----------------------------------------------------------------
+
+    def _build_menu(
+        self,
+        accounts: Accounts,
+        statuses: Mapping[tuple[str, str], health.Status],
+        autostart_enabled: bool,
+    ) -> list[MenuItem]:
+        hosts = accounts.hosts
+        if len(hosts) == 1 and len(accounts) <= FLAT_MENU_LIMIT:
+            items = self._host_menu(hosts[0], accounts, statuses)
+        else:
+            items = [
                 MenuItem(
-                    label=username,
-                    callback=(lambda u: lambda: self.switch_to(u))(username),
-                    checked=account.active,
+                    label=self._host_label(accounts, host),
+                    submenu=(lambda h: lambda: self._current_host_menu(h))(host),
                 )
-            )
+                for host in hosts
+            ]
 
         items.append(MenuItem(label="", separator=True))
-        items.append(MenuItem(label="Refresh", callback=self.refresh))
+        items.append(MenuItem(label="Refresh", callback=lambda: self.refresh(True)))
         items.append(
             MenuItem(
                 label="Configure accounts...",
                 callback=self._open_config,
             )
         )
+        items.append(MenuItem(label="Diagnostics", callback=self._show_diagnostics))
         items.append(
             MenuItem(
-                label=f"Start on Login {'[✓]' if autostart.is_enabled() else '[ ]'}",
+                label=f"Start on Login {'[✓]' if autostart_enabled else '[ ]'}",
                 callback=self._toggle_autostart,
             )
         )
         items.append(MenuItem(label="", separator=True))
-        items.append(MenuItem(label="Quit", callback=self._backend.stop))
+        items.append(MenuItem(label="Quit", callback=self._quit))
 
         return items
 
+    def _current_host_menu(self, host: str) -> list[MenuItem]:
+        # Submenus are built when opened, from whatever state is current then.
+        state = self._state
+        return self._host_menu(host, state.accounts, state.health)
+
+    def _host_menu(
+        self,
+        host: str,
+        accounts: Accounts,
+        statuses: Mapping[tuple[str, str], health.Status],
+    ) -> list[MenuItem]:
+        return [
+            MenuItem(
+                label=self._account_label(account, statuses),
+                callback=(lambda u: lambda: self.switch_to(host, u))(account.username),
+                checked=account.active,
+                radio=True,
+            )
+            for account in accounts.on_host(host)
+        ]
+
+    def _account_label(
+        self, account: GhAccount, statuses: Mapping[tuple[str, str], health.Status]
+    ) -> str:
+        status = statuses.get(account.key)
+        return account.username + _HEALTH_SUFFIX.get(status or "", "")
+
+    def _host_label(self, accounts: Accounts, host: str) -> str:
+        active = accounts.active(host)
+        return f"{host} ({active.username})" if active else host
+
     # -- Helpers --------------------------------------------------------------
 
-    def _active_icon(self, active: GhAccount | None) -> Path:
+    def _active_icon(self, active: GhAccount | None) -> icons.Icon:
         if active:
             return icons.generate_icon(active.username, active=True)
-        # Fallback: grey placeholder
-        placeholder = icons.CACHE_DIR / "_placeholder.png"
-        if not placeholder.exists():
-            icons.CACHE_DIR.mkdir(parents=True, exist_ok=True)
-            from PIL import Image
+        return icons.placeholder_icon()
 
-            Image.new("RGBA", (64, 64), (120, 120, 120, 255)).save(placeholder, "PNG")
-        return placeholder
+    def _prerender_icons(self, sweep: bool = False) -> None:
+        """Render every account's icons off the UI thread.
+
+        In low-memory mode images are not kept, so this is only worth doing
+        for backends that load icons from files, which then stay on disk.
+        With *sweep*, the disk cache is trimmed first on the same thread, so
+        the sweep never removes a file that prerendering just vouched for.
+        """
+        usernames: list[str] = []
+        if not (self._low_memory and not self._backend.icon_files):
+            # Only accounts not seen before: hosts.yml changes on every switch.
+            usernames = [
+                a.username
+                for a in self._accounts_source.get()
+                if a.username not in self._prerendered
+            ]
+            self._prerendered.update(usernames)
+        if not usernames and not sweep:
+            return
+        threading.Thread(
+            target=self._prerender_worker,
+            args=(usernames, sweep),
+            name="gh-switcher-icons",
+            daemon=True,
+        ).start()
+
+    def _prerender_worker(self, usernames: list[str], sweep: bool) -> None:
+        if sweep:
+            icons.sweep_disk_cache()
+        if not usernames:
+            return
+        icons.prerender(usernames, files=self._backend.icon_files)
+        if self._low_memory:
+            icons.release_render_state()
+            _release_heap()
+
+    def _sync_rules(self) -> None:
+        """Apply accounts.toml `paths`/`remotes` rules to the global gitconfig.
+
+        A broken accounts.toml leaves the last rules that applied in place.
+        """
+        try:
+            rules.sync()
+        except ValueError as exc:  # tomllib.TOMLDecodeError, bad UTF-8
+            print(f"gh-switcher: accounts.toml not applied: {exc}", file=sys.stderr)
+            notifications.notify("accounts.toml not applied", str(exc))
+        except (GitConfigError, OSError) as exc:
+            notifications.notify("Directory rules not applied", str(exc))
 
     def _open_config(self) -> None:
         path = config.config_path()
@@ -124,9 +496,39 @@ class GhSwitcherApp:
         elif sys.platform == "darwin":
             subprocess.Popen(["open", str(path)])
 
+    def _show_diagnostics(self) -> None:
+        path = tracing.export()
+        notifications.notify(
+            "gh-switcher timings", f"{tracing.format_summary()}\n\nSaved to {path}"
+        )
+
+    def _quit(self) -> None:
+        self._watcher.stop()
+        self._config_watcher.stop()
+        self._health.stop()
+        self._server.stop()
+        self._backend.stop()
+
     def _toggle_autostart(self) -> None:
-        if autostart.is_enabled():
+        if self._state.autostart:
             autostart.disable()
         else:
             autostart.enable()
+        self._autostart_source.invalidate()
         self.refresh()
+
+
+def _release_heap() -> None:
+    """Collect garbage and hand freed heap pages back to the OS (glibc)."""
+    gc.collect()
+    if sys.platform == "linux":
+        try:
+            import ctypes
+
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass  # not glibc
+
+
+def _identity_stamps() -> tuple[filecache.Stamp | None, ...]:
+    return tuple(filecache.stamp(path) for path in global_config_files())
@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import platformdirs
+
+from gh_switcher import config, identity, rules, tracing
+from gh_switcher.identity import GitConfigError
+
+CACHE_FILE = Path(platformdirs.user_cache_dir("gh-switcher")) / "audit.json"
+# How far below a workspace root to look for clones.
+DISCOVERY_DEPTH = 4
+GIT_TIMEOUT_SECONDS = 300.0
+
+_CACHE_VERSION = 1
+_FIELD = "\x1f"
+_LOG_FORMAT = _FIELD.join(("%H", "%ae", "%an", "%at", "%s"))
+
+
+class AuditError(Exception):
+    """Raised when there is nothing to audit, e.g. no workspace roots."""
+
+
+@dataclass(frozen=True, slots=True)
+class Finding:
+    """A commit authored as one of our accounts in another account's repo."""
+
+    repo: str
+    commit: str
+    author_email: str
+    author_name: str
+    timestamp: int
+    subject: str
+    expected: str  # account whose repo this is
+
+
+@dataclass(frozen=True, slots=True)
+class Skipped:
+    """A repository that could not be audited, and why."""
+
+    repo: str
+    reason: str
+
+
+@dataclass(frozen=True, slots=True)
+class Report:
+    """What an audit found, and the repositories it could not read."""
+
+    findings: list[Finding]
+    skipped: list[Skipped]
+
+
+@dataclass(frozen=True, slots=True)
+class _Job:
+    repo: str
+    expected: str
+    expected_email: str
+    # (lower-cased email, username) of every other configured account.
+    others: tuple[tuple[str, str], ...]
+    head: str | None  # resolved without git where possible
+    cached: _Entry | None
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry:
+    head: str
+    fingerprint: str
+    findings: tuple[Finding, ...]
+
+
+def audit(roots: Iterable[str], workers: int | None = None) -> Report:
+    """Find commits made under the wrong account in every clone under *roots*.
+
+    A repository's account is what the `paths`/`remotes` rules of
+    accounts.toml resolve to.  A commit is flagged when its author email is
+    another configured account's; commits by anyone else are not ours to
+    judge.  Repositories whose HEAD is unchanged since the last run are not
+    scanned again, and those that moved only have their new commits read.
+    One that cannot be read is skipped and the others are still audited.
+    """
+    identities = config.get_identities()
+    emails = {u: i.email.lower() for u, i in identities.items()}
+    cache = _load_cache()
+    jobs: list[_Job] = []
+    skipped: list[Skipped] = []
+    with tracing.span("audit.discover"):
+        for repo in find_repos(roots):
+            try:
+                urls = _remote_urls(repo)
+            except (GitConfigError, OSError) as exc:
+                skipped.append(Skipped(repo, f"unreadable git config: {exc}"))
+                continue
+            expected = rules.account_for_repo(repo, urls)
+            if expected is None or expected not in emails:
+                continue
+            others = tuple(
+                sorted((e, u) for u, e in emails.items() if e != emails[expected])
+            )
+            jobs.append(
+                _Job(
+                    repo,
+                    expected,
+                    emails[expected],
+                    others,
+                    _read_head(repo),
+                    cache.get(repo),
+                )
+            )
+
+    results: dict[str, _Entry] = {}
+    try:
+        with tracing.span("audit.scan"):
+            for repo, entry in _run(jobs, workers):
+                if isinstance(entry, Skipped):
+                    skipped.append(entry)
+                elif entry is not None:
+                    results[repo] = entry
+    finally:
+        # Saved even when interrupted, so the next run resumes from here.
+        # Clones deleted since are dropped rather than kept forever.
+        kept = {repo: e for repo, e in cache.items() if _is_repo(repo)}
+        _save_cache({**kept, **results})
+    findings = [finding for entry in results.values() for finding in entry.findings]
+    return Report(findings, skipped)
+
+
+def find_repos(roots: Iterable[str], depth: int = DISCOVERY_DEPTH) -> Iterator[str]:
+    """Yield every git work tree up to *depth* directories below *roots*.
+
+    Hidden directories and symlinks are skipped, and nothing below a work
+    tree is searched, so submodules and vendored clones are not reported.
+    """
+    seen: set[str] = set()
+    stack = [(os.path.abspath(os.path.expanduser(r)), 0) for r in roots]
+    while stack:
+        path, level = stack.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        if _is_repo(path):
+            yield path
+            continue
+        if level >= depth:
+            continue
+        try:
+            with os.scandir(path) as it:
+                children = [
+                    e.path
+                    for e in it
+                    if not e.name.startswith(".") and e.is_dir(follow_symlinks=False)
+                ]
+        except OSError:
+            continue
+        stack.extend((child, level + 1) for child in sorted(children, reverse=True))
+
+
+def main(argv: list[str] | None = None) -> int:
+    """`gh-switcher audit`: list commits made under the wrong account."""
+    parser = argparse.ArgumentParser(
+        prog="gh-switcher audit",
+        description="List commits authored as the wrong account in local clones.",
+    )
+    parser.add_argument(
+        "roots",
+        nargs="*",
+        help="directories to search (default: [settings] workspace_roots, "
+        "else every account's `paths`)",
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    parser.add_argument("--jobs", type=int, help="parallel scans (default: CPUs)")
+    args = parser.parse_args(argv)
+
+    try:
+        report = audit(_roots(args.roots), workers=args.jobs)
+    except AuditError as exc:
+        print(f"gh-switcher: {exc}", file=sys.stderr)
+        return 2
+    for skip in sorted(report.skipped, key=lambda s: s.repo):
+        print(f"gh-switcher: skipped {skip.repo}: {skip.reason}", file=sys.stderr)
+    if args.json:
+        for finding in report.findings:
+            print(json.dumps(asdict(finding)))
+    else:
+        _print_report(report.findings)
+    return 1 if report.findings else 0
+
+
+# -- Scanning -----------------------------------------------------------------
+
+
+def _run(
+    jobs: list[_Job], workers: int | None
+) -> Iterator[tuple[str, _Entry | Skipped | None]]:
+    pending: list[_Job] = []
+    for job in jobs:
+        if job.cached is not None and _is_fresh(job, job.cached):
+            yield job.repo, job.cached  # unchanged: no process, no fork
+        else:
+            pending.append(job)
+    if len(pending) <= 1:
+        for job in pending:
+            yield job.repo, _scan(job)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job, entry in zip(pending, pool.map(_scan, pending, chunksize=4)):
+            yield job.repo, entry
+
+
+def _scan(job: _Job) -> _Entry | Skipped | None:
+    """Runs in a worker process: read the commits not covered by the cache."""
+    try:
+        return _scan_commits(job)
+    except FileNotFoundError:
+        return Skipped(job.repo, "git is not installed")
+    except subprocess.TimeoutExpired:
+        return Skipped(job.repo, f"git did not answer within {GIT_TIMEOUT_SECONDS:g} s")
+    except OSError as exc:
+        return Skipped(job.repo, f"could not run git: {exc}")
+
+
+def _scan_commits(job: _Job) -> _Entry | Skipped | None:
+    head = job.head or _git_head(job.repo)
+    if head is None:
+        return None  # no commits yet
+    fingerprint = _fingerprint(job)
+    cached = job.cached
+    if cached is not None and cached.fingerprint == fingerprint:
+        if cached.head == head:
+            return cached
+        if _is_ancestor(job.repo, cached.head, head):
+            new = _log(job, head, f"^{cached.head}")
+            if new is not None:
+                return _Entry(head, fingerprint, new + cached.findings)
+    # First scan, rewritten history, or a changed accounts.toml.
+    findings = _log(job, head)
+    if findings is None:
+        return Skipped(job.repo, "git log failed")
+    return _Entry(head, fingerprint, findings)
+
+
+def _log(job: _Job, *revisions: str) -> tuple[Finding, ...] | None:
+    """Matching commits, streamed from one `git log` however long the history.
+
+    git itself filters on the other accounts' emails, so only candidate
+    commits ever cross the pipe.  None if git failed.
+    """
+    owners = dict(job.others)
+    if not owners:
+        return ()
+    authors = [f"--author=<{email}>" for email in owners]
+    proc = subprocess.Popen(
+        [
+            "git",
+            "-C",
+            job.repo,
+            "log",
+            f"--format={_LOG_FORMAT}",
+            "--fixed-strings",
+            "--regexp-ignore-case",
+            *authors,
+            *revisions,
+            "--",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    assert proc.stdout is not None
+    findings: list[Finding] = []
+    with proc:
+        for line in proc.stdout:
+            commit, email, name, timestamp, subject = line.rstrip("\n").split(_FIELD, 4)
+            # --author is a substring match; only exact addresses count.
+            if email.lower() in owners:
+                findings.append(
+                    Finding(
+                        repo=job.repo,
+                        commit=commit,
+                        author_email=email,
+                        author_name=name,
+                        timestamp=int(timestamp),
+                        subject=subject,
+                        expected=job.expected,
+                    )
+                )
+    return tuple(findings) if proc.returncode == 0 else None
+
+
+def _is_fresh(job: _Job, cached: _Entry) -> bool:
+    return (
+        job.head is not None
+        and job.head == cached.head
+        and cached.fingerprint == _fingerprint(job)
+    )
+
+
+def _fingerprint(job: _Job) -> str:
+    # What the findings depend on besides the commits themselves.
+    text = json.dumps([job.expected, job.expected_email, job.others])
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _is_ancestor(repo: str, old: str, new: str) -> bool:
+    result = subprocess.run(
+        ["git", "-C", repo, "merge-base", "--is-ancestor", old, new],
+        capture_output=True,
+        timeout=GIT_TIMEOUT_SECONDS,
+    )
+    return result.returncode == 0
+
+
+def _git_head(repo: str) -> str | None:
+    result = subprocess.run(
+        ["git", "-C", repo, "rev-parse", "--verify", "--quiet", "HEAD"],
+        capture_output=True,
+        text=True,
+        timeout=GIT_TIMEOUT_SECONDS,
+    )
+    return result.stdout.strip() or None if result.returncode == 0 else None
+
+
+# -- Repository files ---------------------------------------------------------
+
+
+def _is_repo(path: str) -> bool:
+    return os.path.lexists(os.path.join(path, ".git"))
+
+
+def _read_head(repo: str) -> str | None:
+    """HEAD's commit id read from the files, or None to ask git instead.
+
+    Covers a plain `.git` directory with loose or packed refs; worktrees,
+    reftables and the like are left to git.
+    """
+    gitdir = os.path.join(repo, ".git")
+    try:
+        with open(os.path.join(gitdir, "HEAD"), encoding="utf-8") as fh:
+            head = fh.read().strip()
+        if not head.startswith("ref: "):
+            return head or None  # detached
+        ref = head[len("ref: ") :]
+        try:
+            with open(os.path.join(gitdir, ref), encoding="utf-8") as fh:
+                return fh.read().strip() or None
+        except FileNotFoundError:
+            pass
+        with open(os.path.join(gitdir, "packed-refs"), encoding="utf-8") as fh:
+            for line in fh:
+                sha, _, name = line.rstrip("\n").partition(" ")
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+
+def _remote_urls(repo: str) -> list[str]:
+    entries = identity.read_config(Path(repo, ".git", "config"), includes=False)
+    return [
+        e.value
+        for e in entries
+        if e.section == "remote" and e.key == "url" and e.value is not None
+    ]
+
+
+# -- Cache and report ---------------------------------------------------------
+
+
+def _roots(given: list[str]) -> list[str]:
+    if given:
+        return given
+    roots = list(config.get_settings().workspace_roots)
+    if not roots:
+        roots = [prefix for rule in config.get_rules() for prefix in rule.paths]
+    if not roots:
+        raise AuditError(
+            "no directories to audit: pass some, or set workspace_roots "
+            "under [settings] in accounts.toml"
+        )
+    return roots
+
+
+def _load_cache() -> dict[str, _Entry]:
+    try:
+        data = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+        return {}
+    entries: dict[str, _Entry] = {}
+    for repo, entry in data.get("repos", {}).items():
+        try:
+            findings = tuple(Finding(**f) for f in entry["findings"])
+            entries[repo] = _Entry(entry["head"], entry["fingerprint"], findings)
+        except (KeyError, TypeError):
+            continue
+    return entries
+
+
+def _save_cache(entries: dict[str, _Entry]) -> None:
+    data = {
+        "version": _CACHE_VERSION,
+        "repos": {
+            repo: {
+                "head": e.head,
+                "fingerprint": e.fingerprint,
+                "findings": [asdict(f) for f in e.findings],
+            }
+            for repo, e in sorted(entries.items())
+        },
+    }
+    tmp = CACHE_FILE.with_name(f".{CACHE_FILE.name}.{os.getpid()}.tmp")
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data) + "\n", encoding="utf-8")
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+def _print_report(findings: list[Finding]) -> None:
+    import time
+
+    if not findings:
+        print("No commits under the wrong account.")
+        return
+    identities = config.get_identities()
+    by_repo: dict[str, list[Finding]] = {}
+    for finding in findings:
+        by_repo.setdefault(finding.repo, []).append(finding)
+    home = os.path.expanduser("~")
+    for repo, items in sorted(by_repo.items()):
+        expected = items[0].expected
+        shown = "~" + repo[len(home) :] if repo.startswith(home + os.sep) else repo
+        email = identities[expected].email if expected in identities else "?"
+        print(f"{shown}  (should be {expected} <{email}>)")
+        for f in sorted(items, key=lambda f: f.timestamp):
+            day = time.strftime("%Y-%m-%d", time.localtime(f.timestamp))
+            print(f"  {f.commit[:12]}  {day}  {f.author_email}  {f.subject}")
+    commits = "commit" if len(findings) == 1 else "commits"
+    repos = "repository" if len(by_repo) == 1 else "repositories"
+    print(f"{len(findings)} {commits} in {len(by_repo)} {repos}")
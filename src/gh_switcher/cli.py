@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import sys
+
+from gh_switcher import ipc
+
+# Keybindings and launchers run these many times a day.  With a tray running
+# each command is a socket round trip or two and nothing else is imported;
+# accounts, config, identity and switcher (tens of ms with PyYAML) are only
+# loaded to work from disk without one.  Never import the tray from here.
+DEFAULT_HOST = "github.com"
+COMMANDS = ("list", "status", "switch", "next", "prev")
+USAGE = "usage: gh-switcher list|status|switch USERNAME|next|prev [--hostname HOST]"
+
+
+def main(argv: list[str]) -> int:
+    """Headless subcommands: list, inspect and switch accounts from scripts.
+
+    They act through the running tray when there is one, so it stays in
+    sync, and otherwise on gh's and git's files directly.
+    """
+    args = list(argv)
+    host = None
+    if "--hostname" in args:
+        at = args.index("--hostname")
+        if at + 1 >= len(args):
+            print(USAGE, file=sys.stderr)
+            return 2
+        host = args.pop(at + 1)
+        del args[at]
+    if not args or args[0] not in COMMANDS or any(a.startswith("-") for a in args):
+        print(USAGE, file=sys.stderr)
+        return 2
+    command, rest = args[0], args[1:]
+    if len(rest) != (1 if command == "switch" else 0):
+        print(USAGE, file=sys.stderr)
+        return 2
+
+    if command == "list":
+        return _list(host)
+    if command == "status":
+        return _status(host)
+    if command == "switch":
+        return _switch(host or DEFAULT_HOST, rest[0])
+    return _step(host or DEFAULT_HOST, 1 if command == "next" else -1)
+
+
+def format_accounts(accounts: list[tuple[str, str, bool]]) -> str:
+    """The `accounts` socket reply: `HOST USERNAME`, with ` *` when active."""
+    return "".join(f"{h} {u}{' *' if a else ''}\n" for h, u, a in accounts)
+
+
+# -- Commands ----------------------------------------------------------------
+
+
+def _list(host: str | None) -> int:
+    for h, username, active in _accounts():
+        if host is None or h == host:
+            suffix = "" if h == DEFAULT_HOST else f" ({h})"
+            print(f"{'*' if active else ' '} {username}{suffix}")
+    return 0
+
+
+def _status(host: str | None) -> int:
+    for h, username, active in _accounts():
+        if active and (host is None or h == host):
+            print(f"{h}: {username}")
+    print(f"git: {_identity() or '(not set)'}")
+    return 0
+
+
+def _step(host: str, step: int) -> int:
+    """Switch to the account after (or before) the active one on *host*."""
+    accounts = _accounts()
+    names = [u for h, u, _ in accounts if h == host]
+    if not names:
+        print(f"gh-switcher: no accounts on {host}", file=sys.stderr)
+        return 1
+    active = next((u for h, u, a in accounts if h == host and a), None)
+    at = names.index(active) if active in names else (-1 if step > 0 else 0)
+    target = names[(at + step) % len(names)]
+    return 0 if target == active else _switch(host, target)
+
+
+def _switch(host: str, username: str) -> int:
+    # The tray queues it like a menu click and shows it at once.
+    reply = ipc.request(f"switch {username} {host}")
+    if reply is None:
+        return _switch_locally(host, username)
+    if reply.startswith("error "):
+        print(f"gh-switcher: {reply[len('error ') :].rstrip()}", file=sys.stderr)
+        return 1
+    return 0
+
+
+# -- Tray or disk ------------------------------------------------------------
+
+
+def _accounts() -> list[tuple[str, str, bool]]:
+    """(host, username, active) of every account, tray's view first."""
+    reply = ipc.request("accounts")
+    # Empty also while a tray that just started has not read hosts.yml.
+    if reply and not reply.startswith("error "):
+        return [_parse_account(line) for line in reply.splitlines() if line]
+    from gh_switcher.accounts import load_accounts
+
+    return [(a.host, a.username, a.active) for a in load_accounts()]
+
+
+def _parse_account(line: str) -> tuple[str, str, bool]:
+    host, username, *marker = line.split()
+    return host, username, marker == ["*"]
+
+
+def _identity() -> str:
+    reply = ipc.request("identity")
+    if reply is not None and not reply.startswith("error "):
+        return reply.strip()
+    from gh_switcher.identity import get_current
+
+    current = get_current()
+    return f"{current.name} <{current.email}>" if current.email else ""
+
+
+def _switch_locally(host: str, username: str) -> int:
+    import subprocess
+
+    from gh_switcher import config, locks
+    from gh_switcher.accounts import load_accounts
+    from gh_switcher.identity import set_identity
+    from gh_switcher.switcher import SwitchError, run_switch
+
+    if load_accounts().get(host, username) is None:
+        print(f"gh-switcher: {username!r} is not logged in to {host}", file=sys.stderr)
+        return 1
+    # Same order and lock as the tray, so a concurrent switch cannot land
+    # between gh and git.
+    with locks.switch_lock():
+        try:
+            run_switch(username, host, native=config.get_settings().native_switch)
+        except (SwitchError, OSError) as exc:
+            print(f"gh-switcher: switch failed: {exc}", file=sys.stderr)
+            return 1
+        identity = config.get_identity(username)
+        if identity is None:
+            print(
+                f"gh-switcher: no git identity for {username!r} in accounts.toml; "
+                "git keeps the previous one",
+                file=sys.stderr,
+            )
+            return 0
+        try:
+            set_identity(identity.name, identity.email)
+        except (subprocess.CalledProcessError, OSError) as exc:
+            print(f"gh-switcher: could not set git identity: {exc}", file=sys.stderr)
+            return 1
+    return 0
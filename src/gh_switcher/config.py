@@ -1,20 +1,24 @@
 from __future__ import annotations
 
-import tomllib
+from collections.abc import Mapping
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 import platformdirs
 
-from gh_switcher.accounts import GhAccount
+from gh_switcher import filecache
+from gh_switcher.accounts import Accounts
 from gh_switcher.identity import GitIdentity
 
 
 CONFIG_DIR = Path(platformdirs.user_config_dir("gh-switcher"))
 ACCOUNTS_FILE = CONFIG_DIR / "accounts.toml"
+# Reserved table for app-wide options; "settings" can never be a GitHub login.
+SETTINGS_TABLE = "settings"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AccountConfig:
     username: str
     name: str
@@ -24,11 +28,40 @@ class AccountConfig:
         return GitIdentity(name=self.name, email=self.email)
 
 
+@dataclass(frozen=True, slots=True)
+class AccountRules:
+    """Directories and remote owners where *username*'s identity applies."""
+
+    username: str
+    identity: GitIdentity
+    paths: tuple[str, ...]
+    remotes: tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    native_switch: bool = False
+    low_memory: bool = False
+    workspace_roots: tuple[str, ...] = ()
+
+
+def get_settings() -> Settings:
+    """Return app-wide options from the [settings] table of accounts.toml."""
+    entry = _read().get(SETTINGS_TABLE)
+    if not isinstance(entry, Mapping):
+        entry = {}
+    return Settings(
+        native_switch=bool(entry.get("native_switch", False)),
+        low_memory=bool(entry.get("low_memory", False)),
+        workspace_roots=_strings(entry.get("workspace_roots")),
+    )
+
+
 def get_identity(username: str) -> GitIdentity | None:
     """Return the git identity for *username*, or None if not configured."""
     data = _read()
     entry = data.get(username)
-    if not entry:
+    if not entry or not isinstance(entry, Mapping):
         return None
     name = entry.get("name", "").strip()
     email = entry.get("email", "").strip()
@@ -37,19 +70,54 @@ def get_identity(username: str) -> GitIdentity | None:
     return GitIdentity(name=name, email=email)
 
 
-def ensure_exists(accounts: list[GhAccount], current_identity: GitIdentity) -> None:
+def get_identities() -> dict[str, GitIdentity]:
+    """Return every account's complete git identity, keyed by username."""
+    identities: dict[str, GitIdentity] = {}
+    for username, entry in _read().items():
+        # Stray top-level keys (`foo = "x"`) are not accounts.
+        if username == SETTINGS_TABLE or not isinstance(entry, Mapping):
+            continue
+        identity = get_identity(username)
+        if identity:
+            identities[username] = identity
+    return identities
+
+
+def get_rules() -> list[AccountRules]:
+    """Return every account's `paths` and `remotes` rules, in file order.
+
+    Accounts without a complete git identity are skipped, since there would
+    be nothing for their rules to apply.
+    """
+    rules: list[AccountRules] = []
+    for username, entry in _read().items():
+        if username == SETTINGS_TABLE or not isinstance(entry, Mapping):
+            continue
+        paths = _strings(entry.get("paths"))
+        remotes = _strings(entry.get("remotes"))
+        identity = get_identity(username)
+        if identity and (paths or remotes):
+            rules.append(AccountRules(username, identity, paths, remotes))
+    return rules
+
+
+def ensure_exists(accounts: Accounts, current_identity: GitIdentity) -> None:
     """First-run: create accounts.toml if absent.
 
     Populates the active account from *current_identity*; other accounts get
-    stub entries that the user must fill in.
+    stub entries that the user must fill in.  Identities are per username, so
+    a login present on several hosts gets one entry.
     """
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
     if ACCOUNTS_FILE.exists():
         return
 
     data: dict[str, dict[str, str]] = {}
+    primary = accounts.active()
     for account in accounts:
-        if account.active:
+        if account.username in data:
+            continue
+        if account == primary:
             data[account.username] = {
                 "name": current_identity.name,
                 "email": current_identity.email,
@@ -67,11 +135,23 @@ def config_path() -> Path:
     return ACCOUNTS_FILE
 
 
-def _read() -> dict[str, dict[str, str]]:
-    if not ACCOUNTS_FILE.exists():
-        return {}
-    with ACCOUNTS_FILE.open("rb") as fh:
-        return tomllib.load(fh)
+def _read() -> Mapping[str, Mapping[str, Any]]:
+    return filecache.load(ACCOUNTS_FILE, _parse_toml) or {}
+
+
+def _strings(value: Any) -> tuple[str, ...]:
+    # A single string is accepted as shorthand for a one-element list.
+    if isinstance(value, str):
+        value = (value,)
+    if not isinstance(value, tuple):
+        return ()
+    return tuple(v.strip() for v in value if isinstance(v, str) and v.strip())
+
+
+def _parse_toml(raw: bytes) -> dict[str, dict[str, Any]]:
+    import tomllib  # deferred: first needed after the tray is on screen
+
+    return tomllib.loads(raw.decode("utf-8"))
 
 
 def _write(data: dict[str, dict[str, str]]) -> None:
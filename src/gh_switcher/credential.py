@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import os
+import sys
+
+from gh_switcher import ipc
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# git runs the helper on every HTTPS fetch and push, so it imports only ipc:
+# the reply is a plain line rather than JSON (json drags in re and enum),
+# and rules, with its config parsing, only when no tray is running.
+_USAGE = "usage: git-credential-gh-switcher get|store|erase"
+_NO_OWNER = "-"
+
+
+def main(argv: list[str] | None = None) -> int:
+    """git credential helper serving the token of the remote's account.
+
+    With `credential.helper = gh-switcher`, git runs it as
+    `git-credential-gh-switcher get` and reads `username=`/`password=` back.
+    The account comes from accounts.toml `remotes` rules for the repository
+    owner, which git only sends with `credential.useHttpPath`, and otherwise
+    from `paths` rules for the working directory.  Nothing is printed when
+    no rule applies, so git moves on to its next helper.
+    """
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 1:
+        print(_USAGE, file=sys.stderr)
+        return 2
+    if args[0] != "get":
+        return 0  # store/erase: the tokens belong to gh
+    request = _read_request(sys.stdin)
+    if request.get("protocol") != "https" or not request.get("host"):
+        return 0
+    owner = request.get("path", "").split("/", 1)[0]
+    found = lookup(request["host"], owner, os.getcwd())
+    if found is not None:
+        username, token = found
+        print(f"username={username}\npassword={token}")
+    return 0
+
+
+def lookup(host: str, owner: str, cwd: str) -> tuple[str, str] | None:
+    """Account and token for a request to *owner* on *host* from *cwd*.
+
+    The running tray answers from memory; without one, or on its first
+    request for the account, the token comes from `gh auth token`.
+    """
+    reply = ipc.request(f"credential {host} {owner or _NO_OWNER} {cwd}")
+    if reply is not None and not reply.startswith("error "):
+        # "USERNAME TOKEN", just "USERNAME" while the token is being fetched,
+        # or an empty line when no rule applies.
+        username, _, token = reply.strip().partition(" ")
+        if not username:
+            return None
+    else:
+        username, token = resolve_account(host, owner, cwd), ""
+    if username is None:
+        return None
+    if not token:
+        token = _fetch_token(host, username)
+    return (username, token) if token else None
+
+
+def resolve_account(host: str, owner: str, cwd: str) -> str | None:
+    """The account whose rules cover *owner*'s repositories on *host*, or *cwd*.
+
+    A `paths` rule names the account whatever the host; `lookup` then finds
+    nothing if that login has no token there.
+    """
+    from gh_switcher import rules
+
+    by_owner = owner and rules.account_for_owner(owner, host)
+    return by_owner or rules.account_for_path(cwd)
+
+
+def parse_owner(arg: str) -> str:
+    """Undo the placeholder `lookup` sends when git gave no path."""
+    return "" if arg == _NO_OWNER else arg
+
+
+def _read_request(lines: Iterable[str]) -> dict[str, str]:
+    request = {}
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            break
+        key, sep, value = line.partition("=")
+        if sep:
+            request[key] = value
+    return request
+
+
+def _fetch_token(host: str, username: str) -> str | None:
+    import subprocess
+
+    from gh_switcher.tokens import fetch_token
+
+    try:
+        return fetch_token(host, username)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        print(f"gh-switcher: could not run gh: {exc}", file=sys.stderr)
+        return None
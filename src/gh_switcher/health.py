@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Literal
+
+import platformdirs
+
+from gh_switcher import tokens, tracing
+from gh_switcher.accounts import Accounts, GhAccount
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+Status = Literal["valid", "expired", "unknown"]
+
+CACHE_FILE = Path(platformdirs.user_cache_dir("gh-switcher")) / "health.json"
+# How long a result is trusted; failures to reach GitHub are retried sooner.
+TTL_SECONDS: dict[Status, float] = {
+    "valid": 30 * 60,
+    "expired": 30 * 60,
+    "unknown": 5 * 60,
+}
+MAX_WORKERS = 2
+# Checks start at least this far apart, plus up to JITTER_SECONDS, so a wake
+# from suspend with every entry stale does not fork a burst of gh processes.
+MIN_INTERVAL_SECONDS = 1.0
+JITTER_SECONDS = 1.0
+STARTUP_DELAY_SECONDS = 5.0
+SWEEP_INTERVAL_SECONDS = 60.0
+CHECK_TIMEOUT_SECONDS = 20.0
+
+_CACHE_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
+class _Result:
+    status: Status
+    checked: float  # wall clock, so results survive a restart
+
+
+def check_account(account: GhAccount) -> Status:
+    """Ask GitHub whether *account*'s stored token still works.
+
+    Fetches the token with `gh auth token` and calls `gh api user` with it.
+    """
+    with tracing.span("health.check_account"):
+        try:
+            token = tokens.fetch_token(
+                account.host, account.username, timeout=CHECK_TIMEOUT_SECONDS
+            )
+            if token is None:
+                return "expired"  # gh has no token left for this login
+            env = dict(os.environ)
+            # gh reads GH_TOKEN for github.com and GH_ENTERPRISE_TOKEN for
+            # everything else; setting both covers either kind of host.
+            env["GH_TOKEN"] = env["GH_ENTERPRISE_TOKEN"] = token
+            reply = subprocess.run(
+                ["gh", "api", "user", "--hostname", account.host],
+                capture_output=True,
+                text=True,
+                env=env,
+                timeout=CHECK_TIMEOUT_SECONDS,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return "unknown"
+        if reply.returncode == 0:
+            return "valid"
+        return "expired" if "HTTP 401" in reply.stderr else "unknown"
+
+
+class HealthMonitor:
+    """Check account tokens in the background and remember the results.
+
+    Accounts whose result is missing or older than its TTL are checked on a
+    small thread pool, rate-limited and jittered.  Results are persisted to
+    CACHE_FILE so the menu is annotated straight away on the next start.
+    *on_change* is called, from a worker thread, when any status changes.
+    """
+
+    def __init__(
+        self,
+        accounts: Callable[[], Accounts],
+        on_change: Callable[[], None],
+        check: Callable[[GhAccount], Status] = check_account,
+    ) -> None:
+        self._accounts = accounts
+        self._on_change = on_change
+        self._check = check
+        self._lock = threading.Lock()
+        self._results: dict[tuple[str, str], _Result] = {}
+        self._inflight: set[tuple[str, str]] = set()
+        self._version = 0
+        self._next_start = 0.0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._pool: ThreadPoolExecutor | None = None
+
+    def start(self) -> None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self._lock:
+            self._results = _load_cache()
+            self._version += 1
+        self._pool = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS, thread_name_prefix="gh-switcher-health"
+        )
+        self._next_start = time.monotonic() + STARTUP_DELAY_SECONDS
+        threading.Thread(
+            target=self._run, name="gh-switcher-health-sweep", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def poke(self) -> None:
+        """Check stale accounts now instead of at the next sweep."""
+        self._wake.set()
+
+    @property
+    def version(self) -> int:
+        """Bumped whenever a status changes; cheap to poll."""
+        return self._version
+
+    def snapshot(self) -> Mapping[tuple[str, str], Status]:
+        """Last known status per (host, username); unchecked ones are absent."""
+        with self._lock:
+            return MappingProxyType({key: r.status for key, r in self._results.items()})
+
+    # -- Internal -------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sweep()
+            self._wake.wait(SWEEP_INTERVAL_SECONDS)
+            self._wake.clear()
+
+    def _sweep(self) -> None:
+        now = time.time()
+        due: list[GhAccount] = []
+        with self._lock:
+            for account in self._accounts():
+                key = account.key
+                result = self._results.get(key)
+                fresh = (
+                    result is not None
+                    and now - result.checked < TTL_SECONDS[result.status]
+                )
+                if not fresh and key not in self._inflight:
+                    self._inflight.add(key)
+                    due.append(account)
+        random.shuffle(due)
+        for account in due:
+            if self._pool is None or self._stop.is_set():
+                return
+            self._pool.submit(self._check_one, account)
+
+    def _check_one(self, account: GhAccount) -> None:
+        if not self._wait_turn():
+            return
+        try:
+            status = self._check(account)
+        except Exception:
+            import traceback  # only ever needed here, and not cheap
+
+            traceback.print_exc()
+            status = "unknown"
+        key = account.key
+        with self._lock:
+            previous = self._results.get(key)
+            self._results[key] = _Result(status, time.time())
+            self._inflight.discard(key)
+            changed = previous is None or previous.status != status
+            if changed:
+                self._version += 1
+            drained = not self._inflight
+            snapshot = dict(self._results) if drained else None
+        if snapshot is not None:
+            _save_cache(snapshot)
+        if changed:
+            self._on_change()
+
+    def _wait_turn(self) -> bool:
+        """Sleep until this check may start; False if stopped meanwhile."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            gap = MIN_INTERVAL_SECONDS + random.uniform(0, JITTER_SECONDS)
+            self._next_start = start + gap
+        return not self._stop.wait(start - now)
+
+
+def _load_cache() -> dict[tuple[str, str], _Result]:
+    try:
+        data = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+        return {}
+    results: dict[tuple[str, str], _Result] = {}
+    for key, entry in data.get("accounts", {}).items():
+        host, _, username = key.partition("/")
+        try:
+            status, checked = entry["status"], float(entry["checked"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if status in TTL_SECONDS and username:
+            results[(host, username)] = _Result(status, checked)
+    return results
+
+
+def _save_cache(results: dict[tuple[str, str], _Result]) -> None:
+    data = {
+        "version": _CACHE_VERSION,
+        "accounts": {
+            f"{host}/{username}": {"status": r.status, "checked": r.checked}
+            for (host, username), r in results.items()
+        },
+    }
+    tmp = CACHE_FILE.with_name(f".{CACHE_FILE.name}.{os.getpid()}.tmp")
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data, indent=1) + "\n", encoding="utf-8")
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        tmp.unlink(missing_ok=True)
@@ -1,67 +1,369 @@
 from __future__ import annotations
 
 import colorsys
+import functools
 import hashlib
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import platformdirs
-from PIL import Image, ImageDraw, ImageFont
+
+from gh_switcher import tracing
+
+# Pillow costs more to import than the rest of the app together and is only
+# needed to render, so it is imported on first use.
+if TYPE_CHECKING:
+    from PIL import Image, ImageFont
 
 ICON_SIZE = 64
 BORDER_WIDTH = 4
 ACTIVE_BORDER_COLOUR = (40, 200, 80, 255)
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_SIZE = 26
 CACHE_DIR = Path(platformdirs.user_cache_dir("gh-switcher")) / "icons"
+# Icons are small (1-2 KB); this holds a few thousand.
+DISK_CACHE_MAX_BYTES = 8 * 1024 * 1024
+# Leftovers of a write that never finished are removed after this long.
+STALE_TMP_SECONDS = 60 * 60
+# Part of every icon's file name: bump when _render draws differently.
+RENDER_VERSION = 2
+# Entries, not bytes: two variants per account comfortably covers large setups.
+MEMORY_CACHE_SIZE = 256
+# Low-memory mode keeps little more than the icon on screen.
+LOW_MEMORY_CACHE_SIZE = 4
+
+_IconKey = tuple[str, bool, int]
+
+
+class Icon:
+    """A tray icon, rendered in memory on first use and written to disk only
+    when a backend asks for a file.
+
+    Both happen at most once per instance, so re-applying an unchanged icon
+    costs no rendering, decoding or file I/O.  Icons compare equal by what
+    they depict.
+    """
+
+    __slots__ = ("_draw", "_image", "_lock", "_on_disk", "key", "path")
+
+    def __init__(
+        self, key: tuple[object, ...], path: Path, draw: Callable[[], Image.Image]
+    ) -> None:
+        self.key = key
+        self.path = path
+        self._draw = draw
+        self._image: Image.Image | None = None
+        self._on_disk = False
+        self._lock = threading.Lock()
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Icon) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"Icon({self.path.name})"
+
+    @property
+    def image(self) -> Image.Image:
+        """The RGBA image, rendered on first access."""
+        with self._lock:
+            if self._image is None:
+                with tracing.span("icons.generate_icon"):
+                    self._image = self._draw()
+            return self._image
+
+    def file(self) -> Path:
+        """Path of the icon on disk, writing it first if it is not there."""
+        if self._on_disk:
+            return self.path
+        image = None if _touch(self.path) else self.image
+        with self._lock:
+            if not self._on_disk:
+                if image is not None:
+                    _write_png(image, self.path)
+                self._on_disk = True
+            if _low_memory:
+                self._image = None  # the backend reads the file from now on
+        return self.path
+
+
+_ENTRY_NAME = re.compile(r"^[0-9a-f]{32}\.png$")
+
+_memory_lock = threading.Lock()
+_memory_cache: OrderedDict[_IconKey, Icon] = OrderedDict()
+_memory_limit = MEMORY_CACHE_SIZE
+_thread_fonts = threading.local()
+_low_memory = False
+
+
+def icon_path(username: str, active: bool, size: int = ICON_SIZE) -> Path:
+    """Where the icon is cached on disk, named by a hash of what it depicts.
+
+    Every input to the rendering is part of the hash, so a change to any of
+    them (or to RENDER_VERSION) misses the cache instead of showing a stale
+    icon; the old file is left for sweep_disk_cache().
+    """
+    return _content_path(
+        "user",
+        username,
+        active,
+        size,
+        BORDER_WIDTH,
+        ACTIVE_BORDER_COLOUR,
+        FONT_SIZE,
+        _font_signature(),
+    )
+
+
+def generate_icon(username: str, active: bool, size: int = ICON_SIZE) -> Icon:
+    """Return the (possibly cached) icon for *username*; nothing is drawn yet."""
+    key = (username, active, size)
+    with _memory_lock:
+        cached = _memory_cache.get(key)
+        if cached is not None:
+            _memory_cache.move_to_end(key)
+            return cached
+        icon = _memory_cache[key] = Icon(
+            key,
+            icon_path(username, active, size),
+            functools.partial(_render, username, active, size),
+        )
+        while len(_memory_cache) > _memory_limit:
+            _memory_cache.popitem(last=False)
+    return icon
+
+
+def set_low_memory(enabled: bool) -> None:
+    """Trade re-rendering for a smaller resident set.
+
+    Fonts are loaded for each render and dropped, the in-memory cache
+    shrinks to LOW_MEMORY_CACHE_SIZE, and icons that were written to disk
+    let go of their image.
+    """
+    global _low_memory, _memory_limit
+    _low_memory = enabled
+    with _memory_lock:
+        _memory_limit = LOW_MEMORY_CACHE_SIZE if enabled else MEMORY_CACHE_SIZE
+        while len(_memory_cache) > _memory_limit:
+            _memory_cache.popitem(last=False)
+    if enabled:
+        release_render_state()
+
+
+def release_render_state() -> None:
+    """Forget the font file and the calling thread's font objects.
+
+    Threads that rendered keep their own fonts until they exit, which for
+    the prerender pool is as soon as it is done.
+    """
+    _font_bytes.cache_clear()
+    vars(_thread_fonts).clear()
+
+
+def prerender(
+    usernames: Iterable[str], size: int = ICON_SIZE, files: bool = False
+) -> None:
+    """Prepare both variants for every username in parallel; blocks until done.
+
+    Renders the images, or with *files* makes sure the PNGs are on disk,
+    which is all a backend that loads icons by path needs.  Images beyond
+    what the in-memory cache holds would only evict each other, so only the
+    first usernames' are rendered.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    keys = [(u, active) for u in usernames for active in (True, False)]
+    if not files:
+        keys = keys[:_memory_limit]
+    if not keys:
+        return
+
+    def prepare(key: tuple[str, bool]) -> object:
+        icon = generate_icon(key[0], key[1], size)
+        return icon.file() if files else icon.image
+
+    workers = min(len(keys), os.cpu_count() or 1, 8)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in pool.map(prepare, keys):
+            pass
+
+
+def sweep_disk_cache(max_bytes: int = DISK_CACHE_MAX_BYTES) -> None:
+    """Trim CACHE_DIR: drop strays, then least recently used icons past *max_bytes*.
+
+    Strays are files from older naming schemes, empty files, and temp files
+    left by a write that never finished.  Recency is the access time, which
+    Icon.file() sets explicitly, so relatime/noatime mounts do not matter.
+    """
+    with tracing.span("icons.sweep_disk_cache"):
+        try:
+            with os.scandir(CACHE_DIR) as it:
+                entries = [(e, e.stat(follow_symlinks=False)) for e in it]
+        except OSError:
+            return
+        now = time.time()
+        kept = []
+        for entry, st in entries:
+            if entry.name.endswith(".tmp"):
+                if now - st.st_mtime > STALE_TMP_SECONDS:
+                    _unlink(entry.path)
+            elif not _ENTRY_NAME.match(entry.name) or st.st_size == 0:
+                _unlink(entry.path)
+            else:
+                kept.append((st.st_atime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in kept)
+        kept.sort()  # least recently used first
+        for _, size, path in kept:
+            if total <= max_bytes:
+                break
+            _unlink(path)
+            total -= size
 
 
-def icon_path(username: str, active: bool) -> Path:
-    suffix = "-active" if active else ""
-    return CACHE_DIR / f"{username}{suffix}.png"
+def invalidate_cache(username: str) -> None:
+    """Remove cached icons for *username* so they are regenerated."""
+    with _memory_lock:
+        keys = [k for k in _memory_cache if k[0] == username]
+        for key in keys:
+            del _memory_cache[key]
+    for size in {k[2] for k in keys} | {ICON_SIZE}:
+        for active in (False, True):
+            icon_path(username, active, size).unlink(missing_ok=True)
+
+
+@functools.cache
+def placeholder_icon() -> Icon:
+    """Grey icon shown before the active account is known."""
+
+    def draw() -> Image.Image:
+        from PIL import Image
+
+        return Image.new("RGBA", (ICON_SIZE, ICON_SIZE), (120, 120, 120, 255))
+
+    path = _content_path("placeholder", ICON_SIZE, (120, 120, 120, 255))
+    return Icon(("_placeholder",), path, draw)
+
+
+def _content_path(*inputs: object) -> Path:
+    text = repr((RENDER_VERSION, *inputs))
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return CACHE_DIR / f"{digest}.png"
+
+
+@functools.cache
+def _font_signature() -> tuple[str, int, int] | None:
+    # Identifies the font file's content without reading it.
+    try:
+        st = os.stat(FONT_PATH)
+    except OSError:
+        return None  # Pillow's built-in font
+    return (FONT_PATH, st.st_size, st.st_mtime_ns)
+
+
+def _touch(path: Path) -> bool:
+    """Mark *path* as just used for the LRU sweep; False if it is missing."""
+    try:
+        st = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return path.exists()  # e.g. read-only cache: still usable
+    return True
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
 
 
-def generate_icon(username: str, active: bool) -> Path:
-    """Return path to a (possibly cached) icon for *username*."""
-    path = icon_path(username, active)
-    if path.exists():
-        return path
+def _write_png(image: Image.Image, path: Path) -> None:
+    # Written aside and renamed, so a reader (or a crash) never sees a
+    # partial PNG; the name is unique across processes and threads.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        image.save(tmp, "PNG")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
 
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+def _render(username: str, active: bool, size: int) -> Image.Image:
+    from PIL import Image, ImageDraw
 
     bg_colour = _username_colour(username)
     initials = _initials(username)
 
-    img = Image.new("RGBA", (ICON_SIZE, ICON_SIZE), bg_colour)
+    img = Image.new("RGBA", (size, size), bg_colour)
     draw = ImageDraw.Draw(img)
 
     if active:
         draw.ellipse(
-            [0, 0, ICON_SIZE - 1, ICON_SIZE - 1],
+            [0, 0, size - 1, size - 1],
             outline=ACTIVE_BORDER_COLOUR,
-            width=BORDER_WIDTH,
-        )
-
-    try:
-        font = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 26
+            width=max(1, BORDER_WIDTH * size // ICON_SIZE),
         )
-    except OSError:
-        font = ImageFont.load_default()
 
+    font = _font(max(1, FONT_SIZE * size // ICON_SIZE))
     bbox = draw.textbbox((0, 0), initials, font=font)
     text_w = bbox[2] - bbox[0]
     text_h = bbox[3] - bbox[1]
-    x = (ICON_SIZE - text_w) // 2 - bbox[0]
-    y = (ICON_SIZE - text_h) // 2 - bbox[1]
+    x = (size - text_w) // 2 - bbox[0]
+    y = (size - text_h) // 2 - bbox[1]
     draw.text((x, y), initials, fill=(255, 255, 255, 255), font=font)
+    return img
 
-    img.save(path, "PNG")
-    return path
 
+def _font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Per-thread font built from bytes read from disk once per process.
 
-def invalidate_cache(username: str) -> None:
-    """Remove cached icons for *username* so they are regenerated."""
-    for suffix in ("", "-active"):
-        p = CACHE_DIR / f"{username}{suffix}.png"
-        p.unlink(missing_ok=True)
+    FreeType faces must not be shared between threads, but re-reading the
+    .ttf for every icon is the expensive part, so only the bytes are shared.
+    """
+    if _low_memory:
+        return _load_font(size, _read_font())
+    fonts = getattr(_thread_fonts, "by_size", None)
+    if fonts is None:
+        fonts = _thread_fonts.by_size = {}
+    if size not in fonts:
+        fonts[size] = _load_font(size, _font_bytes())
+    return fonts[size]
+
+
+def _load_font(
+    size: int, data: bytes | None
+) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    from PIL import ImageFont
+
+    if data is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(io.BytesIO(data), size)
+
+
+@functools.cache
+def _font_bytes() -> bytes | None:
+    return _read_font()
+
+
+def _read_font() -> bytes | None:
+    try:
+        return Path(FONT_PATH).read_bytes()
+    except OSError:
+        return None
 
 
 def _initials(username: str) -> str:
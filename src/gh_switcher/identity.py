@@ -1,24 +1,515 @@
 from __future__ import annotations
 
-import subprocess
+import os
+from collections.abc import Callable
 from dataclasses import dataclass
+from pathlib import Path
 
+from gh_switcher import filecache, tracing
 
-@dataclass(frozen=True)
+# Matches git's own limit before it reports "exceeded maximum include depth".
+_MAX_INCLUDE_DEPTH = 10
+
+
+@dataclass(frozen=True, slots=True)
 class GitIdentity:
     name: str
     email: str
 
 
+class GitConfigError(Exception):
+    """Raised when a gitconfig file cannot be parsed or updated natively."""
+
+
 def get_current() -> GitIdentity:
-    """Read git config --global user.name and user.email."""
-    name = _git_config("user.name")
-    email = _git_config("user.email")
-    return GitIdentity(name=name, email=email)
+    """Read user.name and user.email from the global gitconfig.
+
+    Falls back to `git config --global` if the files cannot be parsed.
+    """
+    try:
+        entries = [
+            entry
+            for path in global_config_files()
+            for entry in read_config(path, includes=True)
+        ]
+    except GitConfigError:
+        return GitIdentity(
+            name=_git_config("user.name"), email=_git_config("user.email")
+        )
+    name = _last_value(entries, "user", "name") or ""
+    email = _last_value(entries, "user", "email") or ""
+    return GitIdentity(name=name.strip(), email=email.strip())
 
 
 def set_identity(name: str, email: str) -> None:
-    """Write git config --global user.name and user.email."""
+    """Write user.name and user.email to the global gitconfig.
+
+    Both keys are written in one locked, atomic update.  Falls back to
+    `git config --global` if the file cannot be handled natively.
+    """
+    with tracing.span("identity.set_identity"):
+        try:
+            target = global_config_target()
+            write_values(target, "user", {"name": name, "email": email})
+        except (GitConfigError, OSError):
+            _set_identity_subprocess(name, email)
+
+
+# -- Gitconfig files ----------------------------------------------------------
+
+
+def global_config_files() -> list[Path]:
+    """Files read by `git config --global`, lowest precedence first."""
+    override = os.environ.get("GIT_CONFIG_GLOBAL")
+    if override:
+        return [Path(override).expanduser()]
+    return [_xdg_config_file(), Path.home() / ".gitconfig"]
+
+
+def global_config_target() -> Path:
+    """The file `git config --global` writes to."""
+    override = os.environ.get("GIT_CONFIG_GLOBAL")
+    if override:
+        return Path(override).expanduser()
+    home_file = Path.home() / ".gitconfig"
+    xdg_file = _xdg_config_file()
+    if not home_file.exists() and xdg_file.exists():
+        return xdg_file
+    return home_file
+
+
+def read_config(path: Path, includes: bool = True) -> list[ConfigEntry]:
+    """Return the entries of *path* in file order; [] if it does not exist.
+
+    With *includes*, `include.path` directives are expanded in place, as git
+    does.  `includeIf` conditions all need a repository to match against, so
+    like `git config --global` outside a repository they never apply here.
+    """
+    return _read_config(path, includes, depth=0)
+
+
+def write_values(path: Path, section: str, values: dict[str, str]) -> None:
+    """Set *section*.<key> = <value> for every item of *values* in *path*.
+
+    Uses git's lockfile protocol: the new content is written to
+    `<path>.lock`, created exclusively, and renamed over *path*.
+    """
+    _locked_update(path, lambda text: _set_in_text(text, section, values))
+
+
+def replace_sections(
+    path: Path,
+    section: str,
+    owned: Callable[[ConfigEntry], bool],
+    blocks: list[tuple[str, dict[str, str]]],
+) -> None:
+    """Replace the `[section "sub"]` blocks of *path* that *owned* claims.
+
+    A block is claimed when every entry in it satisfies *owned*.  Claimed
+    blocks are removed wherever they are, and *blocks*, given as
+    (subsection, values) pairs, are appended at the end of the file, where
+    they take precedence over everything before them.
+    """
+    _locked_update(path, lambda text: _replace_in_text(text, section, owned, blocks))
+
+
+def _xdg_config_file() -> Path:
+    base = os.environ.get("XDG_CONFIG_HOME") or str(Path.home() / ".config")
+    return Path(base) / "git" / "config"
+
+
+def _read_config(path: Path, includes: bool, depth: int) -> list[ConfigEntry]:
+    if depth > _MAX_INCLUDE_DEPTH:
+        raise GitConfigError(f"exceeded maximum include depth at {path}")
+    parsed: _Parsed | None = filecache.load(path, _parse_bytes)
+    if parsed is None:
+        return []
+
+    entries: list[ConfigEntry] = []
+    for entry in parsed.entries:
+        entries.append(entry)
+        if (
+            includes
+            and entry.section == "include"
+            and entry.subsection is None
+            and entry.key == "path"
+            and entry.value
+        ):
+            target = Path(entry.value).expanduser()
+            if not target.is_absolute():
+                target = path.parent / target
+            entries.extend(_read_config(target, includes, depth + 1))
+    return entries
+
+
+def _last_value(
+    entries: list[ConfigEntry], section: str, key: str, subsection: str | None = None
+) -> str | None:
+    for entry in reversed(entries):
+        if (entry.section, entry.subsection, entry.key) == (section, subsection, key):
+            return entry.value
+    return None
+
+
+def _locked_update(path: Path, edit: Callable[[str], str]) -> None:
+    real = Path(os.path.realpath(path))
+    lock = real.with_name(real.name + ".lock")
+    try:
+        fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    except FileExistsError:
+        raise GitConfigError(f"could not lock config file {real}") from None
+
+    try:
+        # newline="": CRLF files keep their line endings, as with git.
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            try:
+                with open(real, encoding="utf-8", newline="") as src:
+                    text = src.read()
+                mode: int | None = real.stat().st_mode & 0o7777
+            except FileNotFoundError:
+                text, mode = "", None
+            new_text = edit(text)
+            fh.write(new_text)
+        if new_text == text and (mode is not None or not text):
+            lock.unlink()  # nothing to do; leave the file and its mtime alone
+            return
+        if mode is not None:
+            os.chmod(lock, mode)
+        os.replace(lock, real)
+    except BaseException:
+        lock.unlink(missing_ok=True)
+        raise
+
+
+# -- Parser -------------------------------------------------------------------
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigEntry:
+    """One `key = value` line.  *start*/*end* span it in the source text."""
+
+    section: str
+    subsection: str | None
+    key: str
+    value: str | None
+    start: int
+    end: int
+    header: int
+
+
+@dataclass(frozen=True, slots=True)
+class _Header:
+    section: str
+    subsection: str | None
+    start: int
+    end: int
+
+
+@dataclass(frozen=True, slots=True)
+class _Parsed:
+    headers: tuple[_Header, ...]
+    entries: tuple[ConfigEntry, ...]
+
+
+def _parse_bytes(raw: bytes) -> _Parsed:
+    try:
+        return _parse(raw.decode("utf-8"))
+    except UnicodeDecodeError as exc:
+        raise GitConfigError(str(exc)) from exc
+
+
+class _Reader:
+    """Character cursor that folds CRLF and reports EOF as a final newline."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.pos = 1 if text.startswith("\ufeff") else 0
+        self.eof = False
+
+    def next(self) -> str:
+        if self.pos >= len(self.text):
+            self.eof = True
+            return "\n"
+        c = self.text[self.pos]
+        self.pos += 1
+        if c == "\r" and self.text.startswith("\n", self.pos):
+            self.pos += 1
+            return "\n"
+        return c
+
+    def error(self, what: str) -> GitConfigError:
+        line = self.text.count("\n", 0, self.pos) + 1
+        return GitConfigError(f"bad config line {line}: {what}")
+
+
+def _parse(text: str) -> _Parsed:
+    """Parse gitconfig *text* following the rules of git's config.c."""
+    r = _Reader(text)
+    headers: list[_Header] = []
+    entries: list[ConfigEntry] = []
+    line_start = r.pos
+
+    while True:
+        start = r.pos
+        c = r.next()
+        if r.eof:
+            break
+        if c == "\n":
+            line_start = r.pos
+            continue
+        if c.isspace():
+            continue
+        if c in "#;":
+            while r.next() != "\n":
+                pass
+            line_start = r.pos
+            continue
+        if c == "[":
+            section, subsection = _parse_header(r)
+            headers.append(_Header(section, subsection, line_start, r.pos))
+            line_start = r.pos
+            continue
+        if not c.isalpha():
+            raise r.error("expected a key")
+        if not headers:
+            raise r.error("key outside of any section")
+
+        r.pos = start
+        key = _parse_key(r)
+        c = r.next()
+        while c in " \t":
+            c = r.next()
+        if c == "\n":
+            value = None
+        elif c == "=":
+            value = _parse_value(r)
+        else:
+            raise r.error(f"unexpected {c!r} after key")
+
+        header = headers[-1]
+        entries.append(
+            ConfigEntry(
+                section=header.section,
+                subsection=header.subsection,
+                key=key,
+                value=value,
+                start=line_start,
+                end=r.pos,
+                header=len(headers) - 1,
+            )
+        )
+        line_start = r.pos
+
+    return _Parsed(headers=tuple(headers), entries=tuple(entries))
+
+
+def _parse_header(r: _Reader) -> tuple[str, str | None]:
+    name: list[str] = []
+    while True:
+        c = r.next()
+        if c == "]":
+            section = "".join(name).lower()
+            if not section:
+                raise r.error("empty section name")
+            # Deprecated [section.subsection] syntax: subsection is lowercased.
+            if "." in section:
+                section, _, subsection = section.partition(".")
+                return section, subsection
+            return section, None
+        if c.isspace():
+            break
+        if not (c.isalnum() or c in "-."):
+            raise r.error(f"invalid character {c!r} in section name")
+        name.append(c)
+
+    c = r.next()
+    while c.isspace() and c != "\n":
+        c = r.next()
+    if c != '"':
+        raise r.error("expected a quoted subsection")
+    subsection: list[str] = []
+    while True:
+        c = r.next()
+        if c == "\n":
+            raise r.error("unterminated subsection")
+        if c == '"':
+            break
+        if c == "\\":
+            c = r.next()
+            if c == "\n":
+                raise r.error("unterminated subsection")
+        subsection.append(c)
+    if r.next() != "]":
+        raise r.error("expected ']' after subsection")
+    return "".join(name).lower(), "".join(subsection)
+
+
+def _parse_key(r: _Reader) -> str:
+    key: list[str] = []
+    while r.pos < len(r.text) and (r.text[r.pos].isalnum() or r.text[r.pos] == "-"):
+        key.append(r.text[r.pos])
+        r.pos += 1
+    return "".join(key).lower()
+
+
+_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "\\": "\\", '"': '"'}
+
+
+def _parse_value(r: _Reader) -> str:
+    value: list[str] = []
+    quoted = comment = False
+    trim_len: int | None = None
+
+    while True:
+        c = r.next()
+        if c == "\n":
+            if quoted:
+                raise r.error("unterminated quoted value")
+            if trim_len is not None:
+                del value[trim_len:]
+            return "".join(value)
+        if comment:
+            continue
+        if c.isspace() and not quoted:
+            if trim_len is None:
+                trim_len = len(value)
+            if value:
+                value.append(c)
+            continue
+        if not quoted and c in "#;":
+            comment = True
+            continue
+        trim_len = None
+        if c == "\\":
+            c = r.next()
+            if c == "\n":
+                if r.eof:
+                    raise r.error("dangling backslash")
+                continue
+            if c not in _ESCAPES:
+                raise r.error(f"unknown escape \\{c}")
+            value.append(_ESCAPES[c])
+            continue
+        if c == '"':
+            quoted = not quoted
+            continue
+        value.append(c)
+
+
+# -- Writer -------------------------------------------------------------------
+
+
+def _set_in_text(text: str, section: str, values: dict[str, str]) -> str:
+    for key, value in values.items():
+        text = _set_one(text, section, key.lower(), value)
+    return text
+
+
+def _set_one(text: str, section: str, key: str, value: str) -> str:
+    parsed = _parse(text)
+    eol = _newline(text)
+    line = f"\t{key} = {_quote(value)}{eol}"
+
+    matches = [
+        e
+        for e in parsed.entries
+        if (e.section, e.subsection, e.key) == (section, None, key)
+    ]
+    if len(matches) > 1:
+        raise GitConfigError(f"cannot overwrite multiple values of {section}.{key}")
+    if matches:
+        return text[: matches[0].start] + line + text[matches[0].end :]
+
+    # Append to the last [section] block, or start a new one at the end.
+    indices = [
+        i
+        for i, h in enumerate(parsed.headers)
+        if (h.section, h.subsection) == (section, None)
+    ]
+    if indices:
+        last = indices[-1]
+        in_block = [e for e in parsed.entries if e.header == last]
+        pos = (
+            in_block[-1].end
+            if in_block
+            else _end_of_line(text, parsed.headers[last].end)
+        )
+        return _insert(text, pos, line)
+    return _insert(text, len(text), f"[{section}]{eol}{line}")
+
+
+def _replace_in_text(
+    text: str,
+    section: str,
+    owned: Callable[[ConfigEntry], bool],
+    blocks: list[tuple[str, dict[str, str]]],
+) -> str:
+    parsed = _parse(text)
+    by_header: dict[int, list[ConfigEntry]] = {}
+    for entry in parsed.entries:
+        by_header.setdefault(entry.header, []).append(entry)
+
+    spans: list[tuple[int, int]] = []
+    for i, header in enumerate(parsed.headers):
+        entries = by_header.get(i, [])
+        if header.section != section.lower() or not entries:
+            continue
+        if all(owned(e) for e in entries):
+            spans.append((header.start, entries[-1].end))
+    for start, end in reversed(spans):
+        text = text[:start] + text[end:]
+
+    eol = _newline(text)
+    chunk = "".join(
+        f"[{section} {_quote_subsection(subsection)}]{eol}"
+        + "".join(f"\t{key} = {_quote(value)}{eol}" for key, value in values.items())
+        for subsection, values in blocks
+    )
+    return _insert(text, len(text), chunk) if chunk else text
+
+
+def _end_of_line(text: str, pos: int) -> int:
+    newline = text.find("\n", pos)
+    return len(text) if newline == -1 else newline + 1
+
+
+def _insert(text: str, pos: int, chunk: str) -> str:
+    if pos > 0 and text[pos - 1] != "\n":
+        chunk = _newline(text) + chunk
+    return text[:pos] + chunk + text[pos:]
+
+
+def _newline(text: str) -> str:
+    """The line ending *text* already uses, so added lines match it."""
+    first = text.find("\n")
+    return "\r\n" if first > 0 and text[first - 1] == "\r" else "\n"
+
+
+def _quote(value: str) -> str:
+    """Quote *value* exactly as git's write_pair() does."""
+    needs_quotes = (
+        value.startswith(" ") or value.endswith(" ") or any(c in value for c in ";#")
+    )
+    escaped = (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\t", "\\t")
+    )
+    return f'"{escaped}"' if needs_quotes else escaped
+
+
+def _quote_subsection(subsection: str) -> str:
+    escaped = subsection.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+# -- Subprocess fallback ------------------------------------------------------
+
+
+def _set_identity_subprocess(name: str, email: str) -> None:
+    import subprocess  # deferred: the fallback is rare, the import is not free
+
     subprocess.run(
         ["git", "config", "--global", "user.name", name],
         check=True,
@@ -30,6 +521,8 @@ def set_identity(name: str, email: str) -> None:
 
 
 def _git_config(key: str) -> str:
+    import subprocess
+
     result = subprocess.run(
         ["git", "config", "--global", key],
         capture_output=True,
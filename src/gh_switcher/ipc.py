@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import _socket
+import os
+import stat
+
+# Prompt clients import this module on every render, so it avoids `typing`
+# and uses the C-level _socket directly; the socket module drags in
+# selectors, enum and friends, which would dominate the run time.  (stat is
+# free: os imports it.)
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import socket
+    from collections.abc import Callable
+
+    Handler = Callable[[str], str]
+
+SUBSCRIBE = "subscribe"
+# Generous for a local socket; clients fall back to reading files on timeout.
+CLIENT_TIMEOUT_SECONDS = 0.5
+_MAX_REQUEST = 4096
+
+
+def socket_path() -> str:
+    return runtime_path("sock")
+
+
+def runtime_path(suffix: str) -> str:
+    """Per-user runtime file such as the socket or a lock file."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"gh-switcher.{suffix}")
+    tmp = os.environ.get("TMPDIR", "/tmp")
+    return os.path.join(tmp, f"gh-switcher-{os.getuid()}.{suffix}")
+
+
+def available() -> bool:
+    return hasattr(_socket, "AF_UNIX")
+
+
+def request(command: str, timeout: float = CLIENT_TIMEOUT_SECONDS) -> str | None:
+    """Send *command* to the running instance; None if there is none."""
+    sock = _connect(timeout)
+    if sock is None:
+        return None
+    try:
+        sock.sendall(command.encode("utf-8") + b"\n")
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    return b"".join(chunks).decode("utf-8")
+
+
+def subscribe(on_line: Callable[[str], None]) -> bool:
+    """Stream pushed lines to *on_line* until the server goes away.
+
+    Returns False if no instance was running.
+    """
+    sock = _connect(CLIENT_TIMEOUT_SECONDS)
+    if sock is None:
+        return False
+    try:
+        sock.sendall(SUBSCRIBE.encode("utf-8") + b"\n")
+        sock.settimeout(None)
+        pending = b""
+        while chunk := sock.recv(65536):
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                on_line(line.decode("utf-8"))
+    except OSError:
+        pass
+    finally:
+        sock.close()
+    return True
+
+
+def _connect(timeout: float) -> _socket.socket | None:
+    if not available():
+        return None
+    path = socket_path()
+    if not _trusted(path):
+        return None
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _trusted(path: str) -> bool:
+    """True if *path* is a socket of ours that only we can connect to.
+
+    Without XDG_RUNTIME_DIR the socket lives in a shared directory, where
+    another user could bind the name first and hand out tokens of their own.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISSOCK(st.st_mode)
+        and st.st_uid == os.getuid()
+        and not st.st_mode & 0o077
+    )
+
+
+class Server:
+    """Answer commands from *handlers* on the control socket.
+
+    The protocol is one command line per connection, answered with
+    newline-terminated text; ``subscribe`` instead keeps the connection open
+    and gets a line pushed on every change.  Each handler receives the rest
+    of the line after the command and its space, unchanged, so arguments
+    such as paths keep their spacing, and returns the reply text.  Requests are answered
+    inline on one thread, so handlers must only read in-memory state.
+    """
+
+    def __init__(self, handlers: dict[str, Handler]) -> None:
+        import threading
+
+        self._handlers = handlers
+        self._sock: socket.socket | None = None
+        self._subscribers: list[socket.socket] = []
+        self._lock = threading.Lock()
+        self._on_subscribe: Callable[[], str] | None = None
+
+    def start(self, on_subscribe: Callable[[], str] | None = None) -> bool:
+        """Bind and serve in the background; False if the socket is taken.
+
+        *on_subscribe* supplies the first line sent to a new subscriber.
+        """
+        import socket
+        import threading
+
+        if not available():
+            return False
+        path = socket_path()
+        if request("ping") is not None:
+            return False  # another live instance owns the socket
+        try:
+            os.unlink(path)  # stale socket from a crashed instance
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False  # someone else's file in a shared directory
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        except OSError:
+            sock.close()
+            return False
+        finally:
+            os.umask(old_umask)
+        sock.listen(16)
+        self._sock = sock
+        self._on_subscribe = on_subscribe
+        threading.Thread(
+            target=self._serve, name="gh-switcher-ipc", daemon=True
+        ).start()
+        return True
+
+    def stop(self) -> None:
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(socket_path())
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            for sub in self._subscribers:
+                sub.close()
+            self._subscribers.clear()
+
+    def publish(self, line: str) -> None:
+        """Push *line* to every subscriber, dropping any that went away."""
+        data = line.encode("utf-8") + b"\n"
+        with self._lock:
+            alive = []
+            for sub in self._subscribers:
+                try:
+                    sub.sendall(data)
+                    alive.append(sub)
+                except OSError:
+                    sub.close()
+            self._subscribers = alive
+
+    def _serve(self) -> None:
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # closed by stop()
+            if _peer_uid(conn) not in (None, os.getuid()):
+                conn.close()
+                continue
+            conn.settimeout(CLIENT_TIMEOUT_SECONDS)
+            try:
+                self._handle(conn)
+            except OSError:
+                conn.close()
+
+    def _handle(self, conn: socket.socket) -> None:
+        data = b""
+        while b"\n" not in data and len(data) < _MAX_REQUEST:
+            chunk = conn.recv(_MAX_REQUEST)
+            if not chunk:
+                break
+            data += chunk
+        line = data.decode("utf-8", "replace").partition("\n")[0]
+        command, _, rest = line.partition(" ")
+
+        if command == SUBSCRIBE:
+            first = self._on_subscribe() if self._on_subscribe else ""
+            conn.sendall(first.encode("utf-8") + b"\n")
+            with self._lock:
+                self._subscribers.append(conn)
+            return
+
+        handler = self._handlers.get(command)
+        if command == "ping":
+            reply = "pong\n"
+        elif handler is None:
+            reply = f"error unknown command {command!r}\n"
+        else:
+            try:
+                reply = handler(rest)
+            except Exception as exc:  # never let one request kill the server
+                reply = f"error {exc}\n"
+        with conn:
+            conn.sendall(reply.encode("utf-8"))
+
+
+def _peer_uid(conn: socket.socket) -> int | None:
+    """uid of the process at the other end of *conn*; None if not known.
+
+    Only Linux has SO_PEERCRED; elsewhere the socket's 0600 mode is what
+    keeps other users out.
+    """
+    import socket
+    import struct
+
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _pid, uid, _gid = struct.unpack("3i", creds)
+    return uid
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import threading
+from types import TracebackType
+
+from gh_switcher import ipc
+
+try:
+    import fcntl
+except ImportError:  # Windows: FileLock falls back to a thread lock
+    fcntl = None  # type: ignore[assignment]
+
+INSTANCE_LOCK = ipc.runtime_path("lock")
+SWITCH_LOCK = ipc.runtime_path("switch.lock")
+
+
+class FileLock:
+    """Advisory `flock` on *path*, shared between processes and threads.
+
+    The file is opened once and kept open, so an uncontended acquire is a
+    single system call.  flock does not exclude threads that share the
+    descriptor, so a thread lock is held alongside it.  Where fcntl is
+    unavailable only the thread lock applies.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._fd: int | None = None
+        self._thread_lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Take the lock; with *blocking* False, return False if it is held."""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        try:
+            if fcntl is None:
+                return True
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                self._fd = os.open(
+                    self._path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600
+                )
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._fd, flags)
+            except BlockingIOError:
+                self._thread_lock.release()
+                return False
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        if fcntl is not None and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def __enter__(self) -> FileLock:
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
+_instance_lock = FileLock(INSTANCE_LOCK)
+_switch_lock = FileLock(SWITCH_LOCK)
+
+
+def switch_lock() -> FileLock:
+    """The lock every switcher holds across its gh-then-git sequence.
+
+    Shared by all gh-switcher processes of this user, so a tray switch and
+    a command-line switch cannot interleave and leave gh and git disagreeing.
+    """
+    return _switch_lock
+
+
+def acquire_instance() -> bool:
+    """Claim the single running tray for this user; False if one exists.
+
+    The lock is held until the process exits.
+    """
+    return _instance_lock.acquire(blocking=False)
@@ -1,26 +1,171 @@
 from __future__ import annotations
 
+import queue
 import subprocess
 import sys
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from jeepney.io.blocking import DBusConnection
+
+APP_NAME = "gh-switcher"
+BUS_NAME = "org.freedesktop.Notifications"
+OBJECT_PATH = "/org/freedesktop/Notifications"
+INTERFACE = "org.freedesktop.Notifications"
+CALL_TIMEOUT_SECONDS = 5.0
+
+_lock = threading.Lock()
+_notifier: Notifier | None = None
 
 
 def notify(title: str, message: str) -> None:
-    """Send a desktop notification. Silent on failure."""
+    """Send a desktop notification without blocking. Silent on failure.
+
+    A notification replaces the previous one with the same title instead of
+    stacking another bubble.
+    """
     try:
         if sys.platform == "linux":
-            _notify_send(title, message)
+            _get_notifier().send(title, message)
         else:
             _plyer_notify(title, message)
     except Exception:
         pass
 
 
-def _notify_send(title: str, message: str) -> None:
-    subprocess.run(
-        ["notify-send", "--app-name=gh-switcher", title, message],
-        check=False,
-        capture_output=True,
-    )
+class Notifier:
+    """org.freedesktop.Notifications client on one persistent bus connection.
+
+    `send` only queues the message.  A single thread connects on first use,
+    calls Notify and keeps the returned id to pass as `replaces_id` for the
+    next message with the same title.  notify-send stands in only while the
+    bus cannot be reached or nothing on it serves notifications.
+    """
+
+    def __init__(self, bus: str = "SESSION") -> None:
+        self._bus = bus
+        # None asks the thread to stop.
+        self._queue: queue.SimpleQueue[tuple[str, str] | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._connection: DBusConnection | None = None
+        # title -> id of the bubble last shown for it, over D-Bus or not.
+        self._ids: dict[str, int] = {}
+
+    def send(self, title: str, message: str) -> None:
+        self._queue.put((title, message))
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="gh-switcher-notify", daemon=True
+                )
+                self._thread.start()
+
+    def close(self) -> None:
+        """Deliver what is queued, then drop the connection."""
+        with self._start_lock:
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        self._disconnect()
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            try:
+                self._deliver(*item)
+            except Exception:
+                pass
+
+    def _deliver(self, title: str, message: str) -> None:
+        notification_id = self._call_notify(title, message)
+        if notification_id is None:
+            notification_id = _notify_send(title, message, self._ids.get(title))
+        if notification_id is not None:
+            self._ids[title] = notification_id
+
+    def _call_notify(self, title: str, message: str) -> int | None:
+        """Id of the bubble shown over D-Bus, or None to fall back."""
+        connection = self._connect()
+        if connection is None:
+            return None
+        from jeepney import DBusAddress, MessageType, new_method_call
+
+        call = new_method_call(
+            DBusAddress(OBJECT_PATH, bus_name=BUS_NAME, interface=INTERFACE),
+            "Notify",
+            "susssasa{sv}i",
+            (APP_NAME, self._ids.get(title, 0), "", title, message, [], {}, -1),
+        )
+        try:
+            reply = connection.send_and_get_reply(
+                call, timeout=CALL_TIMEOUT_SECONDS, unwrap=False
+            )
+        except TimeoutError:
+            return 0  # the server is there but slow; it may still show it
+        except (OSError, ValueError):
+            # The bus went away; reconnect for the next message.
+            self._disconnect()
+            return None
+        if reply.header.message_type is MessageType.error:
+            return None  # nothing serves notifications on this bus
+        return int(reply.body[0])
+
+    def _connect(self) -> DBusConnection | None:
+        if self._connection is None:
+            try:
+                from jeepney.io.blocking import open_dbus_connection
+
+                self._connection = open_dbus_connection(self._bus)
+            except (ImportError, KeyError, OSError, RuntimeError, ValueError):
+                return None  # no jeepney, no session bus or no access to it
+        return self._connection
+
+    def _disconnect(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _get_notifier() -> Notifier:
+    global _notifier
+    with _lock:
+        if _notifier is None:
+            _notifier = Notifier()
+        return _notifier
+
+
+# -- notify-send fallback ----------------------------------------------------
+
+# libnotify < 0.7.9 knows neither --print-id nor --replace-id; set once
+# notify-send has said so, rather than guessed from any failure.
+_legacy_notify_send = False
+
+
+def _notify_send(title: str, message: str, replaces_id: int | None) -> int | None:
+    """Show the message with notify-send; returns its id when it prints one."""
+    global _legacy_notify_send
+    args = ["notify-send", f"--app-name={APP_NAME}"]
+    if not _legacy_notify_send:
+        args.append("--print-id")
+        if replaces_id:
+            args.append(f"--replace-id={replaces_id}")
+    try:
+        result = subprocess.run(
+            [*args, title, message], check=False, capture_output=True, text=True
+        )
+    except OSError:
+        return None  # no notify-send
+    if result.returncode != 0:
+        if not _legacy_notify_send and "--print-id" in result.stderr:
+            _legacy_notify_send = True
+            return _notify_send(title, message, None)
+        return None
+    try:
+        return int(result.stdout.strip())
+    except ValueError:
+        return None
 
 
 def _plyer_notify(title: str, message: str) -> None:
@@ -30,7 +175,7 @@ def _plyer_notify(title: str, message: str) -> None:
         notification.notify(
             title=title,
             message=message,
-            app_name="gh-switcher",
+            app_name=APP_NAME,
             timeout=4,
         )
     except ImportError:
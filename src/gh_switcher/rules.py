@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+from gh_switcher import config, filecache, identity, tracing
+from gh_switcher.config import AccountRules
+from gh_switcher.identity import ConfigEntry
+
+# Per-account gitconfig fragments that the managed includeIf blocks point at.
+INCLUDE_DIR = config.CONFIG_DIR / "git"
+HOST = "github.com"
+
+# Remote URL shapes for an owner on a host, as `hasconfig:remote.*.url:` globs.
+_REMOTE_URL_FORMS = (
+    "https://{host}/{owner}/**",
+    "git@{host}:{owner}/**",
+    "ssh://git@{host}/{owner}/**",
+)
+# The same shapes parsed back: (https host, scp host, ssh host, owner).
+_REMOTE_OWNER = re.compile(
+    r"^(?:https://([^/@]+)/|git@([^/:]+):|ssh://git@([^/]+)/)([^/]+)/"
+)
+_GLOB_CHARS = re.compile(r"([\\*?\[])")
+
+
+class PathTrie:
+    """Map directory prefixes to accounts; lookups cost O(path depth)."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self) -> None:
+        self._root = _Node()
+
+    def insert(self, prefix: str, username: str) -> None:
+        node = self._root
+        for part in _components(prefix):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node()
+            node = child
+        node.owner = username
+
+    def lookup(self, path: str) -> str | None:
+        """Return the owner of the deepest prefix that contains *path*."""
+        node = self._root
+        owner = node.owner
+        for part in _components(path):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.owner is not None:
+                owner = node.owner
+        return owner
+
+
+class _Node:
+    __slots__ = ("children", "owner")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.owner: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class _Compiled:
+    stamp: filecache.Stamp | None
+    rules: tuple[AccountRules, ...]
+    trie: PathTrie
+    # (host, owner glob, username) of every `remotes` entry, in file order.
+    remotes: tuple[tuple[str, str, str], ...]
+
+
+_lock = threading.Lock()
+_compiled: _Compiled | None = None
+_sync_lock = threading.Lock()
+_synced: _Compiled | None = None
+
+
+def account_for_path(path: str | os.PathLike[str]) -> str | None:
+    """Return the account whose `paths` rule covers *path*, or None.
+
+    The deepest matching prefix wins.  Like git's `gitdir:` matching, the
+    path is tried as given and then with symlinks resolved.
+    """
+    trie = _current().trie
+    path = os.path.expanduser(os.fspath(path))
+    return trie.lookup(path) or trie.lookup(os.path.realpath(path))
+
+
+def account_for_remote(url: str) -> str | None:
+    """Return the account whose `remotes` rule matches *url*, or None.
+
+    When several match, the last one in accounts.toml wins, as it does in git.
+    """
+    owner = _remote_owner(url)
+    return account_for_owner(owner[1], owner[0]) if owner else None
+
+
+def account_for_owner(owner: str, host: str = HOST) -> str | None:
+    """Return the account whose `remotes` rule matches *owner* on *host*."""
+    found = None
+    for rule_host, pattern, username in _current().remotes:
+        if rule_host == host and fnmatchcase(owner, pattern):
+            found = username
+    return found
+
+
+def account_for_repo(
+    path: str | os.PathLike[str], remote_urls: Iterable[str]
+) -> str | None:
+    """Return the account git would use in the repository at *path*.
+
+    As with the generated includeIf blocks, a remote rule matching any of
+    *remote_urls* beats a path rule, and the last such rule wins.
+    """
+    owners = [owner for url in remote_urls if (owner := _remote_owner(url))]
+    found = None
+    for rule_host, pattern, username in _current().remotes:
+        if any(h == rule_host and fnmatchcase(o, pattern) for h, o in owners):
+            found = username
+    return found or account_for_path(path)
+
+
+def sync() -> None:
+    """Bring the include files and global includeIf blocks up to date.
+
+    Does nothing unless accounts.toml changed since the last sync that
+    succeeded, so a write that failed is tried again on the next call.
+
+    Raises:
+        ValueError: if accounts.toml is not valid TOML; what was last synced
+            stays in place.
+        GitConfigError: if git holds the lock on the global gitconfig.
+        OSError: if an include file or the gitconfig cannot be written.
+    """
+    global _synced
+    compiled = _compile()
+    # Held across the writes: a second caller waits, then finds them done.
+    with _sync_lock:
+        if compiled is not _synced:
+            with tracing.span("rules.sync"):
+                _write_rules(compiled)
+            _synced = compiled
+
+
+def _write_rules(compiled: _Compiled) -> None:
+    wanted = {_include_file(r.username) for r in compiled.rules}
+    if wanted:
+        INCLUDE_DIR.mkdir(parents=True, exist_ok=True)
+    for rule in compiled.rules:
+        identity.write_values(
+            _include_file(rule.username),
+            "user",
+            {"name": rule.identity.name, "email": rule.identity.email},
+        )
+    if INCLUDE_DIR.is_dir():
+        for stale in INCLUDE_DIR.glob("*.gitconfig"):
+            if stale not in wanted:
+                stale.unlink(missing_ok=True)
+    identity.replace_sections(
+        identity.global_config_target(),
+        "includeIf",
+        owned=_is_managed,
+        blocks=_include_blocks(compiled),
+    )
+
+
+def _current() -> _Compiled:
+    try:
+        return _compile()
+    except ValueError:
+        # accounts.toml is mid-edit or broken: keep answering from the last
+        # version that parsed, if there was one.
+        with _lock:
+            if _compiled is None:
+                raise
+            return _compiled
+
+
+def _compile() -> _Compiled:
+    global _compiled
+    stamp = filecache.stamp(config.ACCOUNTS_FILE)
+    with _lock:
+        if _compiled is not None and _compiled.stamp == stamp:
+            return _compiled
+
+    rules = tuple(config.get_rules())
+    trie = PathTrie()
+    for rule in rules:
+        for prefix in rule.paths:
+            trie.insert(prefix, rule.username)
+    remotes = tuple(
+        (*_split_remote(pattern), rule.username)
+        for rule in rules
+        for pattern in rule.remotes
+    )
+    compiled = _Compiled(stamp, rules, trie, remotes)
+    with _lock:
+        _compiled = compiled
+    return compiled
+
+
+def _include_blocks(compiled: _Compiled) -> list[tuple[str, dict[str, str]]]:
+    # git applies every matching include in order and the last value wins, so
+    # deeper prefixes go after shallower ones (matching the trie), and remote
+    # rules go last: a repo's remote says more about it than its location.
+    by_path = sorted(
+        ((prefix, rule) for rule in compiled.rules for prefix in rule.paths),
+        key=lambda item: len(_components(item[0])),
+    )
+    blocks = [
+        (f"gitdir:{_gitdir_pattern(prefix)}", _include_value(rule))
+        for prefix, rule in by_path
+    ]
+    blocks += [
+        (
+            "hasconfig:remote.*.url:" + form.format(host=host, owner=pattern),
+            {"path": str(_include_file(username))},
+        )
+        for host, pattern, username in compiled.remotes
+        for form in _REMOTE_URL_FORMS
+    ]
+    return blocks
+
+
+def _include_value(rule: AccountRules) -> dict[str, str]:
+    return {"path": str(_include_file(rule.username))}
+
+
+def _split_remote(pattern: str) -> tuple[str, str]:
+    """(host, owner glob) of a `remotes` entry; a bare glob is on HOST."""
+    host, _, owner = pattern.rpartition("/")
+    return (host or HOST, owner)
+
+
+def _remote_owner(url: str) -> tuple[str, str] | None:
+    """(host, owner) of a remote URL in one of _REMOTE_URL_FORMS."""
+    match = _REMOTE_OWNER.match(url)
+    if match is None:
+        return None
+    https, scp, ssh, owner = match.groups()
+    return (https or scp or ssh, owner)
+
+
+def _include_file(username: str) -> Path:
+    return INCLUDE_DIR / f"{username}.gitconfig"
+
+
+def _is_managed(entry: ConfigEntry) -> bool:
+    if entry.key != "path" or not entry.value:
+        return False
+    return Path(entry.value).expanduser().parent == INCLUDE_DIR
+
+
+def _gitdir_pattern(prefix: str) -> str:
+    # A trailing slash makes git match everything below the directory.
+    absolute = os.path.abspath(os.path.expanduser(prefix)).rstrip("/")
+    return _GLOB_CHARS.sub(r"\\\1", absolute) + "/"
+
+
+def _components(path: str) -> list[str]:
+    absolute = os.path.abspath(os.path.expanduser(path))
+    return [part for part in absolute.split(os.sep) if part]
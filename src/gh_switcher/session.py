@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import sys
+
+from gh_switcher import ipc
+
+# Shells eval this on start-up, so the module stays off argparse, shlex and
+# re, and accounts (for DEFAULT_HOST), which together triple its run time.
+DEFAULT_HOST = "github.com"
+_USAGE = "usage: gh-switcher env USERNAME [--hostname HOST]"
+
+
+class SessionError(Exception):
+    """Raised when no environment can be produced for the account."""
+
+
+def env_main(argv: list[str]) -> int:
+    """`gh-switcher env USERNAME`: print exports for a per-shell account.
+
+    Meant for `eval "$(gh-switcher env USERNAME)"`: the shell then talks to
+    GitHub and commits as that account while the global gh and git
+    configuration, and every other terminal, stay as they are.
+    """
+    host = DEFAULT_HOST
+    if len(argv) == 3 and argv[1] == "--hostname":
+        host = argv[2]
+    elif len(argv) != 1:
+        print(_USAGE, file=sys.stderr)
+        return 2
+    if argv[0].startswith("-"):
+        print(_USAGE, file=sys.stderr)
+        return 2
+
+    try:
+        values = session_env(argv[0], host)
+    except SessionError as exc:
+        print(f"gh-switcher: {exc}", file=sys.stderr)
+        return 1
+    for key, value in values.items():
+        print(f"export {key}={_quote(value)}")
+    return 0
+
+
+def session_env(username: str, host: str = DEFAULT_HOST) -> dict[str, str]:
+    """Environment variables that make gh and git act as *username*.
+
+    The running tray answers from its token cache; without one, or on its
+    first request for the account, the token comes from `gh auth token`.
+
+    Raises:
+        SessionError: if the account is unknown or gh has no token for it.
+    """
+    reply = ipc.request(f"env {username} {host}")
+    if reply is not None and reply.startswith("error "):
+        raise SessionError(reply[len("error ") :].strip())
+    cached = json.loads(reply) if reply else None
+    if cached is not None:
+        token, name, email = cached["token"], cached["name"], cached["email"]
+    else:
+        from gh_switcher.config import get_identity
+
+        token = ""
+        identity = get_identity(username)
+        name, email = (identity.name, identity.email) if identity else ("", "")
+    if not token:
+        token = _fetch_token(host, username)
+
+    values = {}
+    if host == DEFAULT_HOST:
+        values["GH_TOKEN"] = token
+    else:
+        values["GH_HOST"] = host
+        values["GH_ENTERPRISE_TOKEN"] = token
+    if name and email:
+        for role in ("AUTHOR", "COMMITTER"):
+            values[f"GIT_{role}_NAME"] = name
+            values[f"GIT_{role}_EMAIL"] = email
+    else:
+        print(
+            f"gh-switcher: no git identity for {username!r} in accounts.toml; "
+            "commits keep the global one",
+            file=sys.stderr,
+        )
+    return values
+
+
+def _quote(value: str) -> str:
+    # shlex.quote without the regex: always single-quote.
+    return "'" + value.replace("'", "'\"'\"'") + "'"
+
+
+def _fetch_token(host: str, username: str) -> str:
+    import subprocess
+
+    from gh_switcher.tokens import fetch_token
+
+    try:
+        token = fetch_token(host, username)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        raise SessionError(f"could not run gh: {exc}") from exc
+    if token is None:
+        raise SessionError(f"gh has no token for {username!r} on {host}")
+    return token
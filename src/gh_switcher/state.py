@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Hashable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from gh_switcher.accounts import Accounts, GhAccount
+from gh_switcher.health import Status
+from gh_switcher.identity import GitIdentity
+
+_UNSET: Any = object()
+
+
+@dataclass(frozen=True, slots=True)
+class AppState:
+    """Everything the tray is derived from, as one immutable snapshot."""
+
+    accounts: Accounts
+    identity: GitIdentity
+    autostart: bool
+    health: Mapping[tuple[str, str], Status]
+
+    @property
+    def active(self) -> GhAccount | None:
+        return self.accounts.active()
+
+    def same_as(self, other: AppState) -> bool:
+        """Field-wise equality that short-cuts on shared (unchanged) objects."""
+        return (
+            _same(self.accounts, other.accounts)
+            and _same(self.identity, other.identity)
+            and self.autostart == other.autostart
+            and _same(self.health, other.health)
+        )
+
+
+class Source[T]:
+    """One input of AppState, re-read only when it may have changed.
+
+    *token* returns something cheap that moves whenever the value might
+    have (a counter, a file stamp); without one the value is re-read on
+    every get().  Either way an equal value is replaced by the previous
+    object, so consumers can compare snapshots by identity.
+    """
+
+    def __init__(
+        self, read: Callable[[], T], token: Callable[[], Hashable] | None = None
+    ) -> None:
+        self._read = read
+        self._token = token
+        self._lock = threading.Lock()
+        self._last_token: Hashable = _UNSET
+        self._value: T = _UNSET
+
+    def get(self, force: bool = False) -> T:
+        token = self._token() if self._token is not None else _UNSET
+        with self._lock:
+            if not force and token is not _UNSET and token == self._last_token:
+                return self._value
+        value = self._read()
+        with self._lock:
+            if self._value is _UNSET or not _same(value, self._value):
+                self._value = value
+            self._last_token = token
+            return self._value
+
+    def invalidate(self) -> None:
+        """Re-read on the next get() whatever the token says."""
+        with self._lock:
+            self._last_token = _UNSET
+
+
+class Derived[T]:
+    """Memoised *compute*: re-run only when one of its inputs changed.
+
+    Not locked; callers serialise their calls.
+    """
+
+    def __init__(self, compute: Callable[..., T]) -> None:
+        self._compute = compute
+        self._inputs: tuple[Any, ...] | None = None
+        self._value: T = _UNSET
+
+    def __call__(self, *inputs: Any) -> T:
+        previous = self._inputs
+        if previous is not None and all(map(_same, inputs, previous)):
+            return self._value
+        self._value = self._compute(*inputs)
+        self._inputs = inputs
+        return self._value
+
+
+def _same(a: object, b: object) -> bool:
+    return a is b or a == b
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import sys
+
+from gh_switcher import ipc
+
+_USAGE = (
+    "usage: gh-switcher-status "
+    "[active|identity|last-switch|status|subscribe|owner [PATH]]"
+)
+_COMMANDS = ("active", "identity", "last-switch", "owner", "status")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Print the tray's view of the active account, e.g. for a shell prompt.
+
+    Asks the running gh-switcher over its socket, which answers from memory.
+    Without a running instance, `active` and `identity` are read from disk.
+    """
+    args = sys.argv[1:] if argv is None else argv
+    command = args[0] if args else "active"
+
+    if command == ipc.SUBSCRIBE:
+        if ipc.subscribe(_print_line):
+            return 0
+        print("gh-switcher is not running", file=sys.stderr)
+        return 1
+
+    if command not in _COMMANDS:
+        print(_USAGE, file=sys.stderr)
+        return 2
+
+    if command == "owner":
+        # Resolved here: the running instance has a different cwd.
+        path = os.path.abspath(args[1] if len(args) > 1 else os.curdir)
+        command = f"owner {path}"
+
+    reply = ipc.request(command)
+    if reply is None:
+        reply = _from_disk(command)
+    if reply is None:
+        print("gh-switcher is not running", file=sys.stderr)
+        return 1
+    sys.stdout.write(reply)
+    return 0
+
+
+def _print_line(line: str) -> None:
+    print(line, flush=True)
+
+
+def _from_disk(command: str) -> str | None:
+    # Slow path: only taken when no tray instance is running.
+    if command == "active":
+        from gh_switcher.accounts import load_accounts
+
+        active = load_accounts().active()
+        return f"{active.username if active else ''}\n"
+    if command == "identity":
+        from gh_switcher.identity import get_current
+
+        current = get_current()
+        return f"{current.name} <{current.email}>\n" if current.email else "\n"
+    if command.startswith("owner "):
+        from gh_switcher.rules import account_for_path
+
+        return f"{account_for_path(command[len('owner ') :]) or ''}\n"
+    return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
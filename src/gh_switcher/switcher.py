@@ -1,23 +1,183 @@
 from __future__ import annotations
 
+import os
 import subprocess
+import tempfile
+from typing import Any
+
+from gh_switcher import accounts as accounts_mod
+from gh_switcher import tracing
 
 
 class SwitchError(Exception):
     """Raised when `gh auth switch` exits non-zero."""
 
 
-def run_switch(username: str) -> None:
-    """Switch the active gh account to *username*.
+class _UnsupportedLayout(Exception):
+    """hosts.yml is in a shape the native engine does not handle."""
+
+
+def run_switch(
+    username: str, hostname: str = accounts_mod.DEFAULT_HOST, native: bool = False
+) -> None:
+    """Switch the active gh account on *hostname* to *username*.
+
+    With *native*, hosts.yml is rewritten in-process instead of forking
+    `gh auth switch`; layouts the native engine does not recognise (e.g.
+    tokens held in the system keyring) still go through gh.
 
     Raises:
         SwitchError: if gh exits with a non-zero status.
     """
+    with tracing.span("switcher.run_switch"):
+        _run_switch(username, hostname, native)
+
+
+def _run_switch(username: str, hostname: str, native: bool) -> None:
+    if native:
+        try:
+            _native_switch(username, hostname)
+            return
+        except _UnsupportedLayout:
+            pass
+
     result = subprocess.run(
-        ["gh", "auth", "switch", "--hostname", "github.com", "--user", username],
+        ["gh", "auth", "switch", "--hostname", hostname, "--user", username],
         capture_output=True,
         text=True,
     )
     if result.returncode != 0:
         stderr = result.stderr.strip()
         raise SwitchError(f"gh auth switch failed for {username!r}: {stderr}")
+
+
+# -- Native engine ------------------------------------------------------------
+
+
+def _native_switch(username: str, hostname: str) -> None:
+    """Rewrite the host's `user:` (and active `oauth_token:`) in hosts.yml.
+
+    Mirrors what `gh auth switch` does for file-based token storage, editing
+    only the affected lines so comments and formatting survive.
+    """
+    path = accounts_mod.HOSTS_FILE
+    try:
+        with open(path, encoding="utf-8", newline="") as fh:
+            text = fh.read()
+    except OSError as exc:
+        raise _UnsupportedLayout(str(exc)) from exc
+
+    before = _parse(text)
+    host = _host_section(before, hostname)
+    if username not in host["users"]:
+        raise _UnsupportedLayout(f"{username!r} is not logged in to {hostname}")
+    entry = host["users"][username]
+
+    updates = {"user": username}
+    # File storage keeps the active token at host level and a copy per user;
+    # keyring storage keeps neither, and only gh can move the keyring entry.
+    if "oauth_token" in host:
+        token = entry.get("oauth_token") if isinstance(entry, dict) else None
+        if not isinstance(token, str) or not token:
+            raise _UnsupportedLayout(f"no stored token for {username!r}")
+        updates["oauth_token"] = token
+    elif not isinstance(entry, dict) or "oauth_token" not in entry:
+        raise _UnsupportedLayout("tokens are stored in the system keyring")
+
+    if host["user"] == username and host.get("oauth_token") == updates.get(
+        "oauth_token"
+    ):
+        return
+
+    new_text = _rewrite_host_keys(text, hostname, updates)
+
+    after = _parse(new_text)
+    new_host = _host_section(after, hostname)
+    if any(new_host.get(k) != v for k, v in updates.items()):
+        raise _UnsupportedLayout("rewrite did not round-trip")
+    if _without(after, hostname, updates) != _without(before, hostname, updates):
+        raise _UnsupportedLayout("rewrite touched unrelated keys")
+
+    _atomic_write(path, new_text)
+
+
+def _parse(text: str) -> dict[str, Any]:
+    import yaml
+
+    try:
+        data = accounts_mod.parse_hosts(text.encode("utf-8"))
+    except yaml.YAMLError as exc:
+        raise _UnsupportedLayout(f"unparseable hosts.yml: {exc}") from exc
+    if not isinstance(data, dict):
+        raise _UnsupportedLayout("hosts.yml is not a mapping")
+    return data
+
+
+def _host_section(data: dict[str, Any], hostname: str) -> dict[str, Any]:
+    host = data.get(hostname)
+    if (
+        not isinstance(host, dict)
+        or not isinstance(host.get("users"), dict)
+        or not isinstance(host.get("user"), str)
+    ):
+        raise _UnsupportedLayout(f"unrecognised layout for {hostname}")
+    return host
+
+
+def _without(data: dict[str, Any], hostname: str, keys: dict[str, str]) -> dict:
+    stripped = dict(data)
+    stripped[hostname] = {k: v for k, v in data[hostname].items() if k not in keys}
+    return stripped
+
+
+def _rewrite_host_keys(text: str, hostname: str, updates: dict[str, str]) -> str:
+    """Replace direct children of the top-level *hostname* block in *text*."""
+    lines = text.splitlines(keepends=True)
+    try:
+        start = next(
+            i for i, line in enumerate(lines) if line.rstrip() == f"{hostname}:"
+        )
+    except StopIteration:
+        raise _UnsupportedLayout(f"no block for {hostname}") from None
+
+    indent: str | None = None
+    seen: set[str] = set()
+    for i in range(start + 1, len(lines)):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if not line[0].isspace():
+            break  # next top-level host
+        current = line[: len(line) - len(line.lstrip())]
+        if indent is None:
+            indent = current
+        if current != indent:
+            continue
+        key = stripped.split(":", 1)[0]
+        if key in updates:
+            if key in seen:
+                raise _UnsupportedLayout(f"duplicate {key!r} under {hostname}")
+            seen.add(key)
+            newline = line[len(line.rstrip("\r\n")) :] or "\n"
+            lines[i] = f"{indent}{key}: {updates[key]}{newline}"
+
+    if seen != set(updates):
+        raise _UnsupportedLayout(f"missing keys under {hostname}")
+    return "".join(lines)
+
+
+def _atomic_write(path: os.PathLike[str], text: str) -> None:
+    """Write *text* to *path* via temp file + fsync + rename, like gh does."""
+    mode = os.stat(path).st_mode & 0o777
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".hosts.yml.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
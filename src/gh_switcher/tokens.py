@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+
+# Long enough that a burst of new shells shares one fetch, short enough that
+# a token revoked outside gh-switcher is not handed out for long.
+TTL_SECONDS = 5 * 60
+FETCH_TIMEOUT_SECONDS = 20.0
+
+
+def fetch_token(
+    host: str, username: str, timeout: float = FETCH_TIMEOUT_SECONDS
+) -> str | None:
+    """Ask gh for *username*'s stored token on *host*; None if it has none.
+
+    Works whether gh keeps tokens in the keyring or in hosts.yml.
+
+    Raises:
+        OSError: if gh cannot be run.
+        subprocess.TimeoutExpired: if gh does not answer within *timeout*.
+    """
+    result = subprocess.run(
+        ["gh", "auth", "token", "--hostname", host, "--user", username],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+class TokenCache:
+    """gh tokens held in memory for TTL_SECONDS after they were fetched.
+
+    Lookups never block: a miss returns None and starts a background fetch,
+    so the next lookup for the same account is served from memory.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, str], str | None] = fetch_token,
+        ttl: float = TTL_SECONDS,
+    ) -> None:
+        self._fetch = fetch
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._tokens: dict[tuple[str, str], tuple[str, float]] = {}
+        self._inflight: set[tuple[str, str]] = set()
+        # Bumped by clear(), so a fetch that started before it is dropped.
+        self._generation = 0
+
+    def get(self, host: str, username: str) -> str | None:
+        """Cached token for the account, or None after starting a fetch."""
+        key = (host, username)
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None and time.monotonic() < entry[1]:
+                return entry[0]
+            self._tokens.pop(key, None)
+            if key in self._inflight:
+                return None
+            self._inflight.add(key)
+            generation = self._generation
+        threading.Thread(
+            target=self._fill,
+            args=(key, generation),
+            name="gh-switcher-token",
+            daemon=True,
+        ).start()
+        return None
+
+    def clear(self) -> None:
+        """Forget every token, e.g. after hosts.yml changed."""
+        with self._lock:
+            self._tokens.clear()
+            self._generation += 1
+
+    def _fill(self, key: tuple[str, str], generation: int) -> None:
+        try:
+            token = self._fetch(*key)
+        except (OSError, subprocess.TimeoutExpired):
+            token = None
+        with self._lock:
+            self._inflight.discard(key)
+            if token and generation == self._generation:
+                self._tokens[key] = (token, time.monotonic() + self._ttl)
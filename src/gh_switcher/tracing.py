@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Samples kept per stage; percentiles are computed over this window.
+SAMPLES_PER_STAGE = 512
+# Set to 1 to append every span to a JSONL file in the cache dir as it ends.
+DUMP_ENV = "GH_SWITCHER_TRACE"
+
+
+@dataclass(frozen=True, slots=True)
+class Span:
+    stage: str
+    start: float  # wall clock, seconds since the epoch
+    duration_ms: float
+    thread: str
+
+
+@dataclass(frozen=True, slots=True)
+class StageStats:
+    count: int
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+_lock = threading.Lock()
+_samples: dict[str, deque[Span]] = {}
+_counts: dict[str, int] = {}
+_max_ms: dict[str, float] = {}
+_dump_file = None
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block and record it under *stage*."""
+    start = time.perf_counter_ns()
+    wall = time.time()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter_ns() - start) / 1e6
+        _record(Span(stage, wall, duration_ms, threading.current_thread().name))
+
+
+def summary() -> dict[str, StageStats]:
+    """Per-stage p50/p95 over recent samples, and the max since startup."""
+    with _lock:
+        snapshot = {stage: list(spans) for stage, spans in _samples.items()}
+        counts = dict(_counts)
+        maxima = dict(_max_ms)
+    stats: dict[str, StageStats] = {}
+    for stage, spans in sorted(snapshot.items()):
+        durations = sorted(s.duration_ms for s in spans)
+        stats[stage] = StageStats(
+            count=counts[stage],
+            p50_ms=_percentile(durations, 0.50),
+            p95_ms=_percentile(durations, 0.95),
+            max_ms=maxima[stage],
+        )
+    return stats
+
+
+def format_summary() -> str:
+    lines = [
+        f"{stage}: p50 {s.p50_ms:.1f} / p95 {s.p95_ms:.1f} / max {s.max_ms:.1f} ms"
+        f" ({s.count})"
+        for stage, s in summary().items()
+    ]
+    return "\n".join(lines) or "No timings recorded yet."
+
+
+def export() -> Path:
+    """Write the retained spans, oldest first, to a JSONL file; return it."""
+    with _lock:
+        spans = sorted(
+            (s for stage in _samples.values() for s in stage), key=lambda s: s.start
+        )
+    path = _trace_dir() / time.strftime("spans-%Y%m%d-%H%M%S.jsonl")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        for s in spans:
+            fh.write(json.dumps(asdict(s)) + "\n")
+    return path
+
+
+def _record(s: Span) -> None:
+    global _dump_file
+    with _lock:
+        ring = _samples.get(s.stage)
+        if ring is None:
+            ring = _samples[s.stage] = deque(maxlen=SAMPLES_PER_STAGE)
+            _counts[s.stage] = 0
+            _max_ms[s.stage] = 0.0
+        ring.append(s)
+        _counts[s.stage] += 1
+        _max_ms[s.stage] = max(_max_ms[s.stage], s.duration_ms)
+
+        if os.environ.get(DUMP_ENV) == "1":
+            if _dump_file is None:
+                path = _trace_dir() / f"events-{os.getpid()}.jsonl"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _dump_file = path.open("a", encoding="utf-8", buffering=1)
+            _dump_file.write(json.dumps(asdict(s)) + "\n")
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def _trace_dir() -> Path:
+    import platformdirs
+
+    return Path(platformdirs.user_cache_dir("gh-switcher")) / "traces"
@@ -3,28 +3,59 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from collections.abc import Callable
 from dataclasses import dataclass
-from pathlib import Path
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from gh_switcher.icons import Icon
 
-@dataclass
+
+@dataclass(slots=True)
 class MenuItem:
     label: str
     callback: Callable[[], None] | None = None
     checked: bool = False
+    # One of a set of choices, drawn as a radio item whether *checked* or not,
+    # so a change of choice patches two items instead of replacing them.
+    radio: bool = False
     separator: bool = False
     enabled: bool = True
+    # Builds the items of a submenu; backends call it only when it is opened.
+    submenu: Callable[[], list[MenuItem]] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class TrayState:
+    """Everything the tray shows, applied as one update."""
+
+    icon: Icon
+    tooltip: str
+    menu: list[MenuItem]
 
 
 class TrayBackend(ABC):
     """Platform-agnostic tray icon abstraction."""
 
+    # True if the backend loads icons from files; they are then written
+    # ahead of time instead of when first shown.
+    icon_files = False
+
     @abstractmethod
     def run(self, on_ready: Callable[[], None]) -> None:
         """Start the tray event loop. Blocks until stop() is called."""
 
     @abstractmethod
-    def set_icon(self, image_path: Path) -> None:
-        """Update the tray icon to the image at *image_path*."""
+    def apply(self, state: TrayState) -> None:
+        """Show *state* in a single main-loop dispatch.
+
+        Safe to call from any thread.  If an earlier state has not been
+        applied yet it is dropped in favour of *state*.  The app calls it with
+        its state lock held, at times on the UI thread, so it must not wait
+        for file I/O.
+        """
+
+    @abstractmethod
+    def set_icon(self, icon: Icon) -> None:
+        """Update the tray icon to *icon*."""
 
     @abstractmethod
     def set_tooltip(self, text: str) -> None:
@@ -32,8 +63,61 @@ class TrayBackend(ABC):
 
     @abstractmethod
     def set_menu(self, items: list[MenuItem]) -> None:
-        """Rebuild the context menu from *items*."""
+        """Update the context menu to show *items*."""
 
     @abstractmethod
     def stop(self) -> None:
         """Quit the tray and event loop."""
+
+
+def menu_kind(item: MenuItem) -> str:
+    """Widget type needed for *item*; a change of kind means a new widget."""
+    if item.separator:
+        return "separator"
+    if item.submenu is not None:
+        return "submenu"
+    return "radio" if item.radio else "plain"
+
+
+def reconcile_menu[W](
+    old_items: list[MenuItem],
+    old_widgets: list[W],
+    new_items: list[MenuItem],
+    *,
+    create: Callable[[MenuItem], W],
+    update: Callable[[W, MenuItem, MenuItem], None],
+    remove: Callable[[W], None],
+    insert: Callable[[W, int], None],
+) -> list[W]:
+    """Patch the widgets built for *old_items* so they render *new_items*.
+
+    Items are matched by label; matched items of the same kind are patched
+    in place via *update*, and widgets are only created, removed or inserted
+    where the structure actually changed.  Returns the new widget list.
+    """
+    from difflib import SequenceMatcher  # deferred: the first paint has no diff
+
+    matcher = SequenceMatcher(
+        a=[(i.separator, i.label) for i in old_items],
+        b=[(i.separator, i.label) for i in new_items],
+        autojunk=False,
+    )
+    widgets: list[W] = []
+    for _tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        paired = min(i2 - i1, j2 - j1)
+        for k in range(paired):
+            old, widget, new = old_items[i1 + k], old_widgets[i1 + k], new_items[j1 + k]
+            if menu_kind(old) == menu_kind(new):
+                update(widget, old, new)
+            else:
+                remove(widget)
+                widget = create(new)
+                insert(widget, len(widgets))
+            widgets.append(widget)
+        for k in range(paired, i2 - i1):
+            remove(old_widgets[i1 + k])
+        for k in range(paired, j2 - j1):
+            widget = create(new_items[j1 + k])
+            insert(widget, len(widgets))
+            widgets.append(widget)
+    return widgets
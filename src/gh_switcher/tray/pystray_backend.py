@@ -1,35 +1,88 @@
 from __future__ import annotations
 
+import threading
 from collections.abc import Callable
-from pathlib import Path
-
-from PIL import Image
 
 import pystray  # type: ignore[import]
 
-from gh_switcher.tray.base import MenuItem, TrayBackend
+from gh_switcher import tracing
+from gh_switcher.icons import Icon, placeholder_icon
+from gh_switcher.tray.base import MenuItem, TrayBackend, TrayState, reconcile_menu
+
+
+class _Slot:
+    """Live state behind one pystray item, read through its callables.
+
+    pystray evaluates text/checked/enabled lazily, so patching a slot and
+    calling update_menu() is enough when the menu's structure is unchanged.
+    """
+
+    __slots__ = ("item", "state")
+
+    def __init__(self, state: MenuItem) -> None:
+        self.state = state
+        if state.separator:
+            self.item = pystray.Menu.SEPARATOR
+            return
+        if state.submenu is not None:
+            # A callable Menu is re-evaluated each time pystray shows it.
+            self.item = pystray.MenuItem(
+                text=lambda _: self.state.label,
+                action=pystray.Menu(self._submenu_items),
+                enabled=lambda _: self.state.enabled,
+            )
+            return
+        self.item = pystray.MenuItem(
+            text=lambda _: self.state.label,
+            action=self._activate,
+            checked=(lambda _: self.state.checked) if state.radio else None,
+            radio=state.radio,
+            enabled=lambda _: self.state.enabled,
+        )
+
+    def _activate(self) -> None:
+        if self.state.callback is not None:
+            self.state.callback()
+
+    def _submenu_items(self) -> list[pystray.MenuItem]:
+        build = self.state.submenu
+        return [_Slot(item).item for item in build()] if build else []
 
 
 class PystrayBackend(TrayBackend):
     def __init__(self) -> None:
         self._icon: pystray.Icon | None = None
-        self._image: Image.Image = Image.new("RGBA", (64, 64), (100, 100, 100, 255))
         self._tooltip: str = "gh-switcher"
         self._menu_items: list[MenuItem] = []
+        self._slots: list[_Slot] = []
+        self._shown_icon: Icon | None = None
+        self._lock = threading.Lock()
 
     def run(self, on_ready: Callable[[], None]) -> None:
         self._icon = pystray.Icon(
             "gh-switcher",
-            self._image,
+            (self._shown_icon or placeholder_icon()).image,
             self._tooltip,
             menu=self._build_pystray_menu(),
         )
         self._icon.run(setup=lambda icon: on_ready())
 
-    def set_icon(self, image_path: Path) -> None:
-        self._image = Image.open(image_path).convert("RGBA")
+    def apply(self, state: TrayState) -> None:
+        # pystray has no main loop of ours to defer to; serialising callers
+        # means a superseded state is simply overwritten by the next one.
+        with self._lock, tracing.span("tray.redraw"):
+            if state.icon != self._shown_icon:
+                self.set_icon(state.icon)
+            if state.tooltip != self._tooltip:
+                self.set_tooltip(state.tooltip)
+            self.set_menu(state.menu)
+
+    def set_icon(self, icon: Icon) -> None:
+        # Handed over as rendered: no PNG round trip through the disk.  The
+        # image is held by pystray (and the Icon), not by a copy here.
+        self._shown_icon = icon
         if self._icon:
-            self._icon.icon = self._image
+            self._icon.icon = icon.image
 
     def set_tooltip(self, text: str) -> None:
         self._tooltip = text
@@ -37,9 +90,33 @@ class PystrayBackend(TrayBackend):
             self._icon.title = text
 
     def set_menu(self, items: list[MenuItem]) -> None:
-        self._menu_items = items
+        structural = False
+
+        def create(item: MenuItem) -> _Slot:
+            nonlocal structural
+            structural = True
+            return _Slot(item)
+
+        def remove(_slot: _Slot) -> None:
+            nonlocal structural
+            structural = True
+
+        def update(slot: _Slot, _old: MenuItem, new: MenuItem) -> None:
+            slot.state = new
+
+        self._slots = reconcile_menu(
+            self._menu_items,
+            self._slots,
+            items,
+            create=create,
+            update=update,
+            remove=remove,
+            insert=lambda _slot, _index: None,
+        )
+        self._menu_items = list(items)
         if self._icon:
-            self._icon.menu = self._build_pystray_menu()
+            if structural:
+                self._icon.menu = self._build_pystray_menu()
             self._icon.update_menu()
 
     def stop(self) -> None:
@@ -47,19 +124,4 @@ class PystrayBackend(TrayBackend):
             self._icon.stop()
 
     def _build_pystray_menu(self) -> pystray.Menu:
-        pystray_items: list[pystray.MenuItem] = []
-        for item in self._menu_items:
-            if item.separator:
-                pystray_items.append(pystray.Menu.SEPARATOR)
-                continue
-            pystray_items.append(
-                pystray.MenuItem(
-                    text=item.label,
-                    action=item.callback,
-                    checked=(lambda i: lambda _: i.checked)(item)
-                    if item.checked
-                    else None,
-                    enabled=item.enabled,
-                )
-            )
-        return pystray.Menu(*pystray_items)
+        return pystray.Menu(*(slot.item for slot in self._slots))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
+import threading
 from collections.abc import Callable
-from pathlib import Path
 
 import gi
 
@@ -10,15 +10,44 @@ gi.require_version("XApp", "1.0")
 
 from gi.repository import GLib, Gtk, XApp  # noqa: E402
 
-from gh_switcher.tray.base import MenuItem, TrayBackend  # noqa: E402
+from gh_switcher import tracing  # noqa: E402
+from gh_switcher.icons import Icon  # noqa: E402
+from gh_switcher.tray.base import (  # noqa: E402
+    MenuItem,
+    TrayBackend,
+    TrayState,
+    reconcile_menu,
+)
 
 
 class XAppTrayBackend(TrayBackend):
+    icon_files = True  # XApp.StatusIcon takes a file name
+
     def __init__(self) -> None:
         self._icon: XApp.StatusIcon = XApp.StatusIcon()
         self._icon.set_visible(True)
         self._menu: Gtk.Menu = Gtk.Menu()
+        self._menu_attached = False
+        self._items: list[MenuItem] = []
+        self._widgets: list[Gtk.MenuItem] = []
+        # Handlers look callbacks up here, so replacing one needs no reconnect.
+        self._callbacks: dict[Gtk.MenuItem, Callable[[], None] | None] = {}
+        self._activate_ids: dict[Gtk.MenuItem, int] = {}
+        # What each check item should show; GTK flips it on every click.
+        self._checked: dict[Gtk.MenuItem, bool] = {}
+        self._submenus: dict[Gtk.Menu, Callable[[], list[MenuItem]]] = {}
         self._on_ready: Callable[[], None] | None = None
+        self._pending_cond = threading.Condition()
+        # The next state to show, waiting for its icon to be on disk.
+        self._pending: TrayState | None = None
+        self._ready_lock = threading.Lock()
+        # The next state to show, with its icon file; None if it has none.
+        self._ready: tuple[TrayState, str | None] | None = None
+        self._shown_icon: Icon | None = None
+        self._shown_tooltip: str | None = None
+        threading.Thread(
+            target=self._prepare_loop, name="gh-switcher-tray", daemon=True
+        ).start()
 
     # -- TrayBackend interface ------------------------------------------------
 
@@ -27,14 +56,21 @@ class XAppTrayBackend(TrayBackend):
         GLib.idle_add(self._fire_ready)
         Gtk.main()
 
-    def set_icon(self, image_path: Path) -> None:
-        GLib.idle_add(self._icon.set_icon_name, str(image_path))
+    def apply(self, state: TrayState) -> None:
+        # Menu clicks call this on GTK's thread, so it only hands over: the
+        # icon is rendered and written, on a cache miss, by _prepare_loop.
+        with self._pending_cond:
+            self._pending = state
+            self._pending_cond.notify()
+
+    def set_icon(self, icon: Icon) -> None:
+        GLib.idle_add(self._icon.set_icon_name, str(icon.file()))
 
     def set_tooltip(self, text: str) -> None:
         GLib.idle_add(self._icon.set_tooltip_text, text)
 
     def set_menu(self, items: list[MenuItem]) -> None:
-        GLib.idle_add(self._rebuild_menu, items)
+        GLib.idle_add(self._apply_menu, items)
 
     def stop(self) -> None:
         GLib.idle_add(Gtk.main_quit)
@@ -46,37 +82,133 @@ class XAppTrayBackend(TrayBackend):
             self._on_ready()
         return GLib.SOURCE_REMOVE
 
-    def _rebuild_menu(self, items: list[MenuItem]) -> bool:
-        # Destroy existing items
-        for child in self._menu.get_children():
-            self._menu.remove(child)
-
-        for item in items:
-            if item.separator:
-                self._menu.append(Gtk.SeparatorMenuItem())
-                continue
-
-            if item.checked:
-                gtk_item = Gtk.CheckMenuItem(label=item.label)
-                gtk_item.set_active(True)
-                gtk_item.set_draw_as_radio(True)
-            else:
-                gtk_item = Gtk.MenuItem(label=item.label)
-
-            gtk_item.set_sensitive(item.enabled)
-
-            if item.callback is not None:
-                callback = item.callback  # capture for closure
-
-                def _on_activate(
-                    _widget: Gtk.MenuItem, cb: Callable = callback
-                ) -> None:
-                    cb()
-
-                gtk_item.connect("activate", _on_activate)
-
-            self._menu.append(gtk_item)
-
-        self._menu.show_all()
-        self._icon.set_secondary_menu(self._menu)
+    def _prepare_loop(self) -> None:
+        """Put each applied state's icon on disk, then schedule its redraw."""
+        while True:
+            with self._pending_cond:
+                while self._pending is None:
+                    self._pending_cond.wait()
+                state, self._pending = self._pending, None
+            try:
+                icon_name: str | None = str(state.icon.file())
+            except OSError:
+                icon_name = None  # cache not writable: keep the icon shown
+            with self._ready_lock:
+                scheduled = self._ready is not None
+                self._ready = (state, icon_name)
+            if not scheduled:
+                GLib.idle_add(self._flush)
+
+    def _flush(self) -> bool:
+        with self._ready_lock:
+            ready, self._ready = self._ready, None
+        if ready is None:
+            return GLib.SOURCE_REMOVE
+        state, icon_name = ready
+        with tracing.span("tray.redraw"):
+            if icon_name is not None and state.icon != self._shown_icon:
+                self._icon.set_icon_name(icon_name)
+                self._shown_icon = state.icon
+            if state.tooltip != self._shown_tooltip:
+                self._icon.set_tooltip_text(state.tooltip)
+                self._shown_tooltip = state.tooltip
+            return self._apply_menu(state.menu)
+
+    def _apply_menu(self, items: list[MenuItem]) -> bool:
+        self._widgets = reconcile_menu(
+            self._items,
+            self._widgets,
+            items,
+            create=self._create_widget,
+            update=self._update_widget,
+            remove=self._remove_widget,
+            insert=self._menu.insert,
+        )
+        self._items = list(items)
+        if not self._menu_attached:
+            self._icon.set_secondary_menu(self._menu)
+            self._menu_attached = True
         return GLib.SOURCE_REMOVE
+
+    def _create_widget(self, item: MenuItem) -> Gtk.MenuItem:
+        if item.separator:
+            widget = Gtk.SeparatorMenuItem()
+        elif item.submenu is not None:
+            widget = Gtk.MenuItem(label=item.label)
+            submenu = Gtk.Menu()
+            self._submenus[submenu] = item.submenu
+            submenu.connect("show", self._on_submenu_show)
+            widget.set_submenu(submenu)
+        elif item.radio:
+            widget = Gtk.CheckMenuItem(label=item.label)
+            widget.set_active(item.checked)
+            widget.set_draw_as_radio(True)
+            self._checked[widget] = item.checked
+        else:
+            widget = Gtk.MenuItem(label=item.label)
+
+        if not item.separator:
+            widget.set_sensitive(item.enabled)
+            self._callbacks[widget] = item.callback
+            self._activate_ids[widget] = widget.connect("activate", self._on_activate)
+        widget.show()
+        return widget
+
+    def _update_widget(
+        self, widget: Gtk.MenuItem, old: MenuItem, new: MenuItem
+    ) -> None:
+        if new.separator:
+            return
+        if new.label != old.label:
+            widget.set_label(new.label)
+        if new.enabled != old.enabled:
+            widget.set_sensitive(new.enabled)
+        self._callbacks[widget] = new.callback
+        if isinstance(widget, Gtk.CheckMenuItem):
+            self._set_checked(widget, new.checked)
+        if new.submenu is not None:
+            self._submenus[widget.get_submenu()] = new.submenu
+
+    def _remove_widget(self, widget: Gtk.MenuItem) -> None:
+        self._forget(widget)
+        self._menu.remove(widget)
+        widget.destroy()
+
+    def _forget(self, widget: Gtk.MenuItem) -> None:
+        self._callbacks.pop(widget, None)
+        self._activate_ids.pop(widget, None)
+        self._checked.pop(widget, None)
+        submenu = widget.get_submenu()
+        if submenu is not None:
+            self._submenus.pop(submenu, None)
+            for child in submenu.get_children():
+                self._forget(child)
+
+    def _on_submenu_show(self, submenu: Gtk.Menu) -> None:
+        # Built on every open rather than on every state change: a host's
+        # accounts cost nothing until someone actually looks at them.
+        build = self._submenus.get(submenu)
+        if build is None:
+            return
+        for child in submenu.get_children():
+            self._forget(child)
+            child.destroy()
+        for item in build():
+            submenu.append(self._create_widget(item))
+
+    def _set_checked(self, widget: Gtk.CheckMenuItem, checked: bool) -> None:
+        self._checked[widget] = checked
+        if widget.get_active() == checked:
+            return
+        # set_active() emits "activate", which must not count as a click.
+        with widget.handler_block(self._activate_ids[widget]):
+            widget.set_active(checked)
+
+    def _on_activate(self, widget: Gtk.MenuItem) -> None:
+        if isinstance(widget, Gtk.CheckMenuItem):
+            # Clicking the checked account unchecks it, and switching to it
+            # again changes no state, so nothing else would put it back.
+            self._set_checked(widget, self._checked.get(widget, False))
+        callback = self._callbacks.get(widget)
+        if callback is not None:
+            callback()
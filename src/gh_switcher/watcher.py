@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import os
+import select
+import struct
+import sys
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from gh_switcher import accounts as accounts_mod
+from gh_switcher import filecache
+from gh_switcher.accounts import Accounts
+
+DEBOUNCE_SECONDS = 0.25
+POLL_INTERVAL_SECONDS = 2.0
+
+# inotify(7) constants
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# gh writes hosts.yml to a temp file and renames it into place (as editors
+# do with accounts.toml), so the file itself is never a stable watch target —
+# watch its directory instead.
+_DIR_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+_DIR_GONE = _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED
+
+_EVENT = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """Call *on_change* whenever *path* is written, replaced or removed.
+
+    Uses inotify on Linux and falls back to stat polling elsewhere.  While
+    the file's directory does not exist it is polled for, and watched again
+    once it is back.  Bursts of events are debounced, and a change only
+    counts when the stat signature moved.
+    """
+
+    def __init__(self, path: Path, on_change: Callable[[], None]) -> None:
+        self._path = path
+        self._on_change = on_change
+        self._stamp: filecache.Stamp | None = None
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Begin watching from the file's current state."""
+        self._stamp = filecache.stamp(self._path)
+        self._thread = threading.Thread(
+            target=self._run, name="gh-switcher-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching and release the wake-up pipe.  Idempotent."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        os.write(self._wake_w, b"\0")
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    # -- Internal -------------------------------------------------------------
+
+    def _run(self) -> None:
+        directory = self._path.parent
+        unwatched = False  # whether a change may have gone unseen
+        while sys.platform == "linux" and not self._stop.is_set():
+            fd = _inotify_watch_dir(self._path)
+            if fd is None:
+                if directory.is_dir():
+                    break  # no inotify here: poll for good
+                self._run_polling(until=directory.is_dir)
+                unwatched = True
+                continue
+            try:
+                if unwatched:
+                    self._check()  # written between the last poll and now?
+                self._run_inotify(fd)
+                unwatched = True
+            finally:
+                os.close(fd)
+        if not self._stop.is_set():
+            self._run_polling()
+
+    def _run_inotify(self, fd: int) -> None:
+        """Block on inotify until stopped or the directory watch is lost."""
+        target = os.fsencode(self._path.name)
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd, self._wake_r], [], [])
+            if self._wake_r in ready:
+                return
+            relevant, gone = _drain(fd, target)
+            # Debounce: keep swallowing events until the burst goes quiet.
+            while not gone and select.select([fd], [], [], DEBOUNCE_SECONDS)[0]:
+                more, gone = _drain(fd, target)
+                relevant = relevant or more
+            if relevant or gone:
+                self._check()
+            if gone:
+                return
+
+    def _run_polling(self, until: Callable[[], bool] | None = None) -> None:
+        """Poll until stopped or, if given, until *until* returns true."""
+        while not self._stop.wait(POLL_INTERVAL_SECONDS):
+            self._check()
+            if until is not None and until():
+                return
+
+    def _check(self) -> None:
+        stamp = filecache.stamp(self._path)
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        if self._changed():
+            self._on_change()
+
+    def _changed(self) -> bool:
+        """Whether a new stat signature is a change worth reporting."""
+        return True
+
+
+class HostsWatcher(FileWatcher):
+    """Call *on_change* whenever the account set in hosts.yml changes.
+
+    hosts.yml is only re-parsed when its stat signature moved, and writes
+    that leave the accounts as they were (token refreshes) are ignored.
+    """
+
+    def __init__(self, on_change: Callable[[], None]) -> None:
+        super().__init__(accounts_mod.HOSTS_FILE, on_change)
+        self._accounts = Accounts()
+
+    def start(self, current: Accounts) -> None:  # type: ignore[override]
+        """Begin watching; *current* is the account set already displayed."""
+        self._accounts = current
+        super().start()
+
+    def _changed(self) -> bool:
+        accounts = accounts_mod.load_accounts()
+        if accounts == self._accounts:
+            return False
+        self._accounts = accounts
+        return True
+
+
+def _inotify_watch_dir(path: Path) -> int | None:
+    """Return an inotify fd watching *path*'s directory, or None."""
+    import ctypes.util  # deferred: costs more than the rest of the module
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    directory = os.fsencode(path.parent)
+    if libc.inotify_add_watch(fd, directory, _DIR_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _drain(fd: int, target: bytes) -> tuple[bool, bool]:
+    """Consume pending events.
+
+    Returns (relevant, gone): whether any event named *target*, and whether
+    the watched directory itself went away.
+    """
+    relevant = gone = False
+    while True:
+        try:
+            buf = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return relevant, gone
+        offset = 0
+        while offset < len(buf):
+            _wd, mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _DIR_GONE:
+                gone = True
+            elif name == target:
+                relevant = True
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+
+
+class SwitchWorker:
+    """Run switches one at a time on a background thread.
+
+    Only the most recent request per host is kept while a switch is in
+    flight, so a burst of clicks collapses into a single switch to the last
+    account, without dropping a click meant for another host.
+    """
+
+    def __init__(self, perform: Callable[[str, str], None]) -> None:
+        self._perform = perform
+        self._cond = threading.Condition()
+        self._pending: dict[str, str] = {}
+        self._busy = False
+        self._thread = threading.Thread(
+            target=self._run, name="gh-switcher-switch", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, host: str, username: str) -> None:
+        """Queue a switch to *username* on *host*, replacing any not yet started."""
+        with self._cond:
+            self._pending.pop(host, None)  # re-queue behind other hosts
+            self._pending[host] = username
+            self._cond.notify_all()
+
+    def has_pending(self) -> bool:
+        with self._cond:
+            return bool(self._pending)
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until nothing is queued or running; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._busy, timeout
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                host = next(iter(self._pending))
+                username = self._pending.pop(host)
+                self._busy = True
+            try:
+                self._perform(host, username)
+            except Exception:
+                # Keep the worker alive; a dead thread would ignore all clicks.
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
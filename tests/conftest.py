@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+import stat
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import filecache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_filecache():
+    # Parses are cached per path and stat signature; tmp_path files written
+    # in quick succession can share one.
+    filecache.clear()
+    yield
+    filecache.clear()
+
+
+@pytest.fixture
+def stub_gh(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Callable[[str], Path]:
+    """Put a `gh` on PATH that logs its arguments and then runs *script*.
+
+    Returns the log, one line per call.  *script* is sh, run with gh's
+    arguments as "$@".
+    """
+    bin_dir = tmp_path / "stub-bin"
+    log = tmp_path / "gh.log"
+
+    def install(script: str = "exit 0") -> Path:
+        bin_dir.mkdir(exist_ok=True)
+        gh = bin_dir / "gh"
+        gh.write_text(f'#!/bin/sh\nprintf \'%s\\n\' "$*" >> "{log}"\n{script}\n')
+        gh.chmod(gh.stat().st_mode | stat.S_IXUSR)
+        log.touch()
+        return log
+
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return install
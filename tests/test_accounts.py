@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import pytest
+import yaml
+
+from gh_switcher import accounts
+
+# Layouts gh writes, which the plain reader must take without PyYAML.
+PLAIN = {
+    "keyring": (
+        "github.com:\n    users:\n        alice:\n        bob:\n"
+        "    git_protocol: https\n    user: alice\n"
+    ),
+    "file_storage": (
+        "github.com:\n    users:\n        alice:\n            oauth_token: gho_a1\n"
+        "        bob:\n            oauth_token: gho_b2\n"
+        "    git_protocol: ssh\n    oauth_token: gho_a1\n    user: alice\n"
+    ),
+    "single_account": (
+        "github.com:\n    oauth_token: gho_a1\n    user: alice\n"
+        "    git_protocol: https\n"
+    ),
+    "two_hosts_comments_crlf": (
+        "# managed by gh\r\ngithub.com:\r\n  users:\r\n    alice:\r\n"
+        "  user: alice # active\r\n\r\nghe.example.com:\r\n  users:\r\n"
+        "    carol-x:\r\n  user: carol-x\r\n"
+    ),
+    "empty_host": "github.com:\nghe.example.com:\n    user: bob\n",
+    "empty": "",
+    "only_comments": "# nothing yet\n",
+}
+
+# Valid YAML the plain reader must leave to PyYAML.
+FALLBACK = {
+    "flow": "github.com: {users: {alice: {}}, user: alice}\n",
+    "quoted": 'github.com:\n    user: "alice"\n',
+    "numeric_user": "github.com:\n    users:\n        1234:\n    user: 1234\n",
+    "bool_word": "github.com:\n    user: yes\n",
+    "null_word": "github.com:\n    user: null\n",
+    "list": "github.com:\n    users:\n        - alice\n",
+    "document_marker": "---\ngithub.com:\n    user: alice\n",
+    "bom": "\ufeffgithub.com:\n    user: alice\n",
+    "colon_in_value": "github.com:\n    user: a:b\n",
+}
+
+
+def pyyaml(text: str):
+    return yaml.safe_load(text) or {}
+
+
+@pytest.mark.parametrize("name", PLAIN)
+def test_plain_reader_matches_pyyaml(name):
+    raw = PLAIN[name].encode("utf-8")
+    assert accounts._parse_plain(raw) == pyyaml(PLAIN[name])
+
+
+@pytest.mark.parametrize("name", FALLBACK)
+def test_other_yaml_goes_to_pyyaml(name):
+    raw = FALLBACK[name].encode("utf-8")
+    assert accounts._parse_plain(raw) is None
+    assert accounts.parse_hosts(raw) == pyyaml(FALLBACK[name])
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "github.com:\n    user: alice\n  users:\n",  # dedent to no open mapping
+        "github.com: alice\n    user: bob\n",  # indent under a scalar
+        "github.com:\n    user: alice\n   users:\n",
+        "github.com:\n\tuser: alice\n",  # tabs never indent YAML
+    ],
+)
+def test_malformed_goes_to_pyyaml(text):
+    assert accounts._parse_plain(text.encode("utf-8")) is None
+    with pytest.raises(yaml.YAMLError):
+        accounts.parse_hosts(text.encode("utf-8"))
+
+
+def test_load_accounts(tmp_path, monkeypatch):
+    path = tmp_path / "hosts.yml"
+    path.write_text(PLAIN["two_hosts_comments_crlf"])
+    monkeypatch.setattr(accounts, "HOSTS_FILE", path)
+    loaded = accounts.load_accounts()
+    assert [(a.host, a.username, a.active) for a in loaded] == [
+        ("github.com", "alice", True),
+        ("ghe.example.com", "carol-x", True),
+    ]
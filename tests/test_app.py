@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import accounts, app, autostart, config, icons, locks
+from gh_switcher.identity import GitIdentity
+from gh_switcher.state import Source
+from gh_switcher.switcher import SwitchError
+from gh_switcher.tray.base import MenuItem, TrayBackend, TrayState
+
+HOSTS = """\
+github.com:
+    users:
+        alice:
+        bob:
+        carol:
+    git_protocol: https
+    user: alice
+"""
+
+
+class RecordingBackend(TrayBackend):
+    """Keeps every state applied, in order, and draws nothing."""
+
+    def __init__(self) -> None:
+        self.states: list[TrayState] = []
+
+    def run(self, on_ready: Callable[[], None]) -> None:
+        on_ready()
+
+    def apply(self, state: TrayState) -> None:
+        self.states.append(state)
+
+    def set_icon(self, icon: icons.Icon) -> None:
+        pass
+
+    def set_tooltip(self, text: str) -> None:
+        pass
+
+    def set_menu(self, items: list[MenuItem]) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    @property
+    def checked(self) -> list[str]:
+        """Labels of the checked items in the last state."""
+        return [i.label for i in self.states[-1].menu if i.checked]
+
+
+@pytest.fixture
+def tray_app(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> app.GhSwitcherApp:
+    """An app on a hosts.yml with alice (active), bob and carol; not started."""
+    hosts = tmp_path / "hosts.yml"
+    hosts.write_text(HOSTS, encoding="utf-8")
+    monkeypatch.setattr(accounts, "HOSTS_FILE", hosts)
+    monkeypatch.setattr(config, "ACCOUNTS_FILE", tmp_path / "accounts.toml")
+    monkeypatch.setattr(autostart, "_DESKTOP_FILE", tmp_path / "autostart.desktop")
+    monkeypatch.setattr(icons, "CACHE_DIR", tmp_path / "icons")
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(tmp_path / "gitconfig"))
+    monkeypatch.setattr(locks, "_switch_lock", locks.FileLock(str(tmp_path / "lock")))
+    return app.GhSwitcherApp(backend=RecordingBackend())
+
+
+def test_refresh_reads_inputs_outside_the_state_lock(tray_app, monkeypatch):
+    reading, release = threading.Event(), threading.Event()
+
+    def slow_identity() -> GitIdentity:
+        reading.set()
+        release.wait(5)
+        return GitIdentity(name="Alice", email="alice@example.com")
+
+    tray_app.refresh()
+    tray_app._identity_source = Source(slow_identity)
+    monkeypatch.setattr(tray_app._worker, "submit", lambda host, username: None)
+    refresh = threading.Thread(target=tray_app.refresh)
+    refresh.start()
+    try:
+        assert reading.wait(5)
+        # A menu click while refresh() waits on git is shown at once.
+        start = time.monotonic()
+        tray_app.switch_to("github.com", "bob")
+        assert time.monotonic() - start < 1
+        assert tray_app._backend.checked == ["bob"]
+    finally:
+        release.set()
+        refresh.join()
+    # The overlay is still in place, so refresh() does not undo the click.
+    assert tray_app._backend.checked == ["bob"]
+
+
+def test_failed_switch_reverts_the_optimistic_overlay(tray_app, monkeypatch):
+    release = threading.Event()
+    notified: list[str] = []
+
+    def failing_switch(username: str, host: str, native: bool) -> None:
+        release.wait(5)
+        raise SwitchError(f"could not switch to {username}")
+
+    monkeypatch.setattr(app, "run_switch", failing_switch)
+    monkeypatch.setattr(
+        app.notifications, "notify", lambda title, message: notified.append(title)
+    )
+    tray_app.refresh()
+    tray_app.switch_to("github.com", "bob")
+    assert tray_app._backend.checked == ["bob"]
+
+    release.set()
+    assert tray_app._worker.wait_idle(5)
+    assert tray_app._backend.checked == ["alice"]
+    assert tray_app._optimistic == {}
+    assert notified == ["Switch failed"]
+
+
+def test_clicks_during_a_switch_show_and_run_the_last(tray_app, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    switched: list[str] = []
+
+    def slow_switch(username: str, host: str, native: bool) -> None:
+        started.set()
+        release.wait(5)
+        switched.append(username)
+
+    monkeypatch.setattr(app, "run_switch", slow_switch)
+    monkeypatch.setattr(app.notifications, "notify", lambda title, message: None)
+    tray_app.refresh()
+    tray_app.switch_to("github.com", "bob")
+    assert started.wait(5)
+    tray_app.switch_to("github.com", "alice")
+    tray_app.switch_to("github.com", "carol")
+    assert tray_app._backend.checked == ["carol"]
+
+    release.set()
+    assert tray_app._worker.wait_idle(5)
+    assert switched == ["bob", "carol"]
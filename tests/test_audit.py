@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import json
+import shutil
+import stat
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import audit, config, rules
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+ACCOUNTS = """\
+[alice]
+name = "Alice"
+email = "alice@example.com"
+paths = ["{root}/alice"]
+
+[bob]
+name = "Bob"
+email = "bob@example.com"
+paths = ["{root}/bob"]
+"""
+
+
+@pytest.fixture
+def root(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A workspace with alice's and bob's directories and a fresh cache."""
+    workspace = tmp_path / "ws"
+    for name in ("alice", "bob"):
+        (workspace / name).mkdir(parents=True)
+    accounts_file = tmp_path / "accounts.toml"
+    accounts_file.write_text(ACCOUNTS.format(root=workspace))
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(tmp_path / "gitconfig"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.setattr(config, "ACCOUNTS_FILE", accounts_file)
+    monkeypatch.setattr(audit, "CACHE_FILE", tmp_path / "cache" / "audit.json")
+    monkeypatch.setattr(rules, "_compiled", None)
+    return workspace
+
+
+def make_repo(path: Path, author_email: str) -> Path:
+    subprocess.run(["git", "init", "--quiet", str(path)], check=True)
+    subprocess.run(
+        [
+            "git",
+            "-C",
+            str(path),
+            "-c",
+            "user.name=Someone",
+            "-c",
+            f"user.email={author_email}",
+            "commit",
+            "--quiet",
+            "--allow-empty",
+            "--message",
+            "work",
+        ],
+        check=True,
+    )
+    return path
+
+
+def cached_repos() -> list[str]:
+    return sorted(json.loads(audit.CACHE_FILE.read_text())["repos"])
+
+
+def test_finds_commit_under_other_account(root):
+    repo = make_repo(root / "alice" / "tool", "bob@example.com")
+    report = audit.audit([str(root)])
+    assert [(f.repo, f.author_email, f.expected) for f in report.findings] == [
+        (str(repo), "bob@example.com", "alice")
+    ]
+    assert report.skipped == []
+
+
+def test_unparseable_config_is_skipped(root):
+    good = make_repo(root / "alice" / "good", "bob@example.com")
+    bad = make_repo(root / "alice" / "bad", "bob@example.com")
+    (bad / ".git" / "config").write_text("[remote\n")
+    report = audit.audit([str(root)])
+    assert [f.repo for f in report.findings] == [str(good)]
+    assert [s.repo for s in report.skipped] == [str(bad)]
+
+
+def test_failing_git_log_skips_only_that_repo(root):
+    good = make_repo(root / "alice" / "good", "bob@example.com")
+    broken = make_repo(root / "bob" / "broken", "alice@example.com")
+    (broken / ".git" / "refs" / "heads" / "main").write_text("0" * 40 + "\n")
+    (broken / ".git" / "refs" / "heads" / "master").write_text("0" * 40 + "\n")
+    report = audit.audit([str(root)], workers=2)
+    assert [f.repo for f in report.findings] == [str(good)]
+    assert report.skipped == [audit.Skipped(str(broken), "git log failed")]
+
+
+def test_missing_git_is_skipped(root, tmp_path, monkeypatch, capsys):
+    repo = make_repo(root / "alice" / "tool", "bob@example.com")
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    assert audit.main([str(root)]) == 0
+    assert capsys.readouterr().err == (
+        f"gh-switcher: skipped {repo}: git is not installed\n"
+    )
+
+
+def test_hanging_git_is_skipped(root, tmp_path, monkeypatch):
+    repo = make_repo(root / "alice" / "tool", "bob@example.com")
+    # HEAD names a branch the files cannot resolve, so git is asked.
+    (repo / ".git" / "HEAD").write_text("ref: refs/heads/elsewhere\n")
+    stub = tmp_path / "bin" / "git"
+    stub.parent.mkdir()
+    stub.write_text("#!/bin/sh\nexec /bin/sleep 5\n")
+    stub.chmod(stub.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", str(stub.parent))
+    monkeypatch.setattr(audit, "GIT_TIMEOUT_SECONDS", 0.2)
+    report = audit.audit([str(root)])
+    assert report.skipped == [
+        audit.Skipped(str(repo), "git did not answer within 0.2 s")
+    ]
+
+
+def test_deleted_repos_leave_the_cache(root):
+    kept = make_repo(root / "alice" / "kept", "bob@example.com")
+    gone = make_repo(root / "bob" / "gone", "alice@example.com")
+    audit.audit([str(kept)])
+    audit.audit([str(gone)])
+    assert cached_repos() == sorted([str(kept), str(gone)])
+    shutil.rmtree(gone)
+    audit.audit([str(kept)])
+    assert cached_repos() == [str(kept)]
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import config
+from gh_switcher.identity import GitIdentity
+
+
+@pytest.fixture
+def accounts_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "accounts.toml"
+    monkeypatch.setattr(config, "ACCOUNTS_FILE", path)
+    return path
+
+
+def test_top_level_scalars_are_not_accounts(accounts_file):
+    accounts_file.write_text(
+        'foo = "x"\n'
+        "native_switch = true\n"
+        "\n"
+        "[settings]\n"
+        "low_memory = true\n"
+        "\n"
+        "[alice]\n"
+        'name = "Alice"\n'
+        'email = "alice@example.com"\n'
+        'paths = ["~/work"]\n'
+    )
+    alice = GitIdentity(name="Alice", email="alice@example.com")
+    assert config.get_identities() == {"alice": alice}
+    assert config.get_identity("foo") is None
+    assert [r.username for r in config.get_rules()] == ["alice"]
+    assert config.get_settings() == config.Settings(low_memory=True)
+
+
+def test_scalar_settings_are_ignored(accounts_file):
+    accounts_file.write_text('settings = "yes"\n')
+    assert config.get_settings() == config.Settings()
+    assert config.get_identities() == {}
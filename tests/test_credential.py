@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import shutil
+import stat
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import config, credential, rules
+from gh_switcher.identity import GitConfigError
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+ACCOUNTS = """\
+[alice]
+name = "Alice"
+email = "alice@example.com"
+paths = ["{work}"]
+remotes = ["panthrocorp"]
+
+[bob]
+name = "Bob"
+email = "bob@corp.example"
+remotes = ["ghe.example.com/platform", "ghe.example.com/infra-*"]
+"""
+
+# gh holds tokens for alice on github.com and bob on the enterprise host.
+GH = """\
+case "$1 $2 $4 $6" in
+  "auth token github.com alice") echo tok-alice ;;
+  "auth token ghe.example.com bob") echo tok-bob ;;
+  *) echo "no oauth token found for $4 account $6" >&2; exit 1 ;;
+esac
+"""
+
+
+@pytest.fixture
+def home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, stub_gh) -> Path:
+    """A HOME with accounts.toml, a stub gh and the helper on PATH."""
+    for name in ("home", "config", "runtime", "work", "src"):
+        (tmp_path / name).mkdir()
+    accounts_file = tmp_path / "config" / "gh-switcher" / "accounts.toml"
+    accounts_file.parent.mkdir()
+    accounts_file.write_text(ACCOUNTS.format(work=tmp_path / "work"))
+    # The helper runs as a subprocess of git and finds the same files.
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "runtime"))  # no tray
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(tmp_path / "gitconfig"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.setenv("GIT_TERMINAL_PROMPT", "0")
+    monkeypatch.setenv("PYTHONPATH", str(SRC))
+    monkeypatch.setattr(config, "ACCOUNTS_FILE", accounts_file)
+    monkeypatch.setattr(rules, "INCLUDE_DIR", accounts_file.parent / "git")
+    monkeypatch.setattr(rules, "_compiled", None)
+    monkeypatch.setattr(rules, "_synced", None)
+
+    log = stub_gh(GH)
+    helper = log.parent / "stub-bin" / "git-credential-gh-switcher"
+    helper.write_text(
+        f"#!/bin/sh\nexec {sys.executable} -c "
+        '"import sys; from gh_switcher.credential import main; sys.exit(main())" '
+        '"$@"\n'
+    )
+    helper.chmod(helper.stat().st_mode | stat.S_IXUSR)
+    git(tmp_path, "config", "--global", "credential.helper", "gh-switcher")
+    git(tmp_path, "config", "--global", "credential.useHttpPath", "true")
+    return tmp_path
+
+
+def git(cwd: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", *args], cwd=cwd, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def fill(cwd: Path, url: str, *flags: str) -> dict[str, str] | None:
+    """What `git credential fill` gets for *url*; None if nothing answered."""
+    result = subprocess.run(
+        ["git", *flags, "credential", "fill"],
+        cwd=cwd,
+        input=f"url={url}\n\n",
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return dict(line.split("=", 1) for line in result.stdout.splitlines())
+
+
+def clone(home: Path, parent: str, remote: str) -> Path:
+    """Clone a fresh bare repository under *parent*, then point it at *remote*."""
+    bare = home / "bare.git"
+    if not bare.exists():
+        git(home, "init", "--quiet", "--bare", str(bare))
+    target = home / parent / "clone"
+    git(home, "clone", "--quiet", str(bare), str(target))
+    git(target, "remote", "set-url", "origin", remote)
+    return target
+
+
+# -- git credential fill ------------------------------------------------------
+
+
+def test_owner_rule_on_github(home):
+    found = fill(home, "https://github.com/panthrocorp/tool.git")
+    assert found is not None
+    assert (found["username"], found["password"]) == ("alice", "tok-alice")
+
+
+@pytest.mark.parametrize("owner", ["platform", "infra-eu"])
+def test_owner_rule_on_enterprise_host(home, owner):
+    found = fill(home, f"https://ghe.example.com/{owner}/tool.git")
+    assert found is not None
+    assert (found["username"], found["password"]) == ("bob", "tok-bob")
+
+
+def test_bare_owner_rule_is_for_github_only(home):
+    log = home / "gh.log"
+    assert fill(home, "https://ghe.example.com/panthrocorp/tool.git") is None
+    assert log.read_text() == ""
+
+
+def test_path_rule_without_http_path(home):
+    repo = clone(home, "work", "https://github.com/someone/tool.git")
+    found = fill(
+        repo,
+        "https://github.com/someone/tool.git",
+        "-c",
+        "credential.useHttpPath=false",
+    )
+    assert found is not None
+    assert (found["username"], found["password"]) == ("alice", "tok-alice")
+
+
+def test_account_without_token_on_host_answers_nothing(home):
+    repo = clone(home, "work", "https://ghe.example.com/someone/tool.git")
+    assert fill(repo, "https://ghe.example.com/someone/tool.git") is None
+    log = home / "gh.log"
+    assert log.read_text() == "auth token --hostname ghe.example.com --user alice\n"
+
+
+def test_non_https_requests_are_ignored(home):
+    assert fill(home, "http://github.com/panthrocorp/tool.git") is None
+
+
+# -- Rules --------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        ("https://github.com/panthrocorp/tool.git", "alice"),
+        ("git@github.com:panthrocorp/tool.git", "alice"),
+        ("ssh://git@ghe.example.com/platform/tool.git", "bob"),
+        ("git@ghe.example.com:infra-us/tool.git", "bob"),
+        ("https://ghe.example.com/panthrocorp/tool.git", None),
+        ("https://github.com/platform/tool.git", None),
+    ],
+)
+def test_account_for_remote(home, url, expected):
+    assert rules.account_for_remote(url) == expected
+
+
+def test_resolve_account_keys_owners_by_host(home):
+    elsewhere = str(home / "src")
+    assert credential.resolve_account("ghe.example.com", "platform", elsewhere) == "bob"
+    assert credential.resolve_account("github.com", "platform", elsewhere) is None
+    # A path rule names its account whatever the host.
+    work = str(home / "work" / "repo")
+    assert credential.resolve_account("ghe.example.com", "other", work) == "alice"
+
+
+@pytest.mark.parametrize(
+    ("remote", "email"),
+    [
+        ("https://ghe.example.com/platform/tool.git", "bob@corp.example"),
+        ("git@ghe.example.com:infra-eu/tool.git", "bob@corp.example"),
+        ("ssh://git@github.com/panthrocorp/tool.git", "alice@example.com"),
+    ],
+)
+def test_synced_remote_rules_reach_git(home, remote, email):
+    rules.sync()
+    repo = clone(home, "src", remote)
+    assert git(repo, "config", "user.email") == email
+    assert rules.account_for_repo(repo, [remote]) == email.split("@")[0]
+
+
+def test_sync_retries_after_a_failed_write(home):
+    lock = home / "gitconfig.lock"
+    lock.touch()  # a concurrent git holds the global config
+    with pytest.raises(GitConfigError):
+        rules.sync()
+    lock.unlink()
+    rules.sync()
+    includes = git(home, "config", "--global", "--get-regexp", "^includeif")
+    assert str(rules.INCLUDE_DIR / "alice.gitconfig") in includes
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import filecache
+
+
+class Parser:
+    """Decodes the file and counts how often it was asked to."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, raw: bytes) -> dict[str, list[str]]:
+        self.calls += 1
+        return {"text": [raw.decode()]}
+
+
+@pytest.fixture
+def parse() -> Parser:
+    return Parser()
+
+
+def touch_later(path: Path) -> None:
+    """Move *path*'s mtime on, as a write a moment later would."""
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_unchanged_file_is_parsed_once(tmp_path, parse):
+    path = tmp_path / "hosts.yml"
+    path.write_text("alice")
+    first = filecache.load(path, parse)
+    assert filecache.load(path, parse) is first
+    assert parse.calls == 1
+    assert first["text"] == ("alice",)
+    with pytest.raises(TypeError):
+        first["text"] = ()  # type: ignore[index]
+
+
+def test_same_size_rewrite_is_reparsed(tmp_path, parse):
+    path = tmp_path / "hosts.yml"
+    path.write_text("alice")
+    filecache.load(path, parse)
+    path.write_text("carol")
+    touch_later(path)
+    assert filecache.load(path, parse)["text"] == ("carol",)
+    assert parse.calls == 2
+
+
+def test_rewrite_with_the_same_bytes_reuses_the_parse(tmp_path, parse):
+    path = tmp_path / "hosts.yml"
+    path.write_text("alice")
+    first = filecache.load(path, parse)
+    path.write_text("alice")
+    touch_later(path)
+    assert filecache.load(path, parse) is first
+    assert parse.calls == 1
+
+
+def test_replace_by_rename_is_reparsed(tmp_path, parse):
+    path = tmp_path / "hosts.yml"
+    path.write_text("alice")
+    filecache.load(path, parse)
+    tmp = tmp_path / "hosts.yml.tmp"
+    tmp.write_text("bobby")
+    os.replace(tmp, path)
+    assert filecache.load(path, parse)["text"] == ("bobby",)
+
+
+def test_missing_file(tmp_path, parse):
+    path = tmp_path / "hosts.yml"
+    assert filecache.load(path, parse) is None
+    assert filecache.stamp(path) is None
+    path.write_text("alice")
+    assert filecache.load(path, parse) is not None
+    path.unlink()
+    assert filecache.load(path, parse) is None
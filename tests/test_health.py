@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pytest
+
+from gh_switcher import health
+from gh_switcher.accounts import GhAccount
+
+# Hands out a token for alice only; `gh api user` answers as GitHub would
+# for the token it is given.
+GH = """\
+case "$1 $2" in
+  "auth token")
+    [ "$6" = alice ] && echo gho_alice || exit 1 ;;
+  "api user")
+    case "$GH_TOKEN $GH_ENTERPRISE_TOKEN" in
+      "gho_alice gho_alice") echo '{"login": "alice"}' ;;
+      *) echo 'gh: Bad credentials (HTTP 401)' >&2; exit 1 ;;
+    esac ;;
+esac
+"""
+
+
+def rejecting(stderr: str) -> str:
+    """Like GH, but `gh api user` fails with *stderr* for every token."""
+    return GH.replace("gho_alice gho_alice", "none").replace(
+        "gh: Bad credentials (HTTP 401)", stderr
+    )
+
+
+@pytest.mark.parametrize("host", ["github.com", "ghe.example.com"])
+def test_valid_token(stub_gh, host):
+    log = stub_gh(GH)
+    assert health.check_account(GhAccount("alice", True, host)) == "valid"
+    assert log.read_text().splitlines() == [
+        f"auth token --hostname {host} --user alice",
+        f"api user --hostname {host}",
+    ]
+
+
+def test_rejected_token_is_expired(stub_gh):
+    stub_gh(rejecting("gh: Bad credentials (HTTP 401)"))
+    assert health.check_account(GhAccount("alice", True)) == "expired"
+
+
+def test_no_stored_token_is_expired(stub_gh):
+    log = stub_gh(GH)
+    assert health.check_account(GhAccount("bob", False)) == "expired"
+    assert log.read_text() == "auth token --hostname github.com --user bob\n"
+
+
+def test_other_api_failure_is_unknown(stub_gh):
+    stub_gh(rejecting("gh: HTTP 502: Bad Gateway"))
+    assert health.check_account(GhAccount("alice", True)) == "unknown"
+
+
+def test_missing_gh_is_unknown(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    assert health.check_account(GhAccount("alice", True)) == "unknown"
+
+
+def test_hanging_gh_is_unknown(stub_gh, monkeypatch):
+    monkeypatch.setattr(health, "CHECK_TIMEOUT_SECONDS", 0.2)
+    stub_gh("exec sleep 5")
+    assert health.check_account(GhAccount("alice", True)) == "unknown"
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import identity
+from gh_switcher.identity import ConfigEntry, GitConfigError
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+# Shapes the parser has to agree with git on, byte for byte.
+SAMPLES = {
+    "plain": "[user]\n\tname = Alice\n\temail = alice@example.com\n",
+    "spacing": "  [User]  \n name=Alice   \n\temail =  a@b  # trailing comment\n",
+    "quoted": '[user]\n\tname = " Alice ; Smith "\n\temail = "a#b@example.com"\n',
+    "escapes": '[user]\n\tname = Tab\\there \\"quoted\\" back\\\\slash\\n\n',
+    "continuation": "[user]\n\tname = Ali\\\nce\n",
+    "comments": "# top\n; also\n[user] # header comment\n\tname = A ; c\n",
+    "subsections": (
+        '[includeIf "gitdir:~/work/"]\n\tpath = ~/w.gitconfig\n'
+        '[remote "Origin \\"x\\""]\n\turl = https://example.com/a.git\n'
+    ),
+    "deprecated_subsection": "[Section.SubSection]\n\tkey = v\n",
+    "implicit_true": "[core]\n\tbare\n\tfilemode = false\n",
+    "bom_crlf": "\ufeff[user]\r\n\tname = Alice\r\n\temail = a@b\r\n",
+    "repeated": (
+        "[user]\n\tname = First\n[core]\n\teditor = vim\n[user]\n\tname = Second\n"
+    ),
+    "dashes": "[my-section]\n\tsome-key = 1\n",
+    "no_final_newline": "[user]\n\tname = Alice",
+}
+
+# Values that need quoting or escaping on the way out.
+VALUES = [
+    "Alice",
+    "Ada Lovelace",
+    " leading space",
+    "trailing space ",
+    "semi;colon",
+    "hash#mark",
+    'say "hi"',
+    "back\\slash",
+    "tab\there",
+    "new\nline",
+    "ünïcödé",
+]
+
+# Files git refuses to read; the parser must refuse them too.
+MALFORMED = {
+    "unclosed_header": "[user\n\tname = Alice\n",
+    "unterminated_quote": '[user]\n\tname = "Alice\n',
+    "unknown_escape": "[user]\n\tname = A\\qB\n",
+    "bad_key": "[user]\n\t1name = Alice\n",
+}
+
+
+@pytest.fixture
+def git_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    """Environment in which git sees no system or user configuration."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(home / ".config"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.delenv("GIT_CONFIG_GLOBAL", raising=False)
+    return dict(os.environ)
+
+
+def git(env: dict[str, str], *args: str) -> subprocess.CompletedProcess[bytes]:
+    return subprocess.run(["git", "config", *args], env=env, capture_output=True)
+
+
+def git_list(env: dict[str, str], path: Path, *flags: str) -> list[tuple[str, str]]:
+    """`git config --list` of *path*; a key without `=` reads as "true"."""
+    result = git(env, "--file", str(path), *flags, "--list", "--null")
+    assert result.returncode == 0, result.stderr
+    pairs = []
+    for record in result.stdout.decode("utf-8").split("\0")[:-1]:
+        key, sep, value = record.partition("\n")
+        pairs.append((key, value if sep else "true"))
+    return pairs
+
+
+def git_get(env: dict[str, str], path: Path, key: str) -> str:
+    result = git(env, "--file", str(path), "--get", "--null", key)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.decode("utf-8").removesuffix("\0")
+
+
+def ours(path: Path, includes: bool = False) -> list[tuple[str, str]]:
+    return [
+        (_name(e), "true" if e.value is None else e.value)
+        for e in identity.read_config(path, includes=includes)
+    ]
+
+
+def _name(entry: ConfigEntry) -> str:
+    if entry.subsection is None:
+        return f"{entry.section}.{entry.key}"
+    return f"{entry.section}.{entry.subsection}.{entry.key}"
+
+
+def write(path: Path, text: str) -> Path:
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+
+# -- Reading ------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_parser_matches_git(git_env, tmp_path, name):
+    path = write(tmp_path / "config", SAMPLES[name])
+    assert ours(path) == git_list(git_env, path)
+
+
+@pytest.mark.parametrize("name", MALFORMED)
+def test_parser_rejects_what_git_rejects(git_env, tmp_path, name):
+    path = write(tmp_path / "config", MALFORMED[name])
+    assert git(git_env, "--file", str(path), "--list").returncode != 0
+    with pytest.raises(GitConfigError):
+        identity.read_config(path)
+
+
+def test_includes_expand_like_git(git_env, tmp_path):
+    nested = tmp_path / "nested"
+    nested.mkdir()
+    write(nested / "inner.gitconfig", "[user]\n\temail = inner@example.com\n")
+    write(
+        tmp_path / "outer.gitconfig",
+        "[user]\n\tname = Outer\n[include]\n\tpath = nested/inner.gitconfig\n",
+    )
+    path = write(
+        tmp_path / "config",
+        f"[user]\n\temail = top@example.com\n"
+        f"[include]\n\tpath = {tmp_path / 'outer.gitconfig'}\n"
+        f"[core]\n\teditor = vim\n",
+    )
+    assert ours(path, includes=True) == git_list(git_env, path, "--includes")
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_reads_what_git_writes(git_env, tmp_path, value):
+    path = write(tmp_path / "config", SAMPLES["comments"])
+    assert git(git_env, "--file", str(path), "user.email", value).returncode == 0
+    assert dict(ours(path))["user.email"] == value
+
+
+# -- Writing ------------------------------------------------------------------
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_git_reads_what_we_write(git_env, tmp_path, value):
+    path = write(tmp_path / "config", SAMPLES["spacing"])
+    identity.write_values(path, "user", {"name": value, "email": value})
+    assert git_get(git_env, path, "user.name") == value
+    assert git_get(git_env, path, "user.email") == value
+    assert ours(path) == git_list(git_env, path)
+
+
+@pytest.mark.parametrize("name", ["plain", "comments", "subsections", "dashes"])
+def test_write_only_touches_its_keys(git_env, tmp_path, name):
+    path = write(tmp_path / "config", SAMPLES[name])
+    before = [kv for kv in git_list(git_env, path) if not kv[0].startswith("user.")]
+    identity.write_values(path, "user", {"name": "New Name", "email": "new@x.org"})
+    after = git_list(git_env, path)
+    assert [kv for kv in after if not kv[0].startswith("user.")] == before
+    assert ("user.name", "New Name") in after
+    assert ("user.email", "new@x.org") in after
+
+
+def test_write_refuses_multiple_values(tmp_path):
+    path = write(tmp_path / "config", SAMPLES["repeated"])
+    with pytest.raises(GitConfigError):
+        identity.write_values(path, "user", {"name": "Third"})
+    assert path.read_text(encoding="utf-8") == SAMPLES["repeated"]
+    assert not path.with_name("config.lock").exists()
+
+
+def test_write_keeps_crlf_line_endings(git_env, tmp_path):
+    path = write(tmp_path / "config", "[core]\r\n\teditor = vim\r\n")
+    identity.write_values(path, "user", {"name": "Alice", "email": "a@b"})
+    identity.write_values(path, "core", {"editor": "nano", "pager": "less"})
+    raw = path.read_bytes()
+    assert raw.count(b"\n") == raw.count(b"\r\n") == 6
+    assert git_get(git_env, path, "user.name") == "Alice"
+    assert git_get(git_env, path, "core.editor") == "nano"
+
+
+def test_unchanged_write_leaves_file_alone(tmp_path):
+    path = write(tmp_path / "config", SAMPLES["plain"])
+    before = path.stat()
+    identity.write_values(path, "user", {"name": "Alice"})
+    after = path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_write_keeps_mode(tmp_path):
+    path = write(tmp_path / "config", SAMPLES["plain"])
+    path.chmod(0o600)
+    identity.write_values(path, "user", {"name": "Bob"})
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_replace_sections_round_trips(git_env, tmp_path):
+    path = write(tmp_path / "config", SAMPLES["subsections"])
+
+    def owned(entry: ConfigEntry) -> bool:
+        return entry.key == "path" and (entry.value or "").startswith("/managed/")
+
+    identity.replace_sections(
+        path, "includeIf", owned, [("gitdir:/a/", {"path": "/managed/a.gitconfig"})]
+    )
+    identity.replace_sections(
+        path, "includeIf", owned, [("gitdir:/b c/", {"path": "/managed/b.gitconfig"})]
+    )
+    entries = git_list(git_env, path)
+    assert ("includeif.gitdir:/b c/.path", "/managed/b.gitconfig") in entries
+    assert not any(value == "/managed/a.gitconfig" for _, value in entries)
+    # The user's own includeIf is not claimed and stays.
+    assert ("includeif.gitdir:~/work/.path", "~/w.gitconfig") in entries
+    assert ours(path) == entries
+
+
+# -- Global identity ----------------------------------------------------------
+
+
+def test_set_identity_matches_git_global(git_env, tmp_path, monkeypatch):
+    target = write(tmp_path / "global.gitconfig", SAMPLES["comments"])
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(target))
+    identity.set_identity("Grace Hopper", "grace@example.com")
+    env = dict(os.environ)
+    name = git(env, "--global", "--get", "user.name").stdout.decode().strip()
+    email = git(env, "--global", "--get", "user.email").stdout.decode().strip()
+    assert (name, email) == ("Grace Hopper", "grace@example.com")
+    current = identity.get_current()
+    assert (current.name, current.email) == (name, email)
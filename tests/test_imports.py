@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+# Cold `import gh_switcher.app`, best of RUNS with bytecode cached: the tray
+# paints only after it.
+IMPORT_BUDGET_MS = 100.0
+RUNS = 5
+# Loaded once the tray is on screen, never before.
+HEAVY = ("PIL", "yaml", "gi", "jeepney", "pystray")
+
+
+def import_app() -> tuple[float, set[str]]:
+    """Milliseconds `import gh_switcher.app` took, and the modules it loaded."""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, gh_switcher.app; print(*sys.modules, sep='\\n')",
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Last line is the top-level module: "import time: self | cumulative | name"
+    cumulative_us = int(proc.stderr.strip().splitlines()[-1].split("|")[1])
+    return cumulative_us / 1000, set(proc.stdout.split())
+
+
+def test_app_import_leaves_heavy_modules_out():
+    _ms, modules = import_app()
+    assert sorted(m for m in modules if m.partition(".")[0] in HEAVY) == []
+
+
+def test_app_import_within_budget():
+    import_app()  # writes the bytecode cache
+    best_ms = min(import_app()[0] for _ in range(RUNS))
+    assert best_ms < IMPORT_BUDGET_MS, (
+        f"import gh_switcher.app took {best_ms:.1f} ms "
+        f"(budget {IMPORT_BUDGET_MS:.0f} ms)"
+    )
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+import socket
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import ipc
+
+pytestmark = pytest.mark.skipif(not ipc.available(), reason="needs AF_UNIX")
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    server = ipc.Server({"echo": lambda rest: f"[{rest}]\n"})
+    assert server.start()
+    yield server
+    server.stop()
+
+
+def test_request_round_trip(server):
+    assert ipc.request("ping") == "pong\n"
+    assert ipc.request("echo a b") == "[a b]\n"
+    assert ipc.request("nope") == "error unknown command 'nope'\n"
+
+
+def test_handler_gets_rest_of_line_unchanged(server):
+    assert ipc.request("echo /home/me/My  Projects/a\tb ") == (
+        "[/home/me/My  Projects/a\tb ]\n"
+    )
+    assert ipc.request("echo") == "[]\n"
+    assert os.stat(ipc.socket_path()).st_mode & 0o777 == 0o600
+
+
+def test_client_refuses_socket_others_can_reach(server):
+    os.chmod(ipc.socket_path(), 0o666)
+    assert ipc.request("ping") is None
+
+
+def test_client_refuses_socket_of_another_user(server, monkeypatch):
+    monkeypatch.setattr(os, "getuid", lambda: os.geteuid() + 1)
+    assert ipc.request("ping") is None
+
+
+def test_client_refuses_what_is_not_a_socket(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    Path(ipc.socket_path()).touch(mode=0o600)
+    assert ipc.request("ping") is None
+
+
+def test_server_drops_peers_of_another_user(server, monkeypatch):
+    # Connect around the client's own checks, as another user's code would.
+    monkeypatch.setattr(os, "getuid", lambda: os.geteuid() + 1)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(2)
+        sock.connect(ipc.socket_path())
+        try:
+            sock.sendall(b"ping\n")
+            reply = sock.recv(64)
+        except (BrokenPipeError, ConnectionResetError):
+            reply = b""  # closed before the request was even sent
+    assert reply == b""
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_PEERCRED"), reason="Linux only")
+def test_peer_uid():
+    a, b = socket.socketpair(socket.AF_UNIX)
+    with a, b:
+        assert ipc._peer_uid(a) == os.getuid()
+
+
+def test_fallback_path_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    assert ipc.socket_path() == str(tmp_path / f"gh-switcher-{os.getuid()}.sock")
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import locks
+
+pytestmark = pytest.mark.skipif(locks.fcntl is None, reason="needs flock")
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# Takes the lock named by argv[1] ("instance" or "switch"), reports whether
+# it got it, then holds it until stdin closes.
+HOLDER = """\
+import sys
+from gh_switcher import locks
+
+if sys.argv[1] == "instance":
+    print(locks.acquire_instance(), flush=True)
+else:
+    print(locks.switch_lock().acquire(blocking=False), flush=True)
+sys.stdin.read()
+"""
+
+
+@pytest.fixture
+def runtime(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A runtime dir shared with child processes; fresh locks in this one."""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setenv("PYTHONPATH", str(SRC))
+    monkeypatch.setattr(
+        locks, "_instance_lock", locks.FileLock(str(tmp_path / "gh-switcher.lock"))
+    )
+    monkeypatch.setattr(
+        locks, "_switch_lock", locks.FileLock(str(tmp_path / "gh-switcher.switch.lock"))
+    )
+    return tmp_path
+
+
+def holder(which: str) -> subprocess.Popen[str]:
+    return subprocess.Popen(
+        [sys.executable, "-c", HOLDER, which],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def result(proc: subprocess.Popen[str]) -> bool:
+    line = proc.stdout.readline().strip()  # type: ignore[union-attr]
+    assert line in ("True", "False")
+    return line == "True"
+
+
+def finish(proc: subprocess.Popen[str]) -> None:
+    proc.communicate(timeout=10)
+
+
+@pytest.mark.parametrize("which", ["instance", "switch"])
+def test_lock_held_by_another_process_is_refused(runtime, which):
+    first = holder(which)
+    try:
+        assert result(first)
+        second = holder(which)
+        assert not result(second)
+        finish(second)
+    finally:
+        finish(first)
+
+
+def test_second_instance_is_refused_while_the_first_runs(runtime):
+    assert locks.acquire_instance()
+    proc = holder("instance")
+    assert not result(proc)
+    finish(proc)
+    locks._instance_lock.release()
+
+
+def test_switch_lock_excludes_another_descriptor(runtime):
+    other = locks.FileLock(str(runtime / "gh-switcher.switch.lock"))
+    with locks.switch_lock():
+        assert not other.acquire(blocking=False)
+    assert other.acquire(blocking=False)
+    other.release()
+
+
+@pytest.mark.parametrize("which", ["instance", "switch"])
+def test_lock_is_released_when_its_holder_exits(runtime, which):
+    proc = holder(which)
+    assert result(proc)
+    finish(proc)  # exits without releasing
+    lock = locks._instance_lock if which == "instance" else locks.switch_lock()
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_killed_holder_releases_the_lock(runtime):
+    proc = holder("switch")
+    assert result(proc)
+    proc.kill()
+    proc.communicate(timeout=10)
+    assert locks.switch_lock().acquire(blocking=False)
+    locks.switch_lock().release()
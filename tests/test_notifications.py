@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import os
+import shutil
+import stat
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import notifications
+
+# Logs its arguments, one call per line, and prints a fresh id.  With
+# OLD_LIBNOTIFY set it rejects --print-id the way libnotify < 0.7.9 does;
+# with BROKEN set every call fails.
+STUB = """#!/bin/sh
+printf '%s\\n' "$*" >> "$NOTIFY_LOG"
+[ -n "$BROKEN" ] && { echo "cannot connect" >&2; exit 1; }
+case "$*" in
+  *--print-id*) [ -n "$OLD_LIBNOTIFY" ] && {
+    echo "Unknown option --print-id" >&2; exit 1; } ;;
+esac
+wc -l < "$NOTIFY_LOG"
+"""
+
+NO_BUS = "unix:path=/nonexistent/bus"
+
+
+@pytest.fixture
+def calls(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Put a stub notify-send on PATH; returns the file it logs calls to."""
+    stub = tmp_path / "bin" / "notify-send"
+    stub.parent.mkdir()
+    stub.write_text(STUB)
+    stub.chmod(stub.stat().st_mode | stat.S_IXUSR)
+    log = tmp_path / "calls"
+    log.touch()
+    monkeypatch.setenv("PATH", f"{stub.parent}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("NOTIFY_LOG", str(log))
+    monkeypatch.setattr(notifications, "_legacy_notify_send", False)
+    return log
+
+
+class MockServer:
+    """org.freedesktop.Notifications on a private bus, recording each call."""
+
+    def __init__(self, address: str) -> None:
+        from jeepney.bus_messages import message_bus
+        from jeepney.io.blocking import open_dbus_connection
+
+        self.calls: list[tuple[str, int, str, str]] = []
+        self._connection = open_dbus_connection(address)
+        self._connection.send_and_get_reply(
+            message_bus.RequestName(notifications.BUS_NAME)
+        )
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        from jeepney import HeaderFields, MessageType, new_method_return
+
+        while not self._stop.is_set():
+            try:
+                msg = self._connection.receive(timeout=0.05)
+            except TimeoutError:
+                continue
+            fields = msg.header.fields
+            if (
+                msg.header.message_type is MessageType.method_call
+                and fields.get(HeaderFields.member) == "Notify"
+            ):
+                _app, replaces_id, _icon, title, body, *_ = msg.body
+                sender = fields[HeaderFields.sender]
+                self.calls.append((sender, replaces_id, title, body))
+                reply = replaces_id or 100 + len(self.calls)
+                self._connection.send(new_method_return(msg, "u", (reply,)))
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._connection.close()
+
+
+@pytest.fixture
+def notifier() -> Iterator[Callable[[str], notifications.Notifier]]:
+    """Factory of notifiers that are closed after the test."""
+    made: list[notifications.Notifier] = []
+
+    def make(bus: str) -> notifications.Notifier:
+        made.append(notifications.Notifier(bus))
+        return made[-1]
+
+    yield make
+    for each in made:
+        each.close()
+
+
+@pytest.fixture
+def bus(tmp_path: Path) -> Iterator[str]:
+    """Address of a private session bus."""
+    pytest.importorskip("jeepney")
+    daemon = shutil.which("dbus-daemon")
+    if daemon is None:
+        pytest.skip("needs dbus-daemon")
+    address = f"unix:path={tmp_path / 'bus'}"
+    proc = subprocess.Popen(
+        [daemon, "--session", "--nofork", "--print-address", f"--address={address}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    assert proc.stdout is not None
+    proc.stdout.readline()  # printed once it listens
+    try:
+        yield address
+    finally:
+        proc.terminate()
+        proc.wait()
+        proc.stdout.close()
+
+
+@pytest.fixture
+def server(bus: str) -> Iterator[MockServer]:
+    mock = MockServer(bus)
+    try:
+        yield mock
+    finally:
+        mock.close()
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+# -- D-Bus -------------------------------------------------------------------
+
+
+def test_same_title_replaces_bubble_over_dbus(calls, bus, server, notifier):
+    notifier = notifier(bus)
+    notifier.send("Switch failed", "one")
+    notifier.send("Other", "two")
+    notifier.send("Switch failed", "three")
+    wait_for(lambda: len(server.calls) == 3)
+    assert [call[1:] for call in server.calls] == [
+        (0, "Switch failed", "one"),
+        (0, "Other", "two"),
+        (101, "Switch failed", "three"),
+    ]
+    # One connection for all of them, and no notify-send.
+    assert len({sender for sender, *_ in server.calls}) == 1
+    assert calls.read_text() == ""
+
+
+def test_send_does_not_wait_for_the_bus(calls, bus, server, notifier):
+    notifier = notifier(bus)
+    start = time.perf_counter()
+    for n in range(50):
+        notifier.send("Switch failed", str(n))
+    assert time.perf_counter() - start < 0.5
+    wait_for(lambda: len(server.calls) == 50)
+
+
+def test_bus_without_server_falls_back_to_notify_send(calls, bus, notifier):
+    notifier = notifier(bus)
+    notifier._deliver("Switch failed", "one")
+    notifier._deliver("Switch failed", "two")
+    assert calls.read_text().splitlines() == [
+        "--app-name=gh-switcher --print-id Switch failed one",
+        "--app-name=gh-switcher --print-id --replace-id=1 Switch failed two",
+    ]
+    assert notifier._connection is not None
+
+
+# -- notify-send fallback ----------------------------------------------------
+
+
+def test_no_bus_uses_notify_send(calls):
+    notifier = notifications.Notifier(NO_BUS)
+    notifier._deliver("Switch failed", "one")
+    notifier._deliver("Other", "two")
+    notifier._deliver("Switch failed", "three")
+    assert calls.read_text().splitlines() == [
+        "--app-name=gh-switcher --print-id Switch failed one",
+        "--app-name=gh-switcher --print-id Other two",
+        "--app-name=gh-switcher --print-id --replace-id=1 Switch failed three",
+    ]
+    assert notifier._ids == {"Switch failed": 3, "Other": 2}
+
+
+def test_old_libnotify_drops_print_id_once(calls, monkeypatch):
+    monkeypatch.setenv("OLD_LIBNOTIFY", "1")
+    notifier = notifications.Notifier(NO_BUS)
+    notifier._deliver("Switch failed", "one")
+    notifier._deliver("Switch failed", "two")
+    assert calls.read_text().splitlines() == [
+        "--app-name=gh-switcher --print-id Switch failed one",
+        "--app-name=gh-switcher Switch failed one",
+        "--app-name=gh-switcher Switch failed two",
+    ]
+
+
+def test_failed_notify_send_is_not_retried(calls, monkeypatch):
+    monkeypatch.setenv("BROKEN", "1")
+    notifier = notifications.Notifier(NO_BUS)
+    notifier._deliver("Switch failed", "one")
+    assert calls.read_text().splitlines() == [
+        "--app-name=gh-switcher --print-id Switch failed one",
+    ]
+    assert notifications._legacy_notify_send is False
+
+
+def test_missing_notify_send_is_silent(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    notifications.Notifier(NO_BUS)._deliver("Switch failed", "no notify-send")
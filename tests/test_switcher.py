@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import accounts, switcher
+from gh_switcher.switcher import SwitchError, run_switch
+
+# gh >= 2.40 with file storage: the active token at host level, a copy per user.
+FILE_STORAGE = """\
+github.com:
+    users:
+        alice:
+            oauth_token: gho_alice
+        bob:
+            oauth_token: gho_bob
+    git_protocol: https
+    oauth_token: gho_alice
+    user: alice
+"""
+
+# Two hosts, comments and blank lines, which the rewrite must leave alone.
+TWO_HOSTS = """\
+# managed by gh
+github.com:
+    users:
+        alice:
+            oauth_token: gho_alice
+        bob:
+            oauth_token: gho_bob
+    oauth_token: gho_alice  # active
+    user: alice
+
+ghe.example.com:
+    git_protocol: ssh
+    users:
+        carol:
+            oauth_token: ghe_carol
+        dave:
+            oauth_token: ghe_dave
+    oauth_token: ghe_carol
+    user: carol
+"""
+
+# Layouts only gh can switch; the native engine must hand them over.
+UNSUPPORTED = {
+    # Tokens in the system keyring: hosts.yml lists users without tokens.
+    "keyring": """\
+github.com:
+    users:
+        alice:
+        bob:
+    git_protocol: https
+    user: alice
+""",
+    # gh < 2.40: one account per host and no `users` map.
+    "single_account": """\
+github.com:
+    oauth_token: gho_alice
+    user: alice
+    git_protocol: https
+""",
+    # File storage, but the target's token went to the keyring.
+    "target_without_token": FILE_STORAGE.replace(
+        "        bob:\n            oauth_token: gho_bob\n", "        bob: {}\n"
+    ),
+    "target_not_logged_in": FILE_STORAGE.replace("bob", "eve"),
+    "duplicate_key": FILE_STORAGE + "    user: alice\n",
+    "flow_style": "github.com: {users: {alice: {}, bob: {}}, user: alice}\n",
+    "not_yaml": "github.com: [unclosed\n",
+    "not_a_mapping": "- github.com\n",
+}
+
+
+@pytest.fixture
+def hosts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Write *text* as the hosts.yml gh-switcher reads."""
+    path = tmp_path / "gh" / "hosts.yml"
+    path.parent.mkdir()
+    monkeypatch.setattr(accounts, "HOSTS_FILE", path)
+
+    def write(text: str) -> Path:
+        path.write_bytes(text.encode("utf-8"))
+        return path
+
+    return write
+
+
+def active(host: str = "github.com") -> str:
+    account = accounts.load_accounts().active(host)
+    assert account is not None
+    return account.username
+
+
+# -- Native engine ------------------------------------------------------------
+
+
+def test_native_switch_rewrites_file_storage(hosts, stub_gh):
+    log = stub_gh()
+    path = hosts(FILE_STORAGE)
+    run_switch("bob", native=True)
+    assert path.read_text() == FILE_STORAGE.replace(
+        "    oauth_token: gho_alice\n    user: alice\n",
+        "    oauth_token: gho_bob\n    user: bob\n",
+    )
+    assert active() == "bob"
+    assert log.read_text() == ""
+
+
+def test_native_switch_touches_only_its_host(hosts, stub_gh):
+    log = stub_gh()
+    path = hosts(TWO_HOSTS)
+    run_switch("dave", "ghe.example.com", native=True)
+    assert path.read_text() == TWO_HOSTS.replace(
+        "    oauth_token: ghe_carol\n    user: carol\n",
+        "    oauth_token: ghe_dave\n    user: dave\n",
+    )
+    assert (active(), active("ghe.example.com")) == ("alice", "dave")
+    assert log.read_text() == ""
+
+
+def test_native_switch_keeps_crlf_and_mode(hosts, stub_gh):
+    stub_gh()
+    path = hosts(FILE_STORAGE.replace("\n", "\r\n"))
+    path.chmod(0o600)
+    run_switch("bob", native=True)
+    raw = path.read_bytes()
+    assert raw.count(b"\n") == raw.count(b"\r\n") == FILE_STORAGE.count("\n")
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert active() == "bob"
+    assert not [p.name for p in path.parent.iterdir() if p.name != "hosts.yml"]
+
+
+def test_native_switch_to_active_account_writes_nothing(hosts, stub_gh):
+    log = stub_gh()
+    path = hosts(FILE_STORAGE)
+    before = path.stat()
+    run_switch("alice", native=True)
+    after = path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert log.read_text() == ""
+
+
+# -- Falling back to gh -------------------------------------------------------
+
+
+@pytest.mark.parametrize("layout", UNSUPPORTED)
+def test_unknown_layout_falls_back_to_gh(hosts, stub_gh, layout):
+    log = stub_gh()
+    path = hosts(UNSUPPORTED[layout])
+    run_switch("bob", native=True)
+    assert log.read_text() == "auth switch --hostname github.com --user bob\n"
+    assert path.read_text() == UNSUPPORTED[layout]
+
+
+def test_missing_hosts_file_falls_back_to_gh(hosts, stub_gh):
+    log = stub_gh()
+    hosts("").unlink()
+    run_switch("bob", native=True)
+    assert log.read_text() == "auth switch --hostname github.com --user bob\n"
+
+
+def test_without_native_runs_gh(hosts, stub_gh):
+    log = stub_gh()
+    path = hosts(FILE_STORAGE)
+    run_switch("bob", native=False)
+    assert log.read_text() == "auth switch --hostname github.com --user bob\n"
+    assert path.read_text() == FILE_STORAGE
+
+
+def test_gh_failure_raises(hosts, stub_gh):
+    stub_gh("echo 'no account found for bob' >&2; exit 1")
+    hosts(UNSUPPORTED["keyring"])
+    with pytest.raises(SwitchError, match="no account found for bob"):
+        run_switch("bob", native=True)
+
+
+def test_rewrite_refuses_missing_block():
+    with pytest.raises(switcher._UnsupportedLayout):
+        switcher._rewrite_host_keys(FILE_STORAGE, "ghe.example.com", {"user": "x"})
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import replace
+
+from gh_switcher.tray.base import MenuItem, reconcile_menu
+
+
+class Widgets:
+    """Stand-in toolkit: widgets are numbers, every call is logged."""
+
+    def __init__(self) -> None:
+        self.log: list[tuple[str, ...]] = []
+        self.shown: list[int] = []  # the menu, in order
+        self._ids = itertools.count()
+
+    def build(self, items: list[MenuItem]) -> list[int]:
+        return self.reconcile([], [], items)
+
+    def reconcile(
+        self, old: list[MenuItem], widgets: list[int], new: list[MenuItem]
+    ) -> list[int]:
+        self.log.clear()
+        result = reconcile_menu(
+            old,
+            widgets,
+            new,
+            create=self._create,
+            update=self._update,
+            remove=self._remove,
+            insert=self._insert,
+        )
+        assert result == self.shown
+        return result
+
+    def _create(self, item: MenuItem) -> int:
+        widget = next(self._ids)
+        self.log.append(("create", item.label))
+        return widget
+
+    def _update(self, widget: int, old: MenuItem, new: MenuItem) -> None:
+        if old != new:
+            self.log.append(("update", new.label))
+
+    def _remove(self, widget: int) -> None:
+        self.log.append(("remove", str(widget)))
+        self.shown.remove(widget)
+
+    def _insert(self, widget: int, index: int) -> None:
+        self.shown.insert(index, widget)
+
+
+def accounts(active: str, *names: str) -> list[MenuItem]:
+    return [MenuItem(label=n, checked=n == active, radio=True) for n in names]
+
+
+def footer() -> list[MenuItem]:
+    return [
+        MenuItem(label="", separator=True),
+        MenuItem(label="Refresh"),
+        MenuItem(label="Quit"),
+    ]
+
+
+def test_switch_patches_the_two_accounts_in_place():
+    toolkit = Widgets()
+    old = accounts("alice", "alice", "bob", "carol") + footer()
+    widgets = toolkit.build(old)
+    new = accounts("bob", "alice", "bob", "carol") + footer()
+    assert toolkit.reconcile(old, widgets, new) == widgets
+    assert toolkit.log == [("update", "alice"), ("update", "bob")]
+
+
+def test_unchanged_menu_touches_nothing():
+    toolkit = Widgets()
+    items = accounts("alice", "alice", "bob") + footer()
+    widgets = toolkit.build(items)
+    assert toolkit.reconcile(items, widgets, list(items)) == widgets
+    assert toolkit.log == []
+
+
+def test_new_account_is_inserted_in_place():
+    toolkit = Widgets()
+    old = accounts("alice", "alice", "carol") + footer()
+    widgets = toolkit.build(old)
+    new = accounts("alice", "alice", "bob", "carol") + footer()
+    result = toolkit.reconcile(old, widgets, new)
+    assert toolkit.log == [("create", "bob")]
+    assert result[0] == widgets[0] and result[2:] == widgets[1:]
+
+
+def test_removed_account_removes_only_its_widget():
+    toolkit = Widgets()
+    old = accounts("alice", "alice", "bob", "carol") + footer()
+    widgets = toolkit.build(old)
+    new = accounts("alice", "alice", "carol") + footer()
+    result = toolkit.reconcile(old, widgets, new)
+    assert toolkit.log == [("remove", str(widgets[1]))]
+    assert result == [widgets[0], *widgets[2:]]
+
+
+def test_relabelled_item_is_patched_in_place():
+    # A token going bad changes the label; the item stays where it is.
+    toolkit = Widgets()
+    old = accounts("alice", "alice", "bob") + footer()
+    widgets = toolkit.build(old)
+    new = [replace(old[0], label="alice (expired)"), *old[1:]]
+    assert toolkit.reconcile(old, widgets, new) == widgets
+    assert toolkit.log == [("update", "alice (expired)")]
+
+
+def test_change_of_kind_replaces_the_widget():
+    toolkit = Widgets()
+    old = [MenuItem(label="github.com"), *footer()]
+    widgets = toolkit.build(old)
+    new = [replace(old[0], submenu=lambda: []), *footer()]
+    result = toolkit.reconcile(old, widgets, new)
+    assert toolkit.log == [("remove", str(widgets[0])), ("create", "github.com")]
+    assert result[0] != widgets[0] and result[1:] == widgets[1:]
+
+
+def test_reordered_items_end_up_in_order():
+    toolkit = Widgets()
+    old = [MenuItem(label=n) for n in "abcde"]
+    widgets = toolkit.build(old)
+    new = [MenuItem(label=n) for n in "eabdc"]
+    result = toolkit.reconcile(old, widgets, new)
+    by_label = dict(zip("abcde", widgets, strict=True))
+    kept = [w for n, w in zip("eabdc", result, strict=True) if by_label[n] == w]
+    assert len(kept) >= 3  # the longest common run is patched, not rebuilt
+    assert len(result) == len(new)
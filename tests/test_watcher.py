@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from gh_switcher import watcher
+from gh_switcher.watcher import FileWatcher
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="needs inotify")
+
+
+class Counter:
+    """Counts calls and lets a test wait for the next one."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._cond = threading.Condition()
+
+    def __call__(self) -> None:
+        with self._cond:
+            self.count += 1
+            self._cond.notify_all()
+
+    def wait_for(self, count: int, timeout: float = 5.0) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self.count >= count, timeout)
+
+
+@pytest.fixture
+def changes() -> Counter:
+    return Counter()
+
+
+@pytest.fixture
+def arms(monkeypatch: pytest.MonkeyPatch) -> Counter:
+    """Counts the inotify watches the watcher sets up."""
+    counter = Counter()
+    arm = watcher._inotify_watch_dir
+
+    def counting_arm(path: Path) -> int | None:
+        fd = arm(path)
+        if fd is not None:
+            counter()
+        return fd
+
+    monkeypatch.setattr(watcher, "_inotify_watch_dir", counting_arm)
+    return counter
+
+
+@pytest.fixture
+def watch(changes: Counter, arms: Counter) -> Iterator[Callable[[Path], None]]:
+    """Start a watcher on a path and wait until inotify is watching it."""
+    started: list[FileWatcher] = []
+
+    def start(path: Path) -> None:
+        w = FileWatcher(path, changes)
+        w.start()
+        started.append(w)
+        assert arms.wait_for(1)
+
+    yield start
+    for w in started:
+        w.stop()
+
+
+def test_burst_of_writes_is_one_change(tmp_path, changes, watch):
+    path = tmp_path / "hosts.yml"
+    path.write_text("")
+    watch(path)
+    for i in range(5):
+        path.write_text("x" * (i + 1))
+        time.sleep(0.01)
+    assert changes.wait_for(1)
+    time.sleep(watcher.DEBOUNCE_SECONDS * 3)
+    assert changes.count == 1
+
+
+def test_rename_into_place_is_a_change(tmp_path, changes, watch):
+    path = tmp_path / "hosts.yml"
+    path.write_text("old")
+    watch(path)
+    tmp = tmp_path / "hosts.yml.tmp"
+    tmp.write_text("new content")
+    assert not changes.wait_for(1, timeout=watcher.DEBOUNCE_SECONDS * 2)
+    os.replace(tmp, path)
+    assert changes.wait_for(1)
+
+
+def test_directory_deleted_and_recreated(tmp_path, changes, arms, watch, monkeypatch):
+    monkeypatch.setattr(watcher, "POLL_INTERVAL_SECONDS", 0.05)
+    directory = tmp_path / "gh"
+    directory.mkdir()
+    path = directory / "hosts.yml"
+    path.write_text("a")
+    watch(path)
+
+    path.unlink()
+    directory.rmdir()
+    assert changes.wait_for(1)
+
+    directory.mkdir()
+    assert arms.wait_for(2), "directory not watched again"
+    # Seen through inotify, not by polling, which now waits a minute.
+    monkeypatch.setattr(watcher, "POLL_INTERVAL_SECONDS", 60.0)
+    path.write_text("b")
+    assert changes.wait_for(2)
+
+
+def test_stop_closes_the_wake_up_pipe(tmp_path, changes):
+    w = FileWatcher(tmp_path / "hosts.yml", changes)
+    w.start()
+    wake = (w._wake_r, w._wake_w)
+    w.stop()
+    w.stop()
+    assert w._thread is not None and not w._thread.is_alive()
+    for fd in wake:
+        with pytest.raises(OSError):
+            os.fstat(fd)
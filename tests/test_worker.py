@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+
+from gh_switcher.worker import SwitchWorker
+
+
+class Switches:
+    """perform() for a worker: records each switch; the first one blocks."""
+
+    def __init__(self) -> None:
+        self.done: list[tuple[str, str]] = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, host: str, username: str) -> None:
+        self.started.set()
+        self.release.wait(5)
+        self.done.append((host, username))
+
+
+def test_clicks_during_a_switch_collapse_to_the_last():
+    switches = Switches()
+    worker = SwitchWorker(switches)
+    worker.submit("github.com", "alice")
+    assert switches.started.wait(5)
+    for username in ("bob", "carol", "dave"):
+        worker.submit("github.com", username)
+    switches.release.set()
+    assert worker.wait_idle(5)
+    assert switches.done == [("github.com", "alice"), ("github.com", "dave")]
+
+
+def test_queued_clicks_for_other_hosts_are_kept():
+    switches = Switches()
+    worker = SwitchWorker(switches)
+    worker.submit("github.com", "alice")
+    assert switches.started.wait(5)
+    worker.submit("ghe.example.com", "bot-1")
+    worker.submit("github.com", "bob")
+    worker.submit("ghe.example.com", "bot-2")
+    assert worker.has_pending()
+    switches.release.set()
+    assert worker.wait_idle(5)
+    assert switches.done == [
+        ("github.com", "alice"),
+        ("github.com", "bob"),
+        ("ghe.example.com", "bot-2"),
+    ]
+
+
+def test_failed_switch_keeps_the_worker_running(capsys):
+    done: list[str] = []
+
+    def perform(host: str, username: str) -> None:
+        if username == "alice":
+            raise RuntimeError("boom")
+        done.append(username)
+
+    worker = SwitchWorker(perform)
+    worker.submit("github.com", "alice")
+    assert worker.wait_idle(5)
+    worker.submit("github.com", "bob")
+    assert worker.wait_idle(5)
+    assert done == ["bob"]
+    assert "RuntimeError: boom" in capsys.readouterr().err
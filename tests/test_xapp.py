@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import contextlib
+import importlib
+import sys
+import threading
+import time
+import types
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from gh_switcher import icons
+from gh_switcher.tray.base import MenuItem, TrayState
+
+# -- Fake GLib / Gtk / XApp ---------------------------------------------------
+
+
+class GLib:
+    SOURCE_REMOVE = False
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: list[tuple[Callable[..., object], tuple[object, ...]]] = []
+
+    def idle_add(self, func: Callable[..., object], *args: object) -> int:
+        with self._lock:
+            self._idle.append((func, args))
+        return len(self._idle)
+
+    def run_idle(self) -> int:
+        """Run what is queued for the main loop, as GTK's thread would."""
+        with self._lock:
+            queued, self._idle = self._idle, []
+        for func, args in queued:
+            func(*args)
+        return len(queued)
+
+
+class MenuItemWidget:
+    def __init__(self, label: str = "") -> None:
+        self.label = label
+        self.sensitive = True
+        self.submenu: Menu | None = None
+        self._handlers: dict[int, Callable[[Any], None]] = {}
+        self._blocked: set[int] = set()
+
+    def connect(self, signal: str, handler: Callable[[Any], None]) -> int:
+        handler_id = len(self._handlers) + 1
+        self._handlers[handler_id] = handler
+        return handler_id
+
+    @contextlib.contextmanager
+    def handler_block(self, handler_id: int) -> Iterator[None]:
+        self._blocked.add(handler_id)
+        try:
+            yield
+        finally:
+            self._blocked.discard(handler_id)
+
+    def emit_activate(self) -> None:
+        for handler_id, handler in list(self._handlers.items()):
+            if handler_id not in self._blocked:
+                handler(self)
+
+    def click(self) -> None:
+        self.emit_activate()
+
+    def set_label(self, label: str) -> None:
+        self.label = label
+
+    def set_sensitive(self, sensitive: bool) -> None:
+        self.sensitive = sensitive
+
+    def set_submenu(self, submenu: Menu) -> None:
+        self.submenu = submenu
+
+    def get_submenu(self) -> Menu | None:
+        return self.submenu
+
+    def show(self) -> None:
+        pass
+
+    def destroy(self) -> None:
+        pass
+
+
+class CheckMenuItem(MenuItemWidget):
+    def __init__(self, label: str = "") -> None:
+        super().__init__(label)
+        self.active = False
+
+    def set_draw_as_radio(self, radio: bool) -> None:
+        pass
+
+    def get_active(self) -> bool:
+        return self.active
+
+    def set_active(self, active: bool) -> None:
+        # Like GTK: a change of state emits "activate".
+        if active != self.active:
+            self.active = active
+            self.emit_activate()
+
+    def click(self) -> None:
+        self.active = not self.active
+        self.emit_activate()
+
+
+class SeparatorMenuItem(MenuItemWidget):
+    pass
+
+
+class Menu:
+    def __init__(self) -> None:
+        self.children: list[MenuItemWidget] = []
+
+    def connect(self, signal: str, handler: Callable[[Any], None]) -> int:
+        return 1
+
+    def insert(self, widget: MenuItemWidget, index: int) -> None:
+        self.children.insert(index, widget)
+
+    def append(self, widget: MenuItemWidget) -> None:
+        self.children.append(widget)
+
+    def remove(self, widget: MenuItemWidget) -> None:
+        self.children.remove(widget)
+
+    def get_children(self) -> list[MenuItemWidget]:
+        return list(self.children)
+
+
+class StatusIcon:
+    def __init__(self) -> None:
+        self.icon_name: str | None = None
+        self.tooltip: str | None = None
+
+    def set_visible(self, visible: bool) -> None:
+        pass
+
+    def set_icon_name(self, name: str) -> None:
+        self.icon_name = name
+
+    def set_tooltip_text(self, text: str) -> None:
+        self.tooltip = text
+
+    def set_secondary_menu(self, menu: Menu) -> None:
+        pass
+
+
+@pytest.fixture
+def glib(monkeypatch: pytest.MonkeyPatch) -> Iterator[GLib]:
+    """Install a fake `gi` and import the XApp backend against it."""
+    fake = GLib()
+    gtk = types.SimpleNamespace(
+        Menu=Menu,
+        MenuItem=MenuItemWidget,
+        CheckMenuItem=CheckMenuItem,
+        SeparatorMenuItem=SeparatorMenuItem,
+        main=lambda: None,
+        main_quit=lambda: None,
+    )
+    repository = types.ModuleType("gi.repository")
+    repository.GLib = fake  # type: ignore[attr-defined]
+    repository.Gtk = gtk  # type: ignore[attr-defined]
+    repository.XApp = types.SimpleNamespace(StatusIcon=StatusIcon)  # type: ignore[attr-defined]
+    gi = types.ModuleType("gi")
+    gi.require_version = lambda name, version: None  # type: ignore[attr-defined]
+    gi.repository = repository  # type: ignore[attr-defined]
+    monkeypatch.setitem(sys.modules, "gi", gi)
+    monkeypatch.setitem(sys.modules, "gi.repository", repository)
+    monkeypatch.delitem(sys.modules, "gh_switcher.tray.xapp", raising=False)
+    yield fake
+    sys.modules.pop("gh_switcher.tray.xapp", None)
+
+
+@pytest.fixture
+def backend(glib: GLib) -> Any:
+    xapp = importlib.import_module("gh_switcher.tray.xapp")
+    return xapp.XAppTrayBackend()
+
+
+def flush(glib: GLib, timeout: float = 5.0) -> None:
+    """Wait for the backend to schedule a redraw, then run it."""
+    deadline = time.monotonic() + timeout
+    while not glib.run_idle():
+        assert time.monotonic() < deadline, "no redraw scheduled"
+        time.sleep(0.005)
+
+
+def make_icon(tmp_path: Path, name: str, drawn_on: list[int]) -> icons.Icon:
+    def draw() -> Any:
+        from PIL import Image
+
+        drawn_on.append(threading.get_ident())
+        return Image.new("RGBA", (4, 4))
+
+    return icons.Icon((name,), tmp_path / f"{name}.png", draw)
+
+
+def state(icon: icons.Icon, menu: list[MenuItem] | None = None) -> TrayState:
+    return TrayState(icon=icon, tooltip=f"gh: {icon.key[0]}", menu=menu or [])
+
+
+# -- Icons --------------------------------------------------------------------
+
+
+def test_apply_writes_icons_off_the_calling_thread(backend, glib, tmp_path):
+    drawn_on: list[int] = []
+    icon = make_icon(tmp_path, "alice", drawn_on)
+    backend.apply(state(icon))
+    flush(glib)
+    assert drawn_on and threading.get_ident() not in drawn_on
+    assert backend._icon.icon_name == str(icon.path)
+    assert icon.path.exists()
+    assert backend._icon.tooltip == "gh: alice"
+
+
+def test_newest_state_wins(backend, glib, tmp_path):
+    drawn_on: list[int] = []
+    first = make_icon(tmp_path, "alice", drawn_on)
+    last = make_icon(tmp_path, "bob", drawn_on)
+    backend.apply(state(first))
+    backend.apply(state(last))
+    flush(glib)
+    time.sleep(0.05)
+    glib.run_idle()
+    assert backend._icon.icon_name == str(last.path)
+
+
+def test_unwritable_cache_keeps_the_redraw(backend, glib, tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    icon = icons.Icon(("alice",), blocker / "alice.png", lambda: _image())
+    backend.apply(state(icon, [MenuItem(label="Quit")]))
+    flush(glib)
+    assert backend._icon.icon_name is None
+    assert [w.label for w in backend._menu.children] == ["Quit"]
+
+
+def _image() -> Any:
+    from PIL import Image
+
+    return Image.new("RGBA", (4, 4))
+
+
+# -- Menu ---------------------------------------------------------------------
+
+
+def accounts(active: str, clicks: list[str]) -> list[MenuItem]:
+    return [
+        MenuItem(
+            label=name,
+            callback=(lambda n: lambda: clicks.append(n))(name),
+            checked=name == active,
+            radio=True,
+        )
+        for name in ("alice", "bob")
+    ] + [MenuItem(label="", separator=True), MenuItem(label="Quit")]
+
+
+def test_switch_patches_radio_items_in_place(backend, glib, tmp_path):
+    clicks: list[str] = []
+    icon = make_icon(tmp_path, "alice", [])
+    backend.apply(state(icon, accounts("alice", clicks)))
+    flush(glib)
+    widgets = list(backend._menu.children)
+    assert [w.get_active() for w in widgets[:2]] == [True, False]
+
+    backend.apply(state(icon, accounts("bob", clicks)))
+    flush(glib)
+    assert backend._menu.children == widgets
+    assert [w.get_active() for w in widgets[:2]] == [False, True]
+    assert clicks == []  # set_active() is not a click
+
+
+def test_click_on_checked_account_stays_checked(backend, glib, tmp_path):
+    clicks: list[str] = []
+    icon = make_icon(tmp_path, "alice", [])
+    backend.apply(state(icon, accounts("alice", clicks)))
+    flush(glib)
+    alice, bob = backend._menu.children[:2]
+    alice.click()
+    assert alice.get_active() and clicks == ["alice"]
+    # Another account only shows as checked once the app says so.
+    bob.click()
+    assert not bob.get_active() and clicks == ["alice", "bob"]